@@ -0,0 +1,292 @@
+"""
+SurStitch for Salesforce - Synthetic person_master Generator
+Writes realistic person_master_*.csv files for benchmarking the viewer's data path
+
+Columns are the ones named in COLUMN_LABEL_DICTIONARY (minus fields the viewer
+derives itself), written as raw strings the way the Salesforce export produces them:
+- categoricals (owner, source, campaign, state, ...) follow skewed Zipf-like distributions
+- Speed_to_Lead is log-normal (median ~25 min, long multi-day tail) in HH:MM:SS and
+  'N days HH:MM:SS' forms, blank when the lead was never called
+- flags use mixed spellings ('True', 'true', 'Yes', '1', ...)
+- conversion depends on source and L2QR, dates follow the lead's lifecycle
+
+Usage:
+    python benchmarks/generate_person_master.py 1000000 Output-Files/person_master_20250901.csv
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from surstitch_engine import COLUMN_LABEL_DICTIONARY, DIFF_COLUMNS
+
+# Columns the viewer computes itself - never present in an exported file
+DERIVED_COLUMNS = set(DIFF_COLUMNS) | {'Speed_to_Lead_Seconds'}
+
+# Every generated file has exactly these columns, in this order
+GENERATED_COLUMNS = [col for col in COLUMN_LABEL_DICTIONARY if col not in DERIVED_COLUMNS]
+
+# Rows generated and written per step, so multi-million row files don't need all rows in memory
+GENERATOR_CHUNK_ROWS = 250_000
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Carlos', 'Maria',
+    'Wei', 'Priya', 'Ahmed', 'Fatima', 'Hiroshi', 'Yuki', 'Olga', 'Ivan', 'Kwame', 'Amara',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Nguyen', 'Patel', 'Kim', 'Chen', 'Singh', 'Khan', 'Okafor', 'Ivanova', 'Tanaka',
+]
+EMAIL_DOMAINS = ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com', 'icloud.com', 'aol.com', 'comcast.net']
+LEAD_STATUSES = {
+    # status -> (weight, details)
+    'Open': (0.38, ['New', 'Attempting Contact', None]),
+    'Working': (0.27, ['Contacted', 'Follow Up', 'Appointment Set']),
+    'Nurture': (0.15, ['Not Ready', 'No Budget', 'Timing']),
+    'Qualified': (0.12, ['L2QR', 'Hand-off']),
+    'Unqualified': (0.08, ['Bad Data', 'Duplicate', 'Not Interested', 'Wrong Number']),
+}
+LEAD_SOURCES = [
+    # source, conversion lift
+    ('Web', 1.0), ('Paid Search', 0.9), ('Facebook', 0.6), ('Referral', 2.2), ('Partner', 1.6),
+    ('Event', 1.3), ('Direct Mail', 0.7), ('Organic Search', 1.1), ('Affiliate', 0.5), ('Call In', 2.5),
+    ('Email', 0.8), ('Other', 0.6),
+]
+STATES = [
+    'CA', 'TX', 'FL', 'NY', 'PA', 'IL', 'OH', 'GA', 'NC', 'MI', 'NJ', 'VA', 'WA', 'AZ', 'MA', 'TN', 'IN', 'MO',
+    'MD', 'WI', 'CO', 'MN', 'SC', 'AL', 'LA', 'KY', 'OR', 'OK', 'CT', 'UT', 'IA', 'NV', 'AR', 'MS', 'KS', 'NM',
+    'NE', 'ID', 'WV', 'HI', 'NH', 'ME', 'RI', 'MT', 'DE', 'SD', 'ND', 'AK', 'VT', 'WY',
+]
+CITIES_PER_STATE = 12
+COMPANY_SUFFIXES = ['Inc', 'LLC', 'Corp', 'Group', 'Partners', 'Holdings', 'Co']
+COMPANY_WORDS = [
+    'Acme', 'Summit', 'Pioneer', 'Blue Ridge', 'Evergreen', 'Harbor', 'Keystone', 'Lakeside', 'Northstar',
+    'Pinnacle', 'Redwood', 'Silverline', 'Trident', 'Union', 'Vertex', 'Westfield', 'Golden Gate', 'Ironwood',
+]
+TITLES = [
+    'Owner', 'CEO', 'President', 'Office Manager', 'Operations Manager', 'VP Sales', 'Director', 'Manager',
+    'Purchasing Agent', 'Consultant', 'Engineer', 'Accountant', None,
+]
+UTM_MEDIUMS = ['cpc', 'organic', 'social', 'email', 'referral', 'display', 'affiliate']
+OWNER_ROLES = ['SDR', 'BDR', 'Account Executive', 'Senior AE', 'Team Lead']
+N_OWNERS = 60
+N_CAMPAIGNS = 200
+N_CONTENTS = 40
+N_TERMS = 300
+
+def zipf_weights(n, exponent=1.1):
+    """Normalized Zipf-like weights - a few values dominate, with a long tail"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def skewed_choice(rng, values, n, exponent=1.1, missing=0.0):
+    """Draw n values with Zipf-skewed frequencies, leaving a share of them missing"""
+    values = np.asarray(values, dtype=object)
+    drawn = values[rng.choice(len(values), size=n, p=zipf_weights(len(values), exponent))]
+    if missing:
+        drawn[rng.random(n) < missing] = None
+    return drawn
+
+def format_speed_to_lead(seconds):
+    """Format seconds as HH:MM:SS, or 'N days HH:MM:SS' past one day (None stays blank)"""
+    out = np.full(len(seconds), None, dtype=object)
+    present = ~np.isnan(seconds)
+    whole = seconds[present].astype(np.int64)
+    days, rest = np.divmod(whole, 86400)
+    hours, rest = np.divmod(rest, 3600)
+    minutes, secs = np.divmod(rest, 60)
+    clock = (
+        pd.Series(hours).astype(str).str.zfill(2) + ':'
+        + pd.Series(minutes).astype(str).str.zfill(2) + ':'
+        + pd.Series(secs).astype(str).str.zfill(2)
+    )
+    clock = clock.where(days == 0, pd.Series(days).astype(str) + ' days ' + clock)
+    out[present] = clock.to_numpy(dtype=object)
+    return out
+
+def format_timestamps(values, fmt='%Y-%m-%d %H:%M:%S'):
+    """Format datetimes as strings, NaT as blank"""
+    return pd.Series(values).dt.strftime(fmt).to_numpy(dtype=object)
+
+def generate_person_master(n_rows, seed=0, first_row=0, end_date='2025-09-01', days=180):
+    """One block of synthetic person_master rows as raw strings
+    
+    Args:
+        n_rows: Number of rows to generate
+        seed: Random seed (the same seed and first_row always give the same rows)
+        first_row: Row number of the first row, used for unique IDs
+        end_date: Snapshot date - leads are created in the preceding `days` days
+        days: Length of the lead creation window in days
+    
+    Returns:
+        DataFrame with GENERATED_COLUMNS, every value a string or None
+    """
+    rng = np.random.default_rng([seed, first_row])
+    n = n_rows
+    row_ids = pd.Series(np.arange(first_row, first_row + n))
+    
+    # Lead lifecycle - creation skews to recent weeks and to weekdays
+    end = pd.Timestamp(end_date)
+    age_days = np.minimum(rng.exponential(days / 3, n), days - 1e-6)
+    created = end - pd.to_timedelta(age_days * 86400, unit='s')
+    weekend = created.dayofweek >= 5
+    created = created.where(~(weekend & (rng.random(n) < 0.6)), created - pd.to_timedelta(2, unit='D'))
+    
+    statuses = list(LEAD_STATUSES)
+    status_weights = np.array([LEAD_STATUSES[s][0] for s in statuses])
+    status = np.asarray(statuses, dtype=object)[rng.choice(len(statuses), size=n, p=status_weights)]
+    detail = np.empty(n, dtype=object)
+    for name in statuses:
+        rows = status == name
+        detail[rows] = skewed_choice(rng, LEAD_STATUSES[name][1], int(rows.sum()), exponent=0.8)
+    
+    source_idx = rng.choice(len(LEAD_SOURCES), size=n, p=zipf_weights(len(LEAD_SOURCES), 0.9))
+    source = np.asarray([s for s, _ in LEAD_SOURCES], dtype=object)[source_idx]
+    source_lift = np.asarray([lift for _, lift in LEAD_SOURCES])[source_idx]
+    
+    # Speed to lead - log-normal minutes, missing when the lead was never called
+    called = rng.random(n) > 0.15
+    speed_seconds = np.where(called, np.exp(rng.normal(np.log(25 * 60), 1.6, n)), np.nan)
+    speed_seconds = np.minimum(speed_seconds, 30 * 86400)
+    
+    # Funnel - L2QR and conversion depend on source and contact speed
+    fast = np.nan_to_num(speed_seconds, nan=1e9) < 3600
+    l2qr = rng.random(n) < np.clip(0.22 * source_lift * np.where(fast, 1.3, 0.8), 0, 0.95)
+    l2qr |= status == 'Qualified'
+    converted = l2qr & (rng.random(n) < 0.35)
+    converted |= ~l2qr & (rng.random(n) < 0.01 * source_lift)
+    days_to_convert = np.where(converted, np.ceil(rng.gamma(2.0, 9.0, n)), np.nan)
+    converted_at = created + pd.to_timedelta(np.nan_to_num(days_to_convert) * 86400, unit='s')
+    converted_at = converted_at.where(converted & (converted_at <= end))
+    converted &= ~pd.isna(converted_at)
+    days_to_convert = np.where(converted, days_to_convert, np.nan)
+    
+    # Activities - roughly negative binomial, heavier for worked and converted leads
+    effort = np.where(status == 'Open', 0.6, 1.0) * np.where(converted, 2.0, 1.0)
+    activity = {
+        'Activity_Inbound_Calls': rng.negative_binomial(1, 1 / (1 + 0.6 * effort)),
+        'Activity_Outbound_Calls': rng.negative_binomial(2, 1 / (1 + 1.8 * effort)),
+        'Activity_Text_Messages': rng.negative_binomial(1, 1 / (1 + 1.2 * effort)),
+        'Activity_Emails': rng.negative_binomial(2, 1 / (1 + 1.5 * effort)),
+        'Activity_Voicemails': rng.negative_binomial(1, 1 / (1 + 0.8 * effort)),
+        'Activity_Form_Fills': rng.binomial(2, 0.3, n),
+    }
+    activity_total = sum(activity.values())
+    
+    first_names = skewed_choice(rng, FIRST_NAMES, n, exponent=0.7)
+    last_names = skewed_choice(rng, LAST_NAMES, n, exponent=0.7)
+    full_names = pd.Series(first_names) + ' ' + pd.Series(last_names)
+    emails = (
+        pd.Series(first_names).str.lower() + '.' + pd.Series(last_names).str.lower()
+        + row_ids.astype(str) + '@' + pd.Series(skewed_choice(rng, EMAIL_DOMAINS, n))
+    )
+    phones = (
+        '(' + pd.Series(rng.integers(201, 990, n)).astype(str) + ') '
+        + pd.Series(rng.integers(200, 1000, n)).astype(str) + '-'
+        + pd.Series(rng.integers(0, 10000, n)).astype(str).str.zfill(4)
+    )
+    
+    state_idx = rng.choice(len(STATES), size=n, p=zipf_weights(len(STATES), 0.9))
+    state = np.asarray(STATES, dtype=object)[state_idx]
+    city = pd.Series(state) + ' City ' + pd.Series(rng.choice(CITIES_PER_STATE, size=n, p=zipf_weights(CITIES_PER_STATE))).astype(str)
+    postal = pd.Series(state_idx * 1800 + rng.integers(0, 1800, n) + 501).astype(str).str.zfill(5)
+    
+    companies = np.asarray([f"{word} {suffix}" for word in COMPANY_WORDS for suffix in COMPANY_SUFFIXES], dtype=object)
+    owners = np.asarray([f"Owner {i:02d}" for i in range(1, N_OWNERS + 1)], dtype=object)
+    owner_idx = rng.choice(N_OWNERS, size=n, p=zipf_weights(N_OWNERS, 0.8))
+    
+    seasons = [f"{season}_{year}" for year in (2024, 2025) for season in ('spring', 'summer', 'fall', 'winter')]
+    campaigns = [f"{seasons[i % len(seasons)]}_{i:03d}" for i in range(N_CAMPAIGNS)]
+    
+    mql_at = (created + pd.to_timedelta(rng.exponential(2, n) * 86400, unit='s')).where(l2qr | (rng.random(n) < 0.3))
+    sql_at = (mql_at + pd.to_timedelta(rng.exponential(4, n) * 86400, unit='s')).where(l2qr)
+    first_touch = created + pd.to_timedelta(np.nan_to_num(speed_seconds, nan=0) * 0.7, unit='s')
+    first_call = (created + pd.to_timedelta(np.nan_to_num(speed_seconds), unit='s')).where(called)
+    amount = np.where(converted, np.round(rng.lognormal(np.log(12000), 0.9, n), 2), np.nan)
+    
+    def flag_strings(values, true_spellings, false_spellings):
+        spellings_true = np.asarray(true_spellings, dtype=object)[rng.integers(0, len(true_spellings), n)]
+        spellings_false = np.asarray(false_spellings, dtype=object)[rng.integers(0, len(false_spellings), n)]
+        return np.where(values, spellings_true, spellings_false)
+    
+    def count_strings(values):
+        return pd.Series(values).astype(str).to_numpy(dtype=object)
+    
+    def number_strings(values):
+        return pd.Series(values).map(lambda v: None if np.isnan(v) else f"{v:g}").to_numpy(dtype=object)
+    
+    columns = {
+        'Person_UUID': ('p-' + row_ids.astype(str).str.zfill(10)).to_numpy(dtype=object),
+        'lead_first_name': first_names,
+        'lead_last_name': last_names,
+        'lead_full_name': full_names.to_numpy(dtype=object),
+        'Email_Clean': emails.to_numpy(dtype=object),
+        'Phone_Clean': phones.to_numpy(dtype=object),
+        'Lead_Status': status,
+        'Lead_Status_Detail': detail,
+        'Lead_Source': source,
+        'Lead_RecordId': ('00Q' + row_ids.astype(str).str.zfill(12)).to_numpy(dtype=object),
+        'Is_Converted_Bool': flag_strings(converted, ['True'], ['False']),
+        'Has_L2QR': flag_strings(l2qr, ['True', 'true', 'Yes', '1'], ['False', 'false', 'No', '0', None]),
+        'LeadCreatedDate': format_timestamps(created),
+        'ConvertedDate': format_timestamps(converted_at, '%Y-%m-%d'),
+        'Activity_Count': count_strings(activity_total),
+        **{col: count_strings(values) for col, values in activity.items()},
+        'Speed_to_Lead': format_speed_to_lead(speed_seconds),
+        'First_Call_DateTime': format_timestamps(first_call),
+        'Activity_First_Touch': format_timestamps(first_touch),
+        'Company': skewed_choice(rng, companies, n, exponent=0.6, missing=0.1),
+        'Title': skewed_choice(rng, TITLES, n, exponent=0.9),
+        'lead_city': city.to_numpy(dtype=object),
+        'lead_state': state,
+        'lead_country': skewed_choice(rng, ['US', 'United States', 'USA', 'CA'], n, exponent=2.0, missing=0.05),
+        'lead_postal_code': postal.to_numpy(dtype=object),
+        'utm_source': np.where(rng.random(n) < 0.7, pd.Series(source).str.lower().str.replace(' ', '_'), None),
+        'utm_medium': skewed_choice(rng, UTM_MEDIUMS, n, missing=0.3),
+        'utm_campaign': skewed_choice(rng, campaigns, n, exponent=1.0, missing=0.35),
+        'utm_content': skewed_choice(rng, [f"ad_{i:02d}" for i in range(N_CONTENTS)], n, missing=0.5),
+        'utm_term': skewed_choice(rng, [f"term {i}" for i in range(N_TERMS)], n, exponent=1.2, missing=0.6),
+        'Lead_Owner': owners[owner_idx],
+        'Lead_Owner_Role': np.asarray(OWNER_ROLES, dtype=object)[owner_idx % len(OWNER_ROLES)],
+        'MQL_Date': format_timestamps(mql_at, '%Y-%m-%d'),
+        'SQL_Date': format_timestamps(sql_at, '%Y-%m-%d'),
+        'Opportunity_Amount': number_strings(amount),
+        'Days_to_Convert': number_strings(days_to_convert),
+    }
+    return pd.DataFrame({col: columns[col] for col in GENERATED_COLUMNS})
+
+def write_person_master(path, n_rows, seed=0, end_date='2025-09-01', chunk_rows=GENERATOR_CHUNK_ROWS):
+    """Write a synthetic person_master CSV of n_rows rows, generated chunk by chunk"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        for start in range(0, n_rows, chunk_rows):
+            chunk = generate_person_master(min(chunk_rows, n_rows - start), seed=seed, first_row=start, end_date=end_date)
+            chunk.to_csv(f, header=(start == 0), index=False)
+    return path
+
+def parse_row_count(text):
+    """Parse row counts like '10000', '10k', '2.5m'"""
+    text = text.strip().lower().replace('_', '')
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic person_master CSV")
+    parser.add_argument('rows', type=parse_row_count, help="number of rows, e.g. 10k, 500k, 5m")
+    parser.add_argument('path', help="output CSV path, e.g. Output-Files/person_master_20250901.csv")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--end-date', default='2025-09-01', help="snapshot date; leads are created before it")
+    args = parser.parse_args(argv)
+    path = write_person_master(args.path, args.rows, seed=args.seed, end_date=args.end_date)
+    print(f"Wrote {args.rows:,} rows to {path} ({path.stat().st_size / 1024 / 1024:,.1f} MB)")
+
+if __name__ == '__main__':
+    main()
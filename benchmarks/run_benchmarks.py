@@ -0,0 +1,199 @@
+"""
+SurStitch for Salesforce - Data Path Benchmarks
+Times loading, metrics, filters, search, paging and exports at several dataset sizes
+
+Synthetic files come from generate_person_master.py and are kept in --data-dir,
+so later runs reuse them. Every case runs --repeat times; the median and best
+times are reported, and the full results can be written as JSON with --json.
+Pass an earlier JSON file with --baseline to flag cases that got slower.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 10k,100k,1m
+    python benchmarks/run_benchmarks.py --sizes 100k --json after.json --baseline before.json
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from generate_person_master import parse_row_count, write_person_master
+from surstitch_engine import (
+    EXPORT_FORMATS, METRIC_COLUMNS, SIDECAR_DIR_NAME,
+    DuckDBBackend, FilterIndex, FilterMetrics, SearchIndex, StreamedDataset, build_kpi_trends, calculate_metrics,
+    duckdb, page_positions, peak_memory_bytes, pq, read_dataset, select_rows, sidecar_path, sort_order,
+    write_export,
+)
+
+DEFAULT_SIZES = '10k,100k,1m'
+DEFAULT_DATA_DIR = Path(tempfile.gettempdir()) / 'surstitch_benchmarks'
+
+# A case is reported as a regression when its median is this much slower than the baseline
+REGRESSION_THRESHOLD = 1.2
+
+# Queries for the search cases: (case name, query)
+SEARCH_QUERIES = [
+    ('search word', 'garcia'),
+    ('search prefix', 'gon'),
+    ('search scoped', 'email:gmail'),
+    ('search multi-term', 'owner referral'),
+    ('search no match', 'zzzz'),
+]
+
+def time_case(fn, repeat):
+    """Run fn repeat times, returning (last result, timings in ms)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, timings
+
+def cold_load(csv_path):
+    """Parse the CSV as if for the first time (no sidecar to memory-map)"""
+    sidecar = sidecar_path(csv_path)
+    if sidecar.exists():
+        sidecar.unlink()
+    return read_dataset(file_path=csv_path)
+
+def dataset_file(data_dir, n_rows, seed):
+    """Synthetic person_master file with n_rows rows, generated on first use"""
+    path = Path(data_dir) / f"{n_rows}" / 'person_master_20250901.csv'
+    if not path.exists():
+        print(f"  generating {n_rows:,} rows...", flush=True)
+        write_person_master(path, n_rows, seed=seed)
+    return path
+
+def benchmark_size(csv_path, repeat, include_duckdb=True, include_streaming=False):
+    """Time every case against one file. Returns {case: {'median_ms', 'best_ms', ...}}"""
+    results = {}
+    
+    def run(name, fn, case_repeat=None):
+        result, timings = time_case(fn, case_repeat or repeat)
+        results[name] = {
+            'median_ms': statistics.median(timings),
+            'best_ms': min(timings),
+            'runs': len(timings),
+        }
+        print(f"  {name:<28} {results[name]['median_ms']:>10.1f} ms", flush=True)
+        return result
+    
+    # Loading - the cold parse also writes the sidecar the warm load then maps
+    run('load csv (cold)', lambda: cold_load(csv_path), case_repeat=1)
+    df = run('load sidecar (warm)', lambda: read_dataset(file_path=csv_path))
+    
+    run('metrics', lambda: calculate_metrics(df))
+    run('kpi trends', lambda: build_kpi_trends(df))
+    
+    # Filters - each filter type on its own and combined
+    filter_index = run('filter index build', lambda: FilterIndex(df), case_repeat=1)
+    top_status = filter_index.options.get('status', ['All'])[0]
+    top_source = filter_index.options.get('source', ['All'])[0]
+    run('filter status', lambda: filter_index.mask(status=top_status))
+    run('filter source', lambda: filter_index.mask(source=top_source))
+    run('filter conversion', lambda: filter_index.mask(conversion='Converted'))
+    row_mask = run('filter combined', lambda: filter_index.mask(top_status, top_source, 'Not Converted'))
+    
+    # Search
+    search_index = run('search index build', lambda: SearchIndex(df), case_repeat=1)
+    for name, query in SEARCH_QUERIES:
+        run(name, lambda query=query: search_index.search(query))
+    
+    metric_columns = [col for col in METRIC_COLUMNS if col in df.columns]
+    run('filtered metrics', lambda: calculate_metrics(select_rows(df, row_mask, metric_columns)))
+    
+    # Filtered metrics summed from per-cell partials, as the viewer computes them
+    filter_metrics = run('filter metrics cells', lambda: FilterMetrics(df, filter_index), case_repeat=1)
+    run('filtered metrics (cells)', lambda: filter_metrics.metrics(top_status, top_source, 'Not Converted'))
+    
+    # Paging - the sort order is built once per column, then pages are cheap
+    order = run('sort order', lambda: sort_order(df, 'LeadCreatedDate', descending=True), case_repeat=1)
+    run('page (sorted, filtered)', lambda: df.iloc[page_positions(len(df), row_mask, order, 3, 100)])
+    
+    # Exports of the filtered rows, all columns
+    columns = list(df.columns)
+    for fmt in EXPORT_FORMATS:
+        run(f"export {fmt}", lambda fmt=fmt: write_export(df, row_mask, columns, {}, fmt))
+    
+    if include_duckdb and duckdb is not None:
+        backend = run('duckdb register', lambda: DuckDBBackend(df=df), case_repeat=1)
+        query = backend.where(top_status, top_source, 'Not Converted')
+        run('duckdb filter count', lambda: backend.count(query))
+        run('duckdb search count', lambda: backend.count(backend.where(search='garcia')))
+        run('duckdb metrics', lambda: backend.metrics(query))
+        run('duckdb export CSV', lambda: backend.export(query, columns, {}, 'CSV'))
+    
+    if include_streaming and pq is not None:
+        store = csv_path.parent / SIDECAR_DIR_NAME / f"{csv_path.stem}.parquet"
+        if store.exists():
+            store.unlink()
+        streamed = run('streaming ingest', lambda: StreamedDataset.open(csv_path), case_repeat=1)
+        run('streaming metrics', streamed.metrics, case_repeat=1)
+        run('streaming page', lambda: streamed.read_rows(0, 100, columns))
+    
+    results['_dataset'] = {
+        'rows': len(df),
+        'file_bytes': csv_path.stat().st_size,
+        'frame_bytes': int(df.memory_usage(deep=True).sum()),
+        'peak_memory_bytes': peak_memory_bytes(),
+    }
+    return results
+
+def compare(results, baseline):
+    """Print cases whose median got slower than in the baseline results"""
+    regressions = []
+    for size, cases in results.items():
+        for name, timing in cases.items():
+            before = baseline.get(size, {}).get(name)
+            if name.startswith('_') or not before:
+                continue
+            ratio = timing['median_ms'] / max(before['median_ms'], 1e-6)
+            if ratio >= REGRESSION_THRESHOLD:
+                regressions.append((size, name, before['median_ms'], timing['median_ms'], ratio))
+    if regressions:
+        print("\nSlower than baseline:")
+        for size, name, before, after, ratio in regressions:
+            print(f"  {size:>9} {name:<28} {before:>10.1f} -> {after:>10.1f} ms ({ratio:.2f}x)")
+    else:
+        print("\nNo case is slower than the baseline.")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SurStitch data path on synthetic person_master files")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"comma-separated row counts (default {DEFAULT_SIZES}, up to 5m)")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per case (default 5)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=str(DEFAULT_DATA_DIR), help="where generated files are kept")
+    parser.add_argument('--streaming', action='store_true', help="also time Parquet streaming ingestion")
+    parser.add_argument('--no-duckdb', action='store_true', help="skip the DuckDB cases")
+    parser.add_argument('--json', help="write results to this JSON file")
+    parser.add_argument('--baseline', help="earlier JSON results to compare against")
+    parser.add_argument('--clean', action='store_true', help="delete the generated files afterwards")
+    args = parser.parse_args(argv)
+    
+    results = {}
+    for size in [parse_row_count(text) for text in args.sizes.split(',')]:
+        print(f"\n{size:,} rows", flush=True)
+        csv_path = dataset_file(args.data_dir, size, args.seed)
+        results[str(size)] = benchmark_size(
+            csv_path, args.repeat, include_duckdb=not args.no_duckdb, include_streaming=args.streaming
+        )
+    
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.json}")
+    if args.baseline:
+        compare(results, json.loads(Path(args.baseline).read_text()))
+    if args.clean:
+        shutil.rmtree(args.data_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
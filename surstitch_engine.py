@@ -0,0 +1,2876 @@
+"""
+SurStitch for Salesforce - Data Engine
+Loading, schema, indexes, metrics and exports for person_master files
+
+Nothing in this module depends on Streamlit, so the viewer's data path can be
+imported and benchmarked headlessly (see benchmarks/). viewer_streamlit_cloud.py
+adds caching and the UI on top of it.
+"""
+
+import pandas as pd
+import numpy as np
+import os
+from pathlib import Path
+from datetime import datetime, timezone
+from collections import OrderedDict, defaultdict
+from contextlib import closing, contextmanager
+import gzip
+import hashlib
+import io
+import json
+import math
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional - without it every load parses the CSV
+    pa = None
+    feather = None
+    pq = None
+
+try:
+    import duckdb
+except ImportError:  # duckdb is optional - without it only the pandas query engine is offered
+    duckdb = None
+
+try:
+    import resource
+except ImportError:  # not available on Windows - peak memory is then not reported
+    resource = None
+
+# Predefined column label mappings - edit this dictionary to rename columns directly in code
+# Format: 'original_column_name': 'Display Name'
+# These mappings are applied automatically when the app loads
+# Users can still override these via the UI column rename feature
+COLUMN_LABEL_DICTIONARY = {
+    # Person and Identity Fields
+    'Person_UUID': 'UNIQUE ID',
+    'lead_first_name': 'First Name', 
+    'lead_last_name': 'Last Name',
+    'lead_full_name': 'Full Name',
+    'Email_Clean': 'Email',
+    'Phone_Clean': 'Phone',
+    
+    # Lead Information
+    'Lead_Status': 'Status',
+    'Lead_Status_Detail': 'Status Detail',
+    'Lead_Source': 'Source',
+    'Lead_RecordId': 'Lead ID',
+    'Is_Converted_Bool': 'Converted',
+    'Has_L2QR': 'Has L2QR',
+    'LeadCreatedDate': 'Lead Created',
+    'ConvertedDate': 'Converted Date',
+    
+    # Activity Metrics
+    'Activity_Count': 'Activities',
+    'Activity_Inbound_Calls': 'Calls (In)',
+    'Activity_Outbound_Calls': 'Calls (Out)', 
+    'Activity_Text_Messages': 'SMS',
+    'Activity_Emails': 'Emails',
+    'Activity_Voicemails': 'VMs',
+    'Activity_Form_Fills': 'Forms',
+    
+    # Speed and Performance Metrics
+    'Speed_to_Lead': 'S2L',
+    'Speed_to_Lead_Seconds': 'S2L (sec)',  # Derived at load time from Speed_to_Lead
+    'First_Call_DateTime': 'First Call Time',
+    'Activity_First_Touch': 'First Touch Time',
+    
+    # Company and Contact Information
+    'Company': 'Company Name',
+    'Title': 'Job Title',
+    'lead_city': 'City',
+    'lead_state': 'State',
+    'lead_country': 'Country',
+    'lead_postal_code': 'Zip Code',
+    
+    # Marketing and Campaign Fields
+    'utm_source': 'UTM Source',
+    'utm_medium': 'UTM Medium', 
+    'utm_campaign': 'UTM Campaign',
+    'utm_content': 'UTM Content',
+    'utm_term': 'UTM Term',
+    
+    # Owner and Assignment
+    'Lead_Owner': 'Owner',
+    'Lead_Owner_Role': 'Owner Role',
+    
+    # Additional metrics and fields
+    'MQL_Date': 'MQL Date',
+    'SQL_Date': 'SQL Date',
+    'Opportunity_Amount': 'Opportunity Value',
+    'Days_to_Convert': 'Days to Convert',
+    
+    # Snapshot diff fields
+    'Change_Type': 'Change',
+    'Changed_Columns': 'Changed Fields',
+    
+    # Add more column mappings as needed
+    # Simply edit this dictionary to rename columns without using the UI
+}
+
+# Columns shown in the table for a new session, and again after the column manager's Reset
+DEFAULT_VISIBLE_COLUMNS = [
+    'Person_UUID', 'lead_first_name', 'Lead_Status', 'Lead_Status_Detail',
+    'Has_L2QR', 'Activity_Count', 'Speed_to_Lead', 
+    'Activity_Inbound_Calls', 'Activity_Outbound_Calls', 'Activity_Text_Messages',
+    'Activity_Emails', 'Activity_Voicemails', 'Activity_Form_Fills',
+    'Is_Converted_Bool', 'Lead_RecordId'
+]
+
+# Declared column types for person_master files - applied automatically when data is loaded
+# 'category': low-cardinality text stored once per distinct value
+# 'text': kept as plain strings (IDs, phones, zip codes must not be parsed as numbers)
+# 'boolean': truthy flags ('true'/'yes'/'1') stored as True/False, missing values count as False
+# 'count': small integer counts stored as nullable 32-bit integers
+# 'datetime': parsed timestamps
+# 'duration': elapsed seconds as 32-bit floats
+# Columns not listed here keep the type pandas infers
+COLUMN_SCHEMA = {
+    # Person and Identity Fields
+    'Person_UUID': 'text',
+    'Email_Clean': 'text',
+    'Phone_Clean': 'text',
+    
+    # Lead Information
+    'Lead_Status': 'category',
+    'Lead_Status_Detail': 'category',
+    'Lead_Source': 'category',
+    'Lead_RecordId': 'text',
+    'Is_Converted_Bool': 'boolean',
+    'Has_L2QR': 'boolean',
+    'LeadCreatedDate': 'datetime',
+    'ConvertedDate': 'datetime',
+    
+    # Activity Metrics
+    'Activity_Count': 'count',
+    'Activity_Inbound_Calls': 'count',
+    'Activity_Outbound_Calls': 'count',
+    'Activity_Text_Messages': 'count',
+    'Activity_Emails': 'count',
+    'Activity_Voicemails': 'count',
+    'Activity_Form_Fills': 'count',
+    
+    # Speed and Performance Metrics
+    'Speed_to_Lead': 'text',
+    'Speed_to_Lead_Seconds': 'duration',  # Derived from Speed_to_Lead, see add_speed_to_lead_seconds
+    'First_Call_DateTime': 'datetime',
+    'Activity_First_Touch': 'datetime',
+    
+    # Company and Contact Information
+    'lead_city': 'category',
+    'lead_state': 'category',
+    'lead_country': 'category',
+    'lead_postal_code': 'text',
+    
+    # Marketing and Campaign Fields
+    'utm_source': 'category',
+    'utm_medium': 'category',
+    'utm_campaign': 'category',
+    'utm_content': 'category',
+    'utm_term': 'category',
+    
+    # Owner and Assignment
+    'Lead_Owner': 'category',
+    'Lead_Owner_Role': 'category',
+    
+    # Additional metrics and fields
+    'MQL_Date': 'datetime',
+    'SQL_Date': 'datetime',
+    'Days_to_Convert': 'count',
+}
+
+# Export formats offered next to the download buttons: label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+}
+if pa is not None:
+    EXPORT_FORMATS['Parquet'] = ('parquet', 'application/vnd.apache.parquet')
+
+# Rows serialized per step when writing CSV exports (bounds transient memory)
+EXPORT_CHUNK_ROWS = 100_000
+# Timestamp format in CSV exports. Set explicitly because pandas picks a format per chunk:
+# a chunk whose timestamps all fall at midnight would otherwise be written date-only
+EXPORT_DATE_FORMAT = '%Y-%m-%d %H:%M:%S%z'
+
+# Memory of the instance the viewer runs on, in MB (override with SURSTITCH_MEMORY_MB)
+INSTANCE_MEMORY_MB = int(os.environ.get('SURSTITCH_MEMORY_MB', '1024'))
+# Memory an in-memory dataset takes per MB of CSV: the frame is about 2.7x the file and
+# its search index about another 1.8x (measured on benchmarks/generate_person_master.py output)
+CSV_MEMORY_EXPANSION = 4.5
+# Files larger than this (in MB) are not loaded into memory - they are ingested in chunks
+# into an on-disk Parquet store and served in streaming mode, where DuckDB runs filters,
+# search, breakdowns and exports straight off the store
+# With DuckDB installed the default keeps one loaded file within half the instance memory
+# (about 113 MB of CSV for 1 GB). Without it a streamed file only offers KPIs and paged
+# rows, so the default lets one file use the whole instance memory instead (about 227 MB,
+# some 700k rows). Override with the SURSTITCH_STREAMING_MB environment variable
+STREAMING_THRESHOLD_MB = int(os.environ.get(
+    'SURSTITCH_STREAMING_MB', INSTANCE_MEMORY_MB * (0.5 if duckdb is not None else 1.0) / CSV_MEMORY_EXPANSION
+))
+# Rows per CSV chunk (and per Parquet row group) during streaming ingestion
+STREAM_CHUNK_ROWS = 100_000
+
+# Per-snapshot KPI rollups for trends across person_master files are kept in this SQLite
+# file inside the sidecar folder (override the full path with SURSTITCH_HISTORY_DB)
+HISTORY_DB_NAME = 'snapshot_history.sqlite'
+
+# Named table views (visible columns, labels, filters) are saved in this SQLite file next
+# to the snapshot history (override the full path with SURSTITCH_VIEWS_DB)
+VIEWS_DB_NAME = 'saved_views.sqlite'
+# Filter selections stored in a view, with the value meaning "no filter"
+VIEW_FILTERS = {'status': 'All', 'source': 'All', 'conversion': 'All', 'search': ''}
+
+# Query engine for table filters, search, filtered KPIs and exports
+# 'pandas' uses the in-memory indexes; 'duckdb' (when installed) compiles them to SQL,
+# which also makes filters and exports available for files served in streaming mode
+# Override the default with the SURSTITCH_BACKEND environment variable
+QUERY_BACKENDS = ['pandas', 'duckdb'] if duckdb is not None else ['pandas']
+DEFAULT_QUERY_BACKEND = os.environ.get('SURSTITCH_BACKEND', 'pandas')
+if DEFAULT_QUERY_BACKEND not in QUERY_BACKENDS:
+    DEFAULT_QUERY_BACKEND = 'pandas'
+# Memory DuckDB may use before spilling to its temp directory (override with SURSTITCH_DUCKDB_MEMORY)
+DUCKDB_MEMORY_LIMIT = os.environ.get('SURSTITCH_DUCKDB_MEMORY', '512MB')
+
+# Columns the KPI breakdown view can group by
+BREAKDOWN_DIMENSIONS = ['Lead_Owner', 'Lead_Source', 'utm_campaign', 'lead_state']
+# Group shown for rows without a value in the breakdown column
+BREAKDOWN_BLANK_LABEL = '(blank)'
+# Columns of a breakdown table, in display order
+BREAKDOWN_COLUMNS = [
+    'lead_count', 'l2qr_count', 'converted_count',
+    'lead_to_l2qr_pct', 'lead_to_convert_pct', 'l2qr_to_convert_pct', 'median_speed_to_lead_seconds',
+]
+
+# Performance instrumentation - per-stage timings of every run are shown in the sidebar
+# "Performance" expander; set SURSTITCH_PERF_LOG to a file path to also append each run
+# (and each export) there as one JSON object per line for offline analysis
+PERF_LOG_PATH = os.environ.get('SURSTITCH_PERF_LOG')
+
+# Values treated as True in boolean flag columns (compared case-insensitively)
+TRUTHY_VALUES = ['true', 'yes', '1']
+
+# Memory budget (in MB) for parsed datasets kept in the shared dataset cache
+# The cache is shared by all sessions; least recently used datasets are evicted once over budget
+# Override with the SURSTITCH_CACHE_MB environment variable
+DATASET_CACHE_BUDGET_MB = int(os.environ.get('SURSTITCH_CACHE_MB', '1024'))
+# A dataset viewed by a session stays pinned in the cache until the session has been idle
+# this long (in seconds); pinned datasets are never evicted, so sessions keep sharing one copy
+SESSION_LEASE_SECONDS = int(os.environ.get('SURSTITCH_SESSION_LEASE_SECONDS', '900'))
+
+# Background watcher - new or changed person_master files in Output-Files are loaded and
+# indexed in a worker thread, so sessions open them warm from the shared dataset cache
+# Poll interval in seconds (override with SURSTITCH_WATCH_SECONDS; 0 turns the watcher off)
+WATCH_INTERVAL_SECONDS = float(os.environ.get('SURSTITCH_WATCH_SECONDS', '30'))
+# Number of most recent files kept preloaded (override with SURSTITCH_PRELOAD_FILES)
+PRELOAD_FILES = int(os.environ.get('SURSTITCH_PRELOAD_FILES', '2'))
+# Files modified more recently than this (in seconds) may still be being written and are
+# picked up on a later poll
+WATCH_SETTLE_SECONDS = 5
+
+# Columnar snapshots - each person_master CSV is converted once to an Arrow IPC (Feather)
+# sidecar in this sub-folder next to the CSV, which is memory-mapped on later loads
+SIDECAR_DIR_NAME = '.surstitch_cache'
+# Bump this when the parsed DataFrame layout changes so existing sidecars get rebuilt
+SIDECAR_FORMAT_VERSION = '4'
+
+def find_output_files():
+    """Find all person_master CSV files in Output-Files directory"""
+    # Try different paths for local development
+    possible_paths = [
+        Path("Output-Files"),  # If running from main SurStitch directory
+        Path("../../Output-Files"),  # If running from UI/STREAMLIT
+        Path("D:/08 - APPS & DEVELOPMENT/salesforce-data-anlayzer/SurStitch/Output-Files"),  # Absolute path
+    ]
+    
+    for base_path in possible_paths:
+        if base_path.exists():
+            csv_files = list(base_path.glob("person_master_*.csv"))
+            if csv_files:
+                return sorted(csv_files, reverse=True)
+    return []
+
+class DatasetCache:
+    """Process-wide registry of loaded Datasets with a memory budget.
+    
+    Entries are keyed by dataset keys (see file_dataset_key / upload_dataset_key),
+    so an unchanged file or upload is parsed once and then shared by every session,
+    along with the indexes each Dataset builds. Cached Datasets are read-only.
+    
+    Sessions hold the datasets they view via acquire(), which each run replaces,
+    so switching datasets releases the old ones. Streamlit has no session-end
+    callback, so a closed session's hold lapses when its lease expires. Held
+    entries are never evicted - otherwise a session still using an evicted frame
+    and the next session reloading it would hold two copies. Only unheld entries
+    are evicted, least recently used first, once over budget.
+    Datasets grow as their indexes and memoized results are built, so entries
+    are re-measured (Dataset.nbytes) before every eviction check.
+    """
+    
+    def __init__(self, budget_bytes, lease_seconds=SESSION_LEASE_SECONDS):
+        self.budget_bytes = budget_bytes
+        self.lease_seconds = lease_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (dataset, nbytes), least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._leases = {}  # session id -> (keys held, last seen)
+    
+    def acquire(self, session_id, keys):
+        """Set the datasets a session currently uses, releasing any it held before
+        
+        Called on every run, which also renews the session's lease. Leases of
+        sessions that stop running expire after lease_seconds.
+        """
+        keys = frozenset(key for key in keys if key is not None)
+        self._measure()
+        with self._lock:
+            if keys:
+                self._leases[session_id] = (keys, time.monotonic())
+            else:
+                self._leases.pop(session_id, None)
+            self._evict()
+    
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+    
+    def has_room(self, nbytes):
+        """Whether nbytes more fit in the budget without evicting anything"""
+        with self._lock:
+            return self._total_bytes + nbytes <= self.budget_bytes
+    
+    def discard(self, key):
+        """Drop an entry unless a session holds it (e.g. an outdated version of a file)"""
+        with self._lock:
+            if key in self._entries and key not in self._held_keys():
+                self._total_bytes -= self._entries.pop(key)[1]
+                return True
+            return False
+    
+    def get_or_load(self, key, loader):
+        """Return the cached Dataset for key, calling loader() only on a miss"""
+        with self._lock:
+            dataset = self._lookup(key)
+            if dataset is not None:
+                return dataset
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        
+        # Only one session parses a given key; the others wait and then hit the cache
+        with key_lock:
+            with self._lock:
+                dataset = self._lookup(key)
+                if dataset is not None:
+                    return dataset
+                self.misses += 1
+            try:
+                dataset = loader()
+                if dataset is not None:
+                    self.put(key, dataset)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+        return dataset
+    
+    def peek(self, key):
+        """The cached Dataset for key or None, without counting a hit or miss or touching LRU order"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+    
+    def put(self, key, dataset):
+        """Insert or replace an entry, evicting least recently used entries over budget"""
+        self._measure()
+        nbytes = dataset.nbytes
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (dataset, nbytes)
+            self._total_bytes += nbytes
+            self._evict(keep=key)
+    
+    def _measure(self):
+        # Sizes are taken outside the lock - measuring may wait on a dataset's own locks
+        with self._lock:
+            entries = [(key, dataset) for key, (dataset, _) in self._entries.items()]
+        sizes = [(key, dataset, dataset.nbytes) for key, dataset in entries]
+        with self._lock:
+            for key, dataset, nbytes in sizes:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] is dataset:
+                    self._total_bytes += nbytes - entry[1]
+                    self._entries[key] = (dataset, nbytes)
+    
+    def _held_keys(self):
+        # Caller must hold self._lock
+        cutoff = time.monotonic() - self.lease_seconds
+        for session_id, (_, last_seen) in list(self._leases.items()):
+            if last_seen < cutoff:
+                del self._leases[session_id]
+        held = set()
+        for keys, _ in self._leases.values():
+            held |= keys
+        return held
+    
+    def _evict(self, keep=None):
+        # Caller must hold self._lock. The newest entry (keep) stays even if it alone exceeds the budget
+        if self._total_bytes <= self.budget_bytes:
+            return
+        held = self._held_keys()
+        for key in [key for key in self._entries if key != keep and key not in held]:
+            if self._total_bytes <= self.budget_bytes:
+                break
+            _, freed = self._entries.pop(key)
+            self._total_bytes -= freed
+            self.evictions += 1
+    
+    def stats(self):
+        """Snapshot of cache counters for display"""
+        with self._lock:
+            held = self._held_keys()
+            return {
+                'entries': len(self._entries),
+                'held': sum(key in held for key in self._entries),
+                'sessions': len(self._leases),
+                'bytes': self._total_bytes,
+                'budget_bytes': self.budget_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+    
+    def _lookup(self, key):
+        # Caller must hold self._lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+def file_dataset_key(file_path):
+    """Cache key for a local file: path + modification time + size"""
+    path = Path(file_path)
+    stat = path.stat()
+    return ('file', str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+
+def csv_read_dtypes(unlisted_as_text=False):
+    """dtype mapping for pd.read_csv derived from COLUMN_SCHEMA
+    
+    Text and categorical columns are typed while tokenizing, which skips inference.
+    Flags are read as categories so they can be converted per distinct value.
+    Counts and dates are converted after parsing (see apply_schema) because
+    malformed values must become missing instead of failing the whole load.
+    
+    With unlisted_as_text, every other column is read as text too. Chunked reads
+    need this: inference looks at one chunk only, so a column that is blank for
+    a whole chunk would come back as float64 there and as text elsewhere.
+    """
+    read_types = {'category': 'category', 'boolean': 'category', 'text': str}
+    dtypes = {col: read_types[kind] for col, kind in COLUMN_SCHEMA.items() if kind in read_types}
+    if unlisted_as_text:
+        # Counts, dates and durations are still converted by apply_schema
+        return defaultdict(lambda: str, dtypes)
+    return dtypes
+
+def to_boolean_flag(series):
+    """Normalize a truthy text/categorical column to a plain boolean column
+    
+    This runs once at load time so metrics and filters can sum and mask
+    the column directly instead of re-matching strings on every rerun.
+    """
+    if series.dtype == bool:
+        return series
+    if series.dtype == 'boolean':
+        return series.fillna(False).astype(bool)
+    values = series.astype('category')
+    # Compare each distinct value once instead of every row; the extra
+    # trailing False is picked up by code -1 (missing value)
+    truthy = values.cat.categories.astype(str).str.lower().isin(TRUTHY_VALUES)
+    lookup = np.append(truthy, False)
+    return pd.Series(lookup[values.cat.codes.to_numpy()], index=series.index, name=series.name)
+
+def to_count(series):
+    """Convert a numeric column to a compact nullable integer column"""
+    if series.dtype == 'Int32':
+        return series
+    numbers = pd.to_numeric(series, errors='coerce')
+    # Keep fractional values (e.g. averaged exports) rather than truncating them
+    if (numbers.dropna() % 1 != 0).any():
+        return numbers.astype('float32')
+    return numbers.astype('Int32')
+
+def to_datetime_column(series):
+    """Parse a timestamp column, leaving it unchanged if it can't be parsed consistently"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    try:
+        parsed = pd.to_datetime(series, errors='coerce')
+        # The fast path infers one format from the first value; retry mixed formats per value
+        if parsed.notna().sum() < series.notna().sum():
+            parsed = pd.to_datetime(series, errors='coerce', format='mixed')
+    except (ValueError, TypeError):
+        return series
+    if not pd.api.types.is_datetime64_any_dtype(parsed):
+        # Mixed timezone offsets come back as objects - not worth a lossy conversion
+        return series
+    return parsed
+
+def parse_duration_seconds(series):
+    """Parse HH:MM / HH:MM:SS / 'N days HH:MM:SS' durations into seconds (NaN if unparseable)"""
+    # Durations repeat heavily, so parse each distinct value once and map back by code
+    codes, uniques = pd.factorize(series)
+    parts = pd.Series(uniques, dtype=object).astype(str).str.strip().str.extract(
+        r'^(?:(\d+)\s*days?,?\s*)?(\d+):(\d{1,2})(?::(\d{1,2}(?:\.\d+)?))?$'
+    ).astype(float)
+    seconds = (
+        parts[0].fillna(0) * 86400
+        + parts[1] * 3600
+        + parts[2] * 60
+        + parts[3].fillna(0)
+    ).to_numpy(dtype='float32')
+    # Trailing NaN is picked up by code -1 (missing value)
+    lookup = np.append(seconds, np.float32(np.nan))
+    return pd.Series(lookup[codes], index=series.index, name='Speed_to_Lead_Seconds')
+
+def format_duration(seconds):
+    """Format seconds as HH:MM (hours may exceed 24)"""
+    if seconds is None or math.isnan(seconds):
+        return '00:00'
+    total_minutes = int(round(seconds / 60))
+    return f"{total_minutes // 60:02d}:{total_minutes % 60:02d}"
+
+def add_speed_to_lead_seconds(df):
+    """Add the numeric Speed_to_Lead_Seconds column parsed from Speed_to_Lead (idempotent)"""
+    if 'Speed_to_Lead' in df.columns and 'Speed_to_Lead_Seconds' not in df.columns:
+        df['Speed_to_Lead_Seconds'] = parse_duration_seconds(df['Speed_to_Lead'])
+    return df
+
+def apply_schema(df):
+    """Apply COLUMN_SCHEMA to a loaded DataFrame (idempotent)"""
+    for col, kind in COLUMN_SCHEMA.items():
+        if col not in df.columns:
+            continue
+        if kind == 'category' and df[col].dtype != 'category':
+            df[col] = df[col].astype('category')
+        elif kind == 'boolean':
+            df[col] = to_boolean_flag(df[col])
+        elif kind == 'count':
+            df[col] = to_count(df[col])
+        elif kind == 'datetime':
+            df[col] = to_datetime_column(df[col])
+        elif kind == 'duration' and df[col].dtype != 'float32':
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    return df
+
+def prepare_dataset(df):
+    """Post-parse fixups shared by CSV and sidecar loads (must be idempotent)"""
+    # Ensure required columns exist
+    required_cols = ['Person_UUID', 'Lead_Status', 'Lead_Source']
+    for col in required_cols:
+        if col not in df.columns:
+            df[col] = 'Unknown'
+    
+    df = add_speed_to_lead_seconds(df)
+    return apply_schema(df)
+
+def sidecar_path(csv_path):
+    """Location of the columnar sidecar for a person_master CSV"""
+    csv_path = Path(csv_path)
+    return csv_path.parent / SIDECAR_DIR_NAME / f"{csv_path.stem}.feather"
+
+def sidecar_stamp(csv_path):
+    """Schema metadata tying a sidecar to the exact CSV version it was built from"""
+    stat = Path(csv_path).stat()
+    return {
+        b'surstitch_format': SIDECAR_FORMAT_VERSION.encode(),
+        b'surstitch_source_mtime_ns': str(stat.st_mtime_ns).encode(),
+        b'surstitch_source_size': str(stat.st_size).encode(),
+    }
+
+def read_sidecar(csv_path, stamp):
+    """Load the sidecar for csv_path, or return None if it is missing or stale"""
+    if feather is None:
+        return None
+    path = sidecar_path(csv_path)
+    if not path.exists():
+        return None
+    try:
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            # Only the schema is read here, so stale sidecars are rejected cheaply
+            metadata = reader.schema.metadata or {}
+            if any(metadata.get(k) != v for k, v in stamp.items()):
+                return None
+            table = reader.read_all()
+        return table.to_pandas()
+    except (OSError, pa.ArrowException):
+        return None
+
+def write_sidecar(csv_path, df, stamp):
+    """Write a columnar sidecar for csv_path; failures just mean the CSV is parsed next time"""
+    if feather is None:
+        return
+    path = sidecar_path(csv_path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **stamp})
+        path.parent.mkdir(exist_ok=True)
+        # Uncompressed so the file can be memory-mapped; rename makes the swap atomic
+        feather.write_feather(table, str(tmp_path), compression='uncompressed')
+        os.replace(tmp_path, path)
+    except (OSError, pa.ArrowException):
+        # Read-only deployments (e.g. Streamlit Cloud) and mixed-type columns fall back to CSV
+        tmp_path.unlink(missing_ok=True)
+
+def read_dataset(file_path=None, uploaded_file=None):
+    """Parse a person_master CSV from a file path or uploaded file"""
+    if uploaded_file is not None:
+        # Read from the raw bytes so repeated reads don't depend on the buffer position
+        return prepare_dataset(pd.read_csv(io.BytesIO(uploaded_file.getvalue()), dtype=csv_read_dtypes()))
+    
+    # Prefer the columnar sidecar; build it the first time this CSV version is seen
+    stamp = sidecar_stamp(file_path)
+    df = read_sidecar(file_path, stamp)
+    if df is not None:
+        return prepare_dataset(df)
+    
+    df = prepare_dataset(pd.read_csv(file_path, dtype=csv_read_dtypes()))
+    write_sidecar(file_path, df, stamp)
+    return df
+
+def concat_chunks(chunks):
+    """Concatenate prepared chunks of one file, keeping categorical columns categorical
+    
+    pd.concat falls back to object dtype when chunks have different categories,
+    so each categorical column is first given the union of the chunks' categories.
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+    categories = {}
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            values = pd.Index([])
+            for chunk in chunks:
+                values = values.union(chunk[col].cat.categories, sort=False)
+            categories[col] = pd.CategoricalDtype(values)
+    return pd.concat([chunk.astype(categories) for chunk in chunks], ignore_index=True)
+
+class StreamedDataset:
+    """A person_master file served from an on-disk Parquet store instead of memory
+    
+    The CSV is read in chunks of STREAM_CHUNK_ROWS rows; each chunk goes through
+    the normal load pipeline (prepare_dataset), is appended to the store as one
+    row group and contributes partial KPI aggregates. Only the metric columns and
+    the row groups behind the visible page are ever read back.
+    """
+    
+    def __init__(self, store_path, partials=None):
+        self.store_path = Path(store_path)
+        self._file = pq.ParquetFile(str(self.store_path))
+        self.n_rows = self._file.metadata.num_rows
+        self.columns = self._file.schema_arrow.names
+        # Starting row of each row group, for locating pages
+        self._group_starts = np.cumsum(
+            [0] + [self._file.metadata.row_group(i).num_rows for i in range(self._file.num_row_groups)]
+        )
+        self._partials = partials
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def open(cls, csv_path, progress=None):
+        """Open the store for csv_path, building it first if it is missing or stale
+        
+        Args:
+            csv_path: Path of the source person_master CSV
+            progress: Optional callable(rows_done, bytes_done, bytes_total) called per chunk
+        """
+        if pq is None:
+            raise RuntimeError("Streaming mode requires pyarrow")
+        csv_path = Path(csv_path)
+        store_path = csv_path.parent / SIDECAR_DIR_NAME / f"{csv_path.stem}.parquet"
+        stamp = sidecar_stamp(csv_path)
+        if store_path.exists():
+            metadata = pq.read_schema(str(store_path)).metadata or {}
+            if all(metadata.get(k) == v for k, v in stamp.items()):
+                return cls(store_path)
+        partials = cls.ingest(csv_path, store_path, stamp, progress=progress)
+        return cls(store_path, partials=partials)
+    
+    @staticmethod
+    def ingest(csv_path, store_path, stamp, progress=None):
+        """Stream csv_path into a Parquet store, returning combined metric partials"""
+        store_path.parent.mkdir(exist_ok=True)
+        tmp_path = store_path.with_name(store_path.name + '.tmp')
+        total_bytes = csv_path.stat().st_size
+        writer = None
+        schema = None
+        chunk_partials = []
+        rows_done = 0
+        try:
+            with open(csv_path, 'rb') as handle:
+                # Unlisted columns are read as text so every chunk has the same column types
+                reader = pd.read_csv(handle, dtype=csv_read_dtypes(unlisted_as_text=True), chunksize=STREAM_CHUNK_ROWS)
+                for chunk in reader:
+                    chunk = prepare_dataset(chunk)
+                    chunk_partials.append(metric_partials(chunk))
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if schema is None:
+                        schema = StreamedDataset._store_schema(table.schema, stamp)
+                        writer = pq.ParquetWriter(str(tmp_path), schema)
+                    # Per-chunk categoricals and all-empty columns are cast to the store schema
+                    writer.write_table(table.cast(schema))
+                    rows_done += len(chunk)
+                    if progress is not None:
+                        progress(rows_done, handle.tell(), total_bytes)
+        except BaseException:
+            # Don't leave a half-written store behind
+            if writer is not None:
+                writer.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        if writer is None:
+            raise ValueError(f"{csv_path.name} contains no rows")
+        writer.close()
+        os.replace(tmp_path, store_path)
+        return combine_metric_partials(chunk_partials)
+    
+    @staticmethod
+    def _store_schema(chunk_schema, stamp):
+        # Chunks get their own categorical dictionaries, so the store keeps plain strings;
+        # all-empty columns in the first chunk are typed as strings for later chunks
+        fields = []
+        for field in chunk_schema:
+            if pa.types.is_dictionary(field.type):
+                field = field.with_type(field.type.value_type)
+            elif pa.types.is_null(field.type):
+                field = field.with_type(pa.string())
+            fields.append(field)
+        return pa.schema(fields, metadata=stamp)
+    
+    def metrics(self):
+        """KPI metrics over all rows, reading only the metric columns"""
+        with self._lock:
+            if self._partials is None:
+                columns = [col for col in METRIC_COLUMNS if col in self.columns]
+                self._partials = combine_metric_partials(
+                    metric_partials(batch.to_pandas())
+                    for batch in self._file.iter_batches(batch_size=STREAM_CHUNK_ROWS, columns=columns)
+                )
+            return finalize_metrics(self._partials)
+    
+    def read_columns(self, columns):
+        """Whole columns as a DataFrame - only for a few narrow columns"""
+        with self._lock:
+            return self._file.read(columns=columns).to_pandas()
+    
+    def read_rows(self, start, stop, columns):
+        """Rows [start, stop) of the given columns, reading only the row groups that hold them"""
+        stop = min(stop, self.n_rows)
+        if start >= stop:
+            return pd.DataFrame(columns=columns)
+        first = int(np.searchsorted(self._group_starts, start, side='right')) - 1
+        last = int(np.searchsorted(self._group_starts, stop - 1, side='right')) - 1
+        with self._lock:
+            table = self._file.read_row_groups(list(range(first, last + 1)), columns=columns)
+        offset = start - int(self._group_starts[first])
+        return table.slice(offset, stop - start).to_pandas()
+
+def exceeds_streaming_threshold(file_path):
+    """Whether a local file is too large to load into memory"""
+    return pq is not None and Path(file_path).stat().st_size > STREAMING_THRESHOLD_MB * 1024 * 1024
+
+def estimated_memory_bytes(file_path):
+    """Rough memory a local file takes once loaded and indexed (streamed files stay on disk)"""
+    if exceeds_streaming_threshold(file_path):
+        return 0
+    return int(Path(file_path).stat().st_size * CSV_MEMORY_EXPANSION)
+
+# Columns the snapshot diff adds in front of the data columns
+DIFF_COLUMNS = ['Change_Type', 'Changed_Columns']
+
+class SnapshotDiff:
+    """Row-level differences between two person_master snapshots, keyed on Person_UUID
+    
+    Rows are matched with a hash join on the key (pd.Index.get_indexer) and every
+    shared column is compared as a whole array, so no rows are compared one at a
+    time. Duplicate keys keep their first row.
+    
+    Attributes:
+        added_count / removed_count / changed_count / unchanged_count: Row counts
+        duplicate_keys: Rows ignored because their key repeats within a snapshot
+        column_changes: Series of changed-row counts per column (descending)
+        frame: Added, changed and removed rows with DIFF_COLUMNS in front -
+            added/changed rows carry current values, removed rows baseline values
+    """
+    
+    KEY = 'Person_UUID'
+    # Derived columns repeat changes of their source column
+    IGNORED_COLUMNS = {'Speed_to_Lead_Seconds'}
+    
+    def __init__(self, baseline_df, current_df):
+        baseline = baseline_df.drop_duplicates(subset=self.KEY)
+        current = current_df.drop_duplicates(subset=self.KEY)
+        self.duplicate_keys = (len(baseline_df) - len(baseline)) + (len(current_df) - len(current))
+        
+        # Hash join both ways: position of each key in the other snapshot (-1 = absent)
+        baseline_keys = pd.Index(baseline[self.KEY])
+        current_keys = pd.Index(current[self.KEY])
+        in_baseline = baseline_keys.get_indexer(current_keys)
+        in_current = current_keys.get_indexer(baseline_keys)
+        
+        added = np.flatnonzero(in_baseline == -1)
+        removed = np.flatnonzero(in_current == -1)
+        matched_current = np.flatnonzero(in_baseline != -1)
+        matched_baseline = in_baseline[matched_current]
+        
+        compared = [
+            col for col in current.columns
+            if col in baseline.columns and col != self.KEY and col not in self.IGNORED_COLUMNS
+        ]
+        differs = np.zeros((len(matched_current), len(compared)), dtype=bool)
+        for i, col in enumerate(compared):
+            differs[:, i] = self._column_differs(
+                current[col].iloc[matched_current], baseline[col].iloc[matched_baseline]
+            )
+        
+        changed_rows = differs.any(axis=1)
+        changed = matched_current[changed_rows]
+        self.added_count = len(added)
+        self.removed_count = len(removed)
+        self.changed_count = len(changed)
+        self.unchanged_count = len(matched_current) - len(changed)
+        self.column_changes = pd.Series(differs.sum(axis=0), index=compared, dtype='int64')
+        self.column_changes = self.column_changes[self.column_changes > 0].sort_values(ascending=False)
+        
+        # Label each changed row by its pattern of changed columns (few distinct patterns)
+        patterns, pattern_of_row = np.unique(differs[changed_rows], axis=0, return_inverse=True)
+        pattern_labels = np.array(
+            [', '.join(col for col, hit in zip(compared, pattern) if hit) for pattern in patterns],
+            dtype=object,
+        )
+        
+        parts = [
+            current.iloc[added].assign(Change_Type='Added', Changed_Columns=''),
+            current.iloc[changed].assign(Change_Type='Changed', Changed_Columns=pattern_labels[pattern_of_row.ravel()]),
+            baseline.iloc[removed].assign(Change_Type='Removed', Changed_Columns=''),
+        ]
+        frame = pd.concat(parts, ignore_index=True)
+        frame['Change_Type'] = frame['Change_Type'].astype('category')
+        self.frame = frame[DIFF_COLUMNS + [col for col in frame.columns if col not in DIFF_COLUMNS]]
+    
+    @staticmethod
+    def _column_differs(current_values, baseline_values):
+        # Categoricals from different files have different categories - compare values
+        if isinstance(current_values.dtype, pd.CategoricalDtype):
+            current_values = current_values.astype(object)
+        if isinstance(baseline_values.dtype, pd.CategoricalDtype):
+            baseline_values = baseline_values.astype(object)
+        current_values = current_values.reset_index(drop=True)
+        baseline_values = baseline_values.reset_index(drop=True)
+        
+        differs = current_values != baseline_values
+        if differs.dtype != bool:
+            # Nullable dtypes give NA when either side is missing
+            differs = differs.fillna(True).astype(bool)
+        both_missing = current_values.isna() & baseline_values.isna()
+        return (differs & ~both_missing).to_numpy(dtype=bool)
+
+class StreamedSnapshotDiff:
+    """SnapshotDiff computed by DuckDB, for snapshots served in streaming mode
+    
+    Either snapshot can be a Parquet store or a DataFrame. DuckDB matches rows on
+    the key and compares the matched rows column by column, spilling to disk if
+    needed. Only row positions and change labels come back; the added, changed
+    and removed rows are then copied chunk by chunk, in file order, into a
+    Parquet store of their own that is served like any streamed dataset. Counts,
+    column_changes and row order are those of SnapshotDiff.
+    
+    Attributes:
+        Those of SnapshotDiff, except frame (None)
+        streamed: StreamedDataset over the added, changed and removed rows
+    """
+    
+    KEY = SnapshotDiff.KEY
+    IGNORED_COLUMNS = SnapshotDiff.IGNORED_COLUMNS
+    
+    def __init__(self, baseline_source, current_source):
+        self._temp_dir = tempfile.TemporaryDirectory(prefix='surstitch_diff_')
+        self.store_path = Path(self._temp_dir.name) / 'diff.parquet'
+        self.frame = None
+        conn = duckdb.connect(config={
+            'memory_limit': DUCKDB_MEMORY_LIMIT,
+            'temp_directory': self._temp_dir.name,
+        })
+        try:
+            conn.execute("SET enable_progress_bar = false")
+            added, changed, changed_labels, removed = self._compare(conn, baseline_source, current_source)
+        finally:
+            conn.close()
+        self._write(baseline_source, current_source, added, changed, changed_labels, removed)
+        self.streamed = StreamedDataset(self.store_path)
+    
+    @staticmethod
+    def _rows_view(conn, name, source):
+        # Rows with their position in the snapshot (_row), for keeping first duplicates and file order
+        if isinstance(source, pd.DataFrame):
+            ordinal = pd.Series(np.arange(len(source)), index=source.index, name='_row')
+            conn.register(f"{name}_frame", pd.concat([source, ordinal], axis=1, copy=False))
+            conn.execute(f"CREATE VIEW {name} AS SELECT * FROM {name}_frame")
+        else:
+            path = str(source).replace("'", "''")
+            conn.execute(
+                f"CREATE VIEW {name} AS SELECT * EXCLUDE (file_row_number), file_row_number AS _row "
+                f"FROM read_parquet('{path}', file_row_number=true)"
+            )
+        return {row[0]: row[1] for row in conn.execute(f"DESCRIBE {name}").fetchall() if row[0] != '_row'}
+    
+    @staticmethod
+    def _differs(col, current_type, baseline_type):
+        # SQL for "the column differs between the matched rows c and b"
+        current, baseline = f"c.{quote_identifier(col)}", f"b.{quote_identifier(col)}"
+        is_text = lambda sql_type: sql_type == 'VARCHAR' or sql_type.startswith('ENUM')
+        if current_type == baseline_type or not (is_text(current_type) or is_text(baseline_type)):
+            return f"{current} IS DISTINCT FROM {baseline}"
+        if is_text(current_type) and is_text(baseline_type):
+            return f"CAST({current} AS VARCHAR) IS DISTINCT FROM CAST({baseline} AS VARCHAR)"
+        # Streamed stores keep unlisted columns as text: that side is converted to the other
+        # side's type, and text that doesn't convert counts as a change
+        if is_text(current_type):
+            text, other, other_type = current, baseline, baseline_type
+        else:
+            text, other, other_type = baseline, current, current_type
+        converted = f"TRY_CAST(CAST({text} AS VARCHAR) AS {other_type})"
+        return f"{converted} IS DISTINCT FROM {other} OR ({text} IS NOT NULL AND {converted} IS NULL)"
+    
+    def _compare(self, conn, baseline_source, current_source):
+        baseline_types = self._rows_view(conn, 'baseline_rows', baseline_source)
+        current_types = self._rows_view(conn, 'current_rows', current_source)
+        key = quote_identifier(self.KEY)
+        
+        # First row per key on each side, matched with a full join (NULL keys match like in pandas)
+        conn.execute(
+            f"CREATE TEMP TABLE pairs AS SELECT c._row AS current_row, b._row AS baseline_row "
+            f"FROM (SELECT {key}, min(_row) AS _row FROM current_rows GROUP BY {key}) c "
+            f"FULL JOIN (SELECT {key}, min(_row) AS _row FROM baseline_rows GROUP BY {key}) b "
+            f"ON c.{key} IS NOT DISTINCT FROM b.{key}"
+        )
+        self.duplicate_keys = conn.execute(
+            "SELECT (SELECT count(*) FROM baseline_rows) + (SELECT count(*) FROM current_rows) - "
+            "count(current_row) - count(baseline_row) FROM pairs"
+        ).fetchone()[0]
+        
+        compared = [
+            col for col in current_types
+            if col in baseline_types and col != self.KEY and col not in self.IGNORED_COLUMNS
+        ]
+        flag_names = [f'd{i}' for i in range(len(compared))]
+        flags = ''.join(
+            f", ({self._differs(col, current_types[col], baseline_types[col])}) AS {flag}"
+            for col, flag in zip(compared, flag_names)
+        )
+        conn.execute(
+            f"CREATE TEMP TABLE matched AS SELECT p.current_row{flags} "
+            f"FROM pairs p JOIN current_rows c ON c._row = p.current_row JOIN baseline_rows b ON b._row = p.baseline_row"
+        )
+        any_changed = ' OR '.join(flag_names) or 'false'
+        counts = conn.execute(
+            f"SELECT count(*), count_if({any_changed}){''.join(f', count_if({flag})' for flag in flag_names)} FROM matched"
+        ).fetchone()
+        self.changed_count = counts[1]
+        self.unchanged_count = counts[0] - counts[1]
+        self.column_changes = pd.Series(counts[2:], index=compared, dtype='int64')
+        self.column_changes = self.column_changes[self.column_changes > 0].sort_values(ascending=False)
+        
+        # Positions of the added, changed and removed rows. Changed rows are labeled by their
+        # pattern of changed columns - few distinct patterns, so only a pattern number per row comes back
+        patterns, changed = [], {'current_row': [], 'pattern': []}
+        if compared:
+            conn.execute(
+                f"CREATE TEMP TABLE patterns AS SELECT *, row_number() OVER () - 1 AS pattern "
+                f"FROM (SELECT DISTINCT {', '.join(flag_names)} FROM matched WHERE {any_changed})"
+            )
+            patterns = conn.execute("SELECT * FROM patterns ORDER BY pattern").fetchall()
+            changed = conn.execute(
+                f"SELECT m.current_row, p.pattern FROM matched m JOIN patterns p USING ({', '.join(flag_names)}) "
+                f"ORDER BY m.current_row"
+            ).fetchnumpy()
+        pattern_labels = pa.array(
+            [', '.join(col for col, hit in zip(compared, pattern[:-1]) if hit) for pattern in patterns], pa.string()
+        )
+        added = conn.execute(
+            "SELECT current_row FROM pairs WHERE baseline_row IS NULL ORDER BY current_row"
+        ).fetchnumpy()['current_row']
+        removed = conn.execute(
+            "SELECT baseline_row FROM pairs WHERE current_row IS NULL ORDER BY baseline_row"
+        ).fetchnumpy()['baseline_row']
+        self.added_count = len(added)
+        self.removed_count = len(removed)
+        changed_labels = pa.DictionaryArray.from_arrays(pa.array(np.asarray(changed['pattern'], dtype=np.int32)), pattern_labels)
+        return (
+            np.asarray(added, dtype=np.int64), np.asarray(changed['current_row'], dtype=np.int64),
+            changed_labels, np.asarray(removed, dtype=np.int64),
+        )
+    
+    @staticmethod
+    def _schema(source):
+        if isinstance(source, pd.DataFrame):
+            return pa.Schema.from_pandas(source.head(0), preserve_index=False)
+        return pq.read_schema(str(source))
+    
+    @staticmethod
+    def _batches(source):
+        # (first row position, Arrow table) per chunk of STREAM_CHUNK_ROWS rows, in file order
+        if isinstance(source, pd.DataFrame):
+            for start in range(0, len(source), STREAM_CHUNK_ROWS):
+                yield start, pa.Table.from_pandas(source.iloc[start:start + STREAM_CHUNK_ROWS], preserve_index=False)
+            return
+        start = 0
+        for batch in pq.ParquetFile(str(source)).iter_batches(batch_size=STREAM_CHUNK_ROWS):
+            yield start, pa.Table.from_batches([batch])
+            start += batch.num_rows
+    
+    def _write(self, baseline_source, current_source, added, changed, changed_labels, removed):
+        # Output columns: DIFF_COLUMNS, the current columns, then columns only the baseline has.
+        # Categoricals are stored as plain values; columns typed differently in the two files
+        # get a common type (text if there is none)
+        fields = {}
+        for schema in (self._schema(current_source), self._schema(baseline_source)):
+            for field in schema:
+                field_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+                if field.name not in fields:
+                    fields[field.name] = field_type
+                elif fields[field.name] != field_type:
+                    try:
+                        fields[field.name] = pa.unify_schemas(
+                            [pa.schema([(field.name, fields[field.name])]), pa.schema([(field.name, field_type)])],
+                            promote_options='permissive'
+                        ).field(0).type
+                    except (pa.ArrowInvalid, pa.ArrowTypeError):
+                        fields[field.name] = pa.string()
+        schema = pa.schema(
+            [(col, pa.string()) for col in DIFF_COLUMNS]
+            + [(name, pa.string() if pa.types.is_null(field_type) else field_type) for name, field_type in fields.items()]
+        )
+        
+        writer = pq.ParquetWriter(str(self.store_path), schema)
+        try:
+            parts = [
+                (current_source, added, 'Added', None),
+                (current_source, changed, 'Changed', changed_labels),
+                (baseline_source, removed, 'Removed', None),
+            ]
+            for source, positions, change_type, labels in parts:
+                if len(positions) == 0:
+                    continue
+                for start, table in self._batches(source):
+                    first, last = np.searchsorted(positions, [start, start + table.num_rows])
+                    if first == last:
+                        continue
+                    rows = table.take(pa.array(positions[first:last] - start))
+                    values = {
+                        'Change_Type': pa.array([change_type] * rows.num_rows, pa.string()),
+                        'Changed_Columns': (
+                            labels.slice(first, last - first).cast(pa.string()) if labels is not None
+                            else pa.array([''] * rows.num_rows, pa.string())
+                        ),
+                    }
+                    columns = [
+                        values[field.name] if field.name in values
+                        else rows.column(field.name).cast(field.type) if field.name in rows.column_names
+                        else pa.nulls(rows.num_rows, field.type)
+                        for field in schema
+                    ]
+                    writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+        finally:
+            writer.close()
+
+# Search terms are split into lowercase alphanumeric tokens, each matched as a word prefix
+SEARCH_TOKEN_PATTERN = r'[0-9a-z]+'
+
+def parse_search_query(query, columns, column_labels=None):
+    """Split a search query into (tokens, columns) terms
+    
+    Whitespace-separated terms are AND-ed by the caller. 'column:term' limits a term
+    to columns whose name or label contains 'column'; with no such column the whole
+    term is searched everywhere. Terms without any token are dropped.
+    """
+    column_labels = column_labels or {}
+    terms = []
+    for term in query.split():
+        scope, sep, text = term.partition(':')
+        scoped = []
+        if sep and scope:
+            scope = scope.lower()
+            scoped = [
+                col for col in columns
+                if scope in col.lower() or scope in str(column_labels.get(col, '')).lower()
+            ]
+        if not scoped:
+            # No recognizable scope - search the whole term everywhere
+            scoped, text = list(columns), term
+        tokens = re.findall(SEARCH_TOKEN_PATTERN, text.lower())
+        if tokens:
+            terms.append((tokens, scoped))
+    return terms
+
+def search_query_key(query, column_labels=None):
+    """Hashable key for a search query (None for a blank query)
+    
+    Labels only change what 'column:term' terms match, so they are part of
+    the key only for queries using that syntax.
+    """
+    if not query or not query.strip():
+        return None
+    query = query.strip()
+    if ':' not in query:
+        return (query, None)
+    return (query, tuple(sorted((column_labels or {}).items())))
+
+class SearchIndex:
+    """Inverted token index over all columns for the "Search all fields..." box
+    
+    Every distinct cell value is lowercased and split into alphanumeric tokens once.
+    The vocabulary is kept sorted, so a prefix query is a contiguous range of token
+    ids, and each column maps token ids to the distinct values containing them.
+    A query resolves to a boolean row mask without touching cell text.
+    
+    Query syntax: whitespace-separated terms are AND-ed; every token is a prefix
+    match; 'column:term' limits a term to columns whose name or label contains
+    'column' (e.g. 'email:acme').
+    """
+    
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.columns = list(df.columns)
+        self._row_codes = {}  # col -> distinct value code per row (-1 = missing)
+        self._n_values = {}  # col -> number of distinct values
+        self._postings = {}  # col -> (token ids sorted, value codes)
+        
+        pieces = []
+        for col in self.columns:
+            codes, uniques = pd.factorize(df[col])
+            # int32 halves the largest part of the index (one code per row and column)
+            self._row_codes[col] = codes.astype(np.int32)
+            self._n_values[col] = len(uniques)
+            text = pd.Series(np.asarray(uniques, dtype=object)).astype(str).str.lower()
+            tokens = text.str.findall(SEARCH_TOKEN_PATTERN).explode().dropna()
+            pieces.append(pd.DataFrame({
+                'col': col,
+                'token': tokens.to_numpy(),
+                'value': tokens.index.to_numpy(dtype='int32'),
+            }))
+        
+        pairs = pd.concat(pieces, ignore_index=True) if pieces else pd.DataFrame(columns=['col', 'token', 'value'])
+        # sort=True makes token ids follow lexical order, so prefixes map to id ranges
+        token_ids, self._vocabulary = pd.factorize(pairs['token'], sort=True)
+        self._vocabulary = np.asarray(self._vocabulary, dtype=object)
+        pairs['token_id'] = token_ids.astype('int32')
+        for col, group in pairs.groupby('col', sort=False):
+            group = group.sort_values('token_id', kind='stable')
+            self._postings[col] = (group['token_id'].to_numpy(), group['value'].to_numpy())
+    
+    def search(self, query, column_labels=None):
+        """Resolve a query to a boolean mask over all rows (None if it has no searchable terms)"""
+        mask = None
+        for tokens, columns in parse_search_query(query, self.columns, column_labels):
+            term_mask = self._term_mask(tokens, columns)
+            mask = term_mask if mask is None else mask & term_mask
+        return mask
+    
+    def _token_id_range(self, prefix):
+        # Tokens only contain [0-9a-z], so every token starting with prefix sorts before prefix + '{'
+        lo = int(np.searchsorted(self._vocabulary, prefix, side='left'))
+        hi = int(np.searchsorted(self._vocabulary, prefix + '{', side='left'))
+        return lo, hi
+    
+    def _term_mask(self, tokens, columns):
+        # A term matches a row if one cell value in the searched columns contains all its tokens
+        ranges = [self._token_id_range(token) for token in tokens]
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for col in columns:
+            if col not in self._postings:
+                continue
+            token_ids, values = self._postings[col]
+            codes = self._row_codes[col]
+            value_hits = None
+            for lo, hi in ranges:
+                start, stop = np.searchsorted(token_ids, [lo, hi], side='left')
+                # Extra trailing slot stays False for code -1 (missing value)
+                hits = np.zeros(self._n_values[col] + 1, dtype=bool)
+                hits[values[start:stop]] = True
+                value_hits = hits if value_hits is None else value_hits & hits
+            if value_hits is not None and value_hits.any():
+                mask |= value_hits[codes]
+        return mask
+
+class FilterIndex:
+    """Row masks for the Status / Source / Conversion filters
+    
+    Filter columns are reduced to categorical codes once per dataset and the
+    mask for each selected value is memoized, so applying filters is just
+    AND-ing boolean arrays. Callers materialize only the rows and columns
+    they actually need with select_rows().
+    """
+    
+    FILTER_COLUMNS = {'status': 'Lead_Status', 'source': 'Lead_Source'}
+    
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.options = {}  # filter name -> sorted values present in the data
+        self._codes = {}
+        self._code_of = {}
+        for name, col in self.FILTER_COLUMNS.items():
+            if col not in df.columns:
+                continue
+            values = df[col].astype('category')
+            codes = values.cat.codes.to_numpy()
+            present = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories)) > 0
+            categories = values.cat.categories[present].tolist()
+            self.options[name] = sorted(categories)
+            self._codes[name] = codes
+            self._code_of[name] = {value: code for code, value in enumerate(values.cat.categories)}
+        if 'Is_Converted_Bool' in df.columns:
+            self._converted = df['Is_Converted_Bool'].to_numpy(dtype=bool)
+        else:
+            self._converted = None
+        self._masks = {}
+        self._lock = threading.Lock()
+    
+    def value_mask(self, name, value):
+        """Memoized mask of rows where filter column `name` equals value"""
+        key = (name, value)
+        mask = self._masks.get(key)
+        if mask is None:
+            code = self._code_of[name].get(value, -2)  # -2 never matches
+            mask = self._codes[name] == code
+            with self._lock:
+                self._masks[key] = mask
+        return mask
+    
+    def mask(self, status='All', source='All', conversion='All'):
+        """AND of all active filters as a boolean array over all rows (None if no filter is active)"""
+        masks = []
+        if status != 'All' and 'status' in self._codes:
+            masks.append(self.value_mask('status', status))
+        if source != 'All' and 'source' in self._codes:
+            masks.append(self.value_mask('source', source))
+        if conversion != 'All' and self._converted is not None:
+            masks.append(self._converted if conversion == 'Converted' else ~self._converted)
+        
+        if not masks:
+            return None
+        combined = masks[0].copy()
+        for mask in masks[1:]:
+            combined &= mask
+        return combined
+
+class FilterMetrics:
+    """KPI metric partials per Status / Source / Conversion cell
+    
+    Rows are grouped once per dataset into cells by their filter values, and
+    additive metric partials (see metric_partials) are kept per cell. Filtered
+    KPIs for any filter combination are then the sum of the matching cells'
+    partials; only the Speed_to_Lead values of those cells are read, for the
+    percentiles. With a search query, the partials of the matching rows are
+    grouped the same way once per query, so changing filters under an unchanged
+    search costs no row work either.
+    """
+    
+    # Per-cell partials kept for the most recently used search queries
+    SEARCH_SLOTS = 8
+    
+    def __init__(self, df, filter_index):
+        self._index = filter_index
+        cells = np.zeros(len(df), dtype=np.int64)
+        for name in filter_index.FILTER_COLUMNS:
+            if name in filter_index._codes:
+                # +1 so missing values (code -1) get a cell of their own
+                cells = cells * (len(filter_index._code_of[name]) + 1) + filter_index._codes[name] + 1
+        if filter_index._converted is not None:
+            cells = cells * 2 + filter_index._converted
+        self._cells = pd.factorize(cells)[0]
+        self.n_cells = int(self._cells.max()) + 1 if len(cells) else 0
+        first_rows = np.unique(self._cells, return_index=True)[1]
+        self._cell_codes = {name: codes[first_rows] for name, codes in filter_index._codes.items()}
+        self._cell_converted = filter_index._converted[first_rows] if filter_index._converted is not None else None
+        
+        self._flags = {
+            name: df[col].to_numpy(dtype=bool)
+            for name, col in (('l2qr_count', 'Has_L2QR'), ('converted_count', 'Is_Converted_Bool'))
+            if col in df.columns
+        }
+        self._activity = df['Activity_Count'].to_numpy(dtype='float64', na_value=np.nan) if 'Activity_Count' in df.columns else None
+        self._speed = (
+            df['Speed_to_Lead_Seconds'].to_numpy(dtype='float32', na_value=np.nan)
+            if 'Speed_to_Lead_Seconds' in df.columns else None
+        )
+        self._partials = OrderedDict()  # search key -> per-cell partials
+        self._lock = threading.Lock()
+    
+    def _cell_partials(self, row_mask):
+        """Per-cell partials over the rows in row_mask (None = all rows)"""
+        def cell_counts(rows, weights=None):
+            cells = self._cells if rows is None else self._cells[rows]
+            return np.bincount(cells, weights=weights, minlength=self.n_cells)
+        
+        partials = {'lead_count': cell_counts(row_mask)}
+        for name in ('l2qr_count', 'converted_count'):
+            flags = self._flags.get(name)
+            if flags is None:
+                partials[name] = np.zeros(self.n_cells, dtype=np.int64)
+            else:
+                partials[name] = cell_counts(flags if row_mask is None else flags & row_mask)
+        if self._activity is not None:
+            valid = ~np.isnan(self._activity) if row_mask is None else row_mask & ~np.isnan(self._activity)
+            partials['activity_sum'] = cell_counts(valid, weights=self._activity[valid])
+            partials['activity_rows'] = cell_counts(valid)
+        else:
+            partials['activity_sum'] = partials['activity_rows'] = np.zeros(self.n_cells)
+        
+        # Speed_to_Lead values grouped by cell, so a cell's values are one contiguous slice
+        if self._speed is not None:
+            valid = ~np.isnan(self._speed) if row_mask is None else row_mask & ~np.isnan(self._speed)
+            order = np.argsort(self._cells[valid], kind='stable')
+            partials['speed_seconds'] = self._speed[valid][order]
+            partials['speed_offsets'] = np.concatenate(([0], np.cumsum(cell_counts(valid))))
+        else:
+            partials['speed_seconds'] = np.empty(0, dtype='float32')
+            partials['speed_offsets'] = np.zeros(self.n_cells + 1, dtype=np.int64)
+        return partials
+    
+    def partials(self, search_key=None, search_mask=None):
+        """Per-cell partials for all rows, or for the rows matching a search query"""
+        with self._lock:
+            if search_key in self._partials:
+                self._partials.move_to_end(search_key)
+                return self._partials[search_key]
+        partials = self._cell_partials(search_mask if search_key is not None else None)
+        with self._lock:
+            self._partials[search_key] = partials
+            while len(self._partials) > self.SEARCH_SLOTS + 1:  # + the unsearched partials
+                oldest = next(key for key in self._partials if key is not None)
+                del self._partials[oldest]
+        return partials
+    
+    def metrics(self, status='All', source='All', conversion='All', search_key=None, search_mask=None):
+        """KPI metrics (as calculate_metrics() returns them) for one filter state"""
+        partials = self.partials(search_key, search_mask)
+        matching = np.ones(self.n_cells, dtype=bool)
+        for name, value in (('status', status), ('source', source)):
+            if value != 'All' and name in self._cell_codes:
+                matching &= self._cell_codes[name] == self._index._code_of[name].get(value, -2)
+        if conversion != 'All' and self._cell_converted is not None:
+            matching &= self._cell_converted if conversion == 'Converted' else ~self._cell_converted
+        cells = np.flatnonzero(matching)
+        
+        combined = metric_partials(None)
+        for key in ('lead_count', 'l2qr_count', 'converted_count', 'activity_rows'):
+            combined[key] = int(partials[key][cells].sum())
+        combined['activity_sum'] = float(partials['activity_sum'][cells].sum())
+        offsets = partials['speed_offsets']
+        if cells.size:
+            combined['speed_seconds'] = np.concatenate(
+                [partials['speed_seconds'][offsets[cell]:offsets[cell + 1]] for cell in cells]
+            )
+        return finalize_metrics(combined)
+
+class BreakdownCube:
+    """KPI aggregates per combination of BREAKDOWN_DIMENSIONS values
+    
+    Every row is assigned once per dataset to a cube cell - one per combination
+    of dimension values present in the data. For a filter state, cells() counts
+    leads, L2QR and conversions per cell in a single bincount pass; a breakdown
+    by any dimension then only sums those (few) cells. Medians are not additive,
+    so each dimension also keeps the rows sorted by (value, Speed_to_Lead) and
+    the median per value is read straight off the filtered sorted rows.
+    """
+    
+    def __init__(self, df, dimensions=None):
+        self.dimensions = [col for col in (dimensions or BREAKDOWN_DIMENSIONS) if col in df.columns]
+        self.n_rows = len(df)
+        self._labels = {}     # dimension -> group labels by code (last = blank)
+        self._row_codes = {}  # dimension -> group code of every row
+        cells = np.zeros(len(df), dtype=np.int64)
+        for col in self.dimensions:
+            codes, uniques = pd.factorize(df[col], sort=True)
+            # Missing values get a group of their own
+            codes = np.where(codes < 0, len(uniques), codes)
+            self._labels[col] = pd.Index([str(value) for value in uniques] + [BREAKDOWN_BLANK_LABEL])
+            self._row_codes[col] = codes
+            # Renumber combined cells densely so ids stay small however many dimensions there are
+            cells = pd.factorize(cells * (len(uniques) + 1) + codes)[0]
+        self._cells = cells
+        self.n_cells = int(cells.max()) + 1 if len(cells) else 0
+        first_rows = np.unique(cells, return_index=True)[1]
+        self._cell_codes = {col: codes[first_rows] for col, codes in self._row_codes.items()}
+        
+        self._flags = {}
+        for name, col in (('l2qr_count', 'Has_L2QR'), ('converted_count', 'Is_Converted_Bool')):
+            if col in df.columns:
+                self._flags[name] = df[col].to_numpy(dtype=bool)
+        if 'Speed_to_Lead_Seconds' in df.columns:
+            self._speed = df['Speed_to_Lead_Seconds'].to_numpy(dtype='float64', na_value=np.nan)
+        else:
+            self._speed = None
+        self._speed_orders = {}
+        self._lock = threading.Lock()
+    
+    def cells(self, row_mask=None):
+        """Lead / L2QR / converted counts per cube cell over the rows in row_mask (None = all rows)"""
+        cells = self._cells if row_mask is None else self._cells[row_mask]
+        counts = {'lead_count': np.bincount(cells, minlength=self.n_cells)}
+        for name in ('l2qr_count', 'converted_count'):
+            flags = self._flags.get(name)
+            if flags is None:
+                counts[name] = np.zeros(self.n_cells, dtype=np.int64)
+                continue
+            if row_mask is not None:
+                flags = flags & row_mask
+            counts[name] = np.bincount(self._cells[flags], minlength=self.n_cells)
+        return counts
+    
+    def breakdown(self, dimension, cells, row_mask=None):
+        """KPIs per value of one dimension, from cells() counts for the same row_mask
+        
+        Returns:
+            DataFrame indexed by dimension value (see breakdown_table)
+        """
+        labels = self._labels[dimension]
+        codes = self._cell_codes[dimension]
+        table = pd.DataFrame(
+            {name: np.bincount(codes, weights=counts, minlength=len(labels)).astype(np.int64) for name, counts in cells.items()},
+            index=labels
+        )
+        table['median_speed_to_lead_seconds'] = self._median_speed(dimension, row_mask, len(labels))
+        return breakdown_table(table, dimension)
+    
+    def _speed_order(self, dimension):
+        """Rows with a Speed_to_Lead value, sorted by (dimension code, speed)"""
+        with self._lock:
+            order = self._speed_orders.get(dimension)
+            if order is None:
+                valid = np.flatnonzero(~np.isnan(self._speed))
+                order = valid[np.lexsort((self._speed[valid], self._row_codes[dimension][valid]))]
+                self._speed_orders[dimension] = order
+            return order
+    
+    def _median_speed(self, dimension, row_mask, n_groups):
+        medians = np.full(n_groups, np.nan)
+        if self._speed is None:
+            return medians
+        order = self._speed_order(dimension)
+        if row_mask is not None:
+            order = order[row_mask[order]]
+        codes = self._row_codes[dimension][order]
+        speeds = self._speed[order]
+        counts = np.bincount(codes, minlength=n_groups)
+        starts = np.cumsum(counts) - counts
+        present = counts > 0
+        # Average of the two middle values (the same value for odd counts), as np.percentile does
+        lower = starts + (counts - 1) // 2
+        upper = starts + counts // 2
+        medians[present] = (speeds[lower[present]] + speeds[upper[present]]) / 2
+        return medians
+
+def breakdown_table(table, dimension):
+    """Add conversion rates to per-group counts, drop empty groups and sort by lead count
+    
+    Args:
+        table: DataFrame indexed by group with lead_count, l2qr_count, converted_count
+            and median_speed_to_lead_seconds columns
+        dimension: Name of the grouped column
+    """
+    leads = table['lead_count'].to_numpy(dtype='float64')
+    l2qr = table['l2qr_count'].to_numpy(dtype='float64')
+    converted = table['converted_count'].to_numpy(dtype='float64')
+    # Rates are 0 for empty groups, as in finalize_metrics()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['lead_to_l2qr_pct'] = np.where(leads > 0, l2qr / leads * 100, 0.0)
+        table['lead_to_convert_pct'] = np.where(leads > 0, converted / leads * 100, 0.0)
+        table['l2qr_to_convert_pct'] = np.where(l2qr > 0, converted / l2qr * 100, 0.0)
+    table = table[table['lead_count'] > 0]
+    table = table.iloc[np.lexsort((table.index.to_numpy(dtype=str), -table['lead_count'].to_numpy()))]
+    table.index.name = dimension
+    return table[BREAKDOWN_COLUMNS]
+
+def select_rows(df, row_mask, columns=None):
+    """Materialize only the rows selected by row_mask (None = all rows) and the given columns"""
+    if columns is None:
+        columns = list(df.columns)
+    if row_mask is None:
+        return df[columns]
+    return df.loc[row_mask, columns]
+
+def sort_order(df, column, descending=False):
+    """Row positions of df sorted by column (stable, missing values last)"""
+    values = df[column].reset_index(drop=True)
+    try:
+        ordered = values.sort_values(ascending=not descending, kind='stable', na_position='last')
+    except TypeError:
+        # Mixed types can't be compared directly - fall back to their text form
+        ordered = values.astype(str).sort_values(ascending=not descending, kind='stable')
+    return ordered.index.to_numpy()
+
+def page_positions(n_rows, row_mask, order, page, page_size):
+    """Row positions for one page of the filtered rows
+    
+    Args:
+        n_rows: Number of rows in the dataset
+        row_mask: Boolean mask over all rows, or None for all rows
+        order: Pre-built sort order of all rows (see sort_order), or None for file order
+        page: Zero-based page number
+        page_size: Rows per page
+    
+    Returns:
+        Array of row positions to display
+    """
+    if order is None:
+        positions = np.arange(n_rows) if row_mask is None else np.flatnonzero(row_mask)
+    else:
+        # Keep the global sort order, dropping rows that are filtered out
+        positions = order if row_mask is None else order[row_mask[order]]
+    return positions[page * page_size:(page + 1) * page_size]
+
+def write_export(df, row_mask, columns, labels, fmt):
+    """Serialize the masked rows and given columns of df into an export file
+    
+    CSV output is written in chunks of EXPORT_CHUNK_ROWS rows straight into the
+    (optionally gzip-compressed) byte buffer, so only one chunk of rows is
+    materialized and no intermediate CSV string is built.
+    
+    Args:
+        df: Source DataFrame
+        row_mask: Boolean mask over df rows, or None for all rows
+        columns: Columns to export, in order
+        labels: Dictionary mapping column names to header labels (missing = original name)
+        fmt: Key of EXPORT_FORMATS
+    
+    Returns:
+        The export file contents as bytes
+    """
+    rename_dict = {col: labels[col] for col in columns if labels.get(col)}
+    buffer = io.BytesIO()
+    
+    if fmt == 'Parquet':
+        # Columnar and compressed already, so write the selection in one go
+        select_rows(df, row_mask, columns).rename(columns=rename_dict).to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    
+    positions = np.arange(len(df)) if row_mask is None else np.flatnonzero(row_mask)
+    column_positions = [df.columns.get_loc(col) for col in columns]
+    raw = gzip.GzipFile(fileobj=buffer, mode='wb') if fmt == 'CSV (gzip)' else buffer
+    text = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    # Always run at least once so an empty selection still gets a header row
+    for start in range(0, max(len(positions), 1), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[positions[start:start + EXPORT_CHUNK_ROWS], column_positions]
+        chunk.rename(columns=rename_dict).to_csv(text, header=(start == 0), index=False, date_format=EXPORT_DATE_FORMAT)
+    text.flush()
+    text.detach()
+    if raw is not buffer:
+        raw.close()
+    return buffer.getvalue()
+
+def metric_partials(df):
+    """Additive partial aggregates behind calculate_metrics() for one block of rows
+    
+    Partials from separate chunks combine with combine_metric_partials(), which
+    lets large files be summarized chunk by chunk without holding every row.
+    """
+    partials = {
+        'lead_count': 0,
+        'l2qr_count': 0,
+        'converted_count': 0,
+        'activity_sum': 0.0,
+        'activity_rows': 0,
+        'speed_seconds': np.empty(0, dtype='float32'),
+    }
+    if df is None or df.empty:
+        return partials
+    
+    partials['lead_count'] = len(df)
+    
+    # Flag columns are normalized to bool at load time
+    if 'Has_L2QR' in df.columns:
+        partials['l2qr_count'] = int(df['Has_L2QR'].sum())
+    if 'Is_Converted_Bool' in df.columns:
+        partials['converted_count'] = int(df['Is_Converted_Bool'].sum())
+    
+    if 'Activity_Count' in df.columns:
+        partials['activity_sum'] = float(df['Activity_Count'].sum())
+        partials['activity_rows'] = int(df['Activity_Count'].count())
+    
+    # Percentiles aren't additive, so keep the parsed durations themselves (4 bytes per row)
+    if 'Speed_to_Lead_Seconds' in df.columns:
+        speed_seconds = df['Speed_to_Lead_Seconds'].to_numpy(dtype='float32', na_value=np.nan)
+        partials['speed_seconds'] = speed_seconds[~np.isnan(speed_seconds)]
+    
+    return partials
+
+def combine_metric_partials(partials_list):
+    """Merge partial aggregates from several row blocks into one"""
+    combined = metric_partials(None)
+    speed_parts = []
+    for partials in partials_list:
+        for key in ('lead_count', 'l2qr_count', 'converted_count', 'activity_sum', 'activity_rows'):
+            combined[key] += partials[key]
+        speed_parts.append(partials['speed_seconds'])
+    if speed_parts:
+        combined['speed_seconds'] = np.concatenate(speed_parts)
+    return combined
+
+def finalize_metrics(partials, speed_percentiles=None):
+    """Turn partial aggregates into the KPI metrics dictionary
+    
+    Backends that compute percentiles themselves pass speed_percentiles as
+    (p50, p90, p99) seconds instead of filling partials['speed_seconds'].
+    """
+    metrics = {}
+    
+    # Main metrics
+    metrics['lead_count'] = partials['lead_count']
+    metrics['l2qr_count'] = partials['l2qr_count']
+    metrics['converted_count'] = partials['converted_count']
+    
+    # Calculate percentages
+    if metrics['lead_count'] > 0:
+        metrics['lead_to_convert_pct'] = (metrics['converted_count'] / metrics['lead_count']) * 100
+        metrics['lead_to_l2qr_pct'] = (metrics['l2qr_count'] / metrics['lead_count']) * 100
+    else:
+        metrics['lead_to_convert_pct'] = 0
+        metrics['lead_to_l2qr_pct'] = 0
+    
+    if metrics['l2qr_count'] > 0:
+        metrics['l2qr_to_convert_pct'] = (metrics['converted_count'] / metrics['l2qr_count']) * 100
+    else:
+        metrics['l2qr_to_convert_pct'] = 0
+    
+    # Speed to lead percentiles from the duration column parsed at load time
+    speed_seconds = partials['speed_seconds']
+    if speed_percentiles is not None:
+        p50, p90, p99 = (float('nan') if value is None else value for value in speed_percentiles)
+    elif speed_seconds.size:
+        p50, p90, p99 = np.percentile(speed_seconds.astype('float64'), [50, 90, 99])
+    else:
+        p50 = p90 = p99 = float('nan')
+    metrics['median_speed_to_lead'] = format_duration(p50)
+    metrics['p90_speed_to_lead'] = format_duration(p90)
+    metrics['p99_speed_to_lead'] = format_duration(p99)
+    metrics['median_speed_to_lead_seconds'] = p50
+    
+    # Activity count
+    if partials['activity_rows'] > 0:
+        metrics['activity_count_avg'] = partials['activity_sum'] / partials['activity_rows']
+    else:
+        metrics['activity_count_avg'] = 0
+    
+    return metrics
+
+def calculate_metrics(df):
+    """Calculate all KPI metrics from dataframe"""
+    return finalize_metrics(metric_partials(df))
+
+# Columns calculate_metrics() reads - filtered metrics only materialize these
+METRIC_COLUMNS = ['Person_UUID', 'Has_L2QR', 'Is_Converted_Bool', 'Speed_to_Lead_Seconds', 'Activity_Count']
+
+def quote_identifier(name):
+    """Quote a column name for use in DuckDB SQL"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+class DuckDBBackend:
+    """DuckDB query engine over one dataset
+    
+    The dataset is either a DataFrame (scanned in place, no copy) or the Parquet
+    store of a streamed dataset (read from disk, so large files can be filtered
+    without loading them). Filters and search compile to a WHERE clause; counts,
+    KPIs, pages and exports all run as SQL against it. Queries beyond the memory
+    limit spill to a temp directory. Each query gets its own cursor, so queries
+    from several sessions run side by side.
+    
+    Args:
+        df: DataFrame to query
+        parquet_path: Parquet file to query instead of df
+    """
+    
+    TABLE = 'person_master'
+    # Position of each row in the file: the tiebreaker of every ORDER BY, so pages don't
+    # overlap and equal sort values keep file order like the pandas backend's stable sort
+    ROW = '__row'
+    
+    def __init__(self, df=None, parquet_path=None):
+        self._temp_dir = tempfile.TemporaryDirectory(prefix='surstitch_duckdb_')
+        self._conn = duckdb.connect(config={
+            'memory_limit': DUCKDB_MEMORY_LIMIT,
+            'temp_directory': self._temp_dir.name,
+        })
+        # Every query runs on a cursor of its own, so sessions' queries run concurrently.
+        # Only opening a cursor is serialized
+        self._lock = threading.Lock()
+        self._df = None
+        if df is None:
+            path = str(parquet_path).replace("'", "''")
+            self._conn.execute(
+                f"CREATE VIEW {self.TABLE} AS SELECT *, file_row_number AS {self.ROW} "
+                f"FROM read_parquet('{path}', file_row_number=true)"
+            )
+        else:
+            # Adding the column copies no data
+            self._df = pd.concat([df, pd.Series(np.arange(len(df)), index=df.index, name=self.ROW)], axis=1, copy=False)
+        self.columns = [row[0] for row in self._fetchall(f"DESCRIBE {self.TABLE}") if row[0] not in (self.ROW, 'file_row_number')]
+        self.n_rows = self._fetchone(f"SELECT count(*) FROM {self.TABLE}")[0]
+        self.filter_options = self._filter_options()
+    
+    @contextmanager
+    def _cursor(self):
+        with self._lock:
+            cursor = self._conn.cursor()
+        try:
+            if self._df is not None:
+                # Registered DataFrames are visible to one cursor only; registering scans in place
+                cursor.register(self.TABLE, self._df)
+            yield cursor
+        finally:
+            cursor.close()
+    
+    def _execute(self, sql, params=None):
+        with self._cursor() as cursor:
+            cursor.execute(sql, params or [])
+    
+    def _fetchall(self, sql, params=None):
+        with self._cursor() as cursor:
+            return cursor.execute(sql, params or []).fetchall()
+    
+    def _fetchone(self, sql, params=None):
+        with self._cursor() as cursor:
+            return cursor.execute(sql, params or []).fetchone()
+    
+    def _fetch_df(self, sql, params=None):
+        with self._cursor() as cursor:
+            return cursor.execute(sql, params or []).df()
+    
+    @property
+    def nbytes(self):
+        """Memory DuckDB holds for this engine (a registered DataFrame is scanned in place)"""
+        return int(self._fetchone("SELECT coalesce(sum(memory_usage_bytes), 0) FROM duckdb_memory()")[0])
+    
+    def _filter_options(self):
+        # Same options as FilterIndex.options: sorted distinct values per filter column
+        options = {}
+        for name, col in FilterIndex.FILTER_COLUMNS.items():
+            if col not in self.columns:
+                continue
+            column = f"CAST({quote_identifier(col)} AS VARCHAR)"
+            rows = self._fetchall(
+                f"SELECT DISTINCT {column} AS value FROM {self.TABLE} WHERE {column} IS NOT NULL ORDER BY value"
+            )
+            options[name] = [row[0] for row in rows]
+        return options
+    
+    def where(self, status='All', source='All', conversion='All', search=None, column_labels=None):
+        """Compile the table filters and search query to (WHERE clause, parameters)"""
+        clauses, params = [], []
+        for name, value in (('status', status), ('source', source)):
+            col = FilterIndex.FILTER_COLUMNS[name]
+            if value != 'All' and col in self.columns:
+                clauses.append(f"CAST({quote_identifier(col)} AS VARCHAR) = ?")
+                params.append(value)
+        if conversion != 'All' and 'Is_Converted_Bool' in self.columns:
+            converted = f"coalesce({quote_identifier('Is_Converted_Bool')}, false)"
+            clauses.append(converted if conversion == 'Converted' else f"NOT {converted}")
+        
+        # Search keeps the index semantics: every token is a word prefix, a term matches
+        # a row if one cell in its columns contains all of the term's tokens
+        for tokens, columns in parse_search_query(search or '', self.columns, column_labels):
+            column_clauses = []
+            for col in columns:
+                text = f"lower(CAST({quote_identifier(col)} AS VARCHAR))"
+                column_clauses.append('(' + ' AND '.join(f"regexp_matches({text}, ?)" for _ in tokens) + ')')
+                params.extend(f"(^|[^0-9a-z]){token}" for token in tokens)
+            clauses.append('(' + ' OR '.join(column_clauses) + ')')
+        
+        return (' AND '.join(clauses) or 'true'), params
+    
+    def count(self, query):
+        """Number of rows matching a compiled query"""
+        where, params = query
+        return self._fetchone(f"SELECT count(*) FROM {self.TABLE} WHERE {where}", params)[0]
+    
+    def metrics(self, query):
+        """KPI metrics (as calculate_metrics() returns them) over the matching rows"""
+        where, params = query
+        has = set(self.columns)
+        l2qr = f"count_if({quote_identifier('Has_L2QR')})" if 'Has_L2QR' in has else '0'
+        converted = f"count_if({quote_identifier('Is_Converted_Bool')})" if 'Is_Converted_Bool' in has else '0'
+        activity = quote_identifier('Activity_Count')
+        activity_sum, activity_rows = (f"sum({activity})", f"count({activity})") if 'Activity_Count' in has else ('0', '0')
+        speed = quote_identifier('Speed_to_Lead_Seconds')
+        percentiles = (
+            f"quantile_cont({speed}, [0.5, 0.9, 0.99]) FILTER (WHERE NOT isnan({speed}))"
+            if 'Speed_to_Lead_Seconds' in has else 'NULL'
+        )
+        row = self._fetchone(
+            f"SELECT count(*), {l2qr}, {converted}, {activity_sum}, {activity_rows}, {percentiles} "
+            f"FROM {self.TABLE} WHERE {where}",
+            params
+        )
+        partials = metric_partials(None)
+        partials.update({
+            'lead_count': row[0],
+            'l2qr_count': row[1] or 0,
+            'converted_count': row[2] or 0,
+            'activity_sum': float(row[3] or 0),
+            'activity_rows': row[4] or 0,
+        })
+        return finalize_metrics(partials, speed_percentiles=row[5] or (None, None, None))
+    
+    def _select(self, query, columns, labels=None, sort_column=None, descending=False):
+        where, params = query
+        labels = labels or {}
+        select_list = ', '.join(
+            quote_identifier(col) + (f" AS {quote_identifier(labels[col])}" if labels.get(col) else '')
+            for col in columns
+        )
+        sql = f"SELECT {select_list} FROM {self.TABLE} WHERE {where}"
+        if sort_column:
+            sql += f" ORDER BY {quote_identifier(sort_column)} {'DESC' if descending else 'ASC'} NULLS LAST, {self.ROW}"
+        return sql, list(params)
+    
+    def rows(self, query, columns, sort_column=None, descending=False, limit=None, offset=0):
+        """Matching rows of the given columns as a DataFrame (one page with limit/offset)"""
+        sql, params = self._select(query, columns, sort_column=sort_column, descending=descending)
+        if limit is not None:
+            if not sort_column:
+                # Without an order LIMIT/OFFSET may return any matching rows
+                sql += f" ORDER BY {self.ROW}"
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return self._fetch_df(sql, params)
+    
+    def breakdown(self, query, dimension):
+        """KPIs per value of dimension over the matching rows (see breakdown_table)"""
+        where, params = query
+        has = set(self.columns)
+        column = quote_identifier(dimension)
+        l2qr = f"count_if({quote_identifier('Has_L2QR')})" if 'Has_L2QR' in has else '0'
+        converted = f"count_if({quote_identifier('Is_Converted_Bool')})" if 'Is_Converted_Bool' in has else '0'
+        speed = quote_identifier('Speed_to_Lead_Seconds')
+        median = (
+            f"quantile_cont({speed}, 0.5) FILTER (WHERE NOT isnan({speed}))"
+            if 'Speed_to_Lead_Seconds' in has else 'NULL'
+        )
+        table = self._fetch_df(
+            f"SELECT coalesce(CAST({column} AS VARCHAR), ?) AS grp, count(*) AS lead_count, "
+            f"{l2qr} AS l2qr_count, {converted} AS converted_count, {median} AS median_speed_to_lead_seconds "
+            f"FROM {self.TABLE} WHERE {where} GROUP BY grp",
+            [BREAKDOWN_BLANK_LABEL] + list(params)
+        ).set_index('grp')
+        table['median_speed_to_lead_seconds'] = table['median_speed_to_lead_seconds'].astype('float64')
+        return breakdown_table(table, dimension)
+    
+    def export(self, query, columns, labels, fmt):
+        """Export the matching rows in one of EXPORT_FORMATS, written by DuckDB itself"""
+        sql, params = self._select(query, columns, labels=labels)
+        extension = EXPORT_FORMATS[fmt][0]
+        options = {
+            'CSV': "FORMAT CSV, HEADER",
+            'CSV (gzip)': "FORMAT CSV, HEADER, COMPRESSION gzip",
+            'Parquet': "FORMAT PARQUET",
+        }[fmt]
+        with tempfile.TemporaryDirectory(dir=self._temp_dir.name) as tmp_dir:
+            path = os.path.join(tmp_dir, f"export.{extension}").replace("'", "''")
+            self._execute(f"COPY ({sql}) TO '{path}' ({options})", params)
+            with open(path, 'rb') as f:
+                return f.read()
+
+# Columns the KPI trend aggregate reads
+TREND_COLUMNS = ['LeadCreatedDate', 'ConvertedDate', 'Has_L2QR', 'Speed_to_Lead_Seconds']
+
+def day_buckets(df, col):
+    """Calendar day of each row for a datetime column (None if the column isn't usable)"""
+    if col not in df.columns or not pd.api.types.is_datetime64_any_dtype(df[col]):
+        return None
+    values = df[col]
+    if values.dt.tz is not None:
+        values = values.dt.tz_convert(None)
+    return values.dt.normalize()
+
+def percent_change(current, previous):
+    """Percentage change, or None when there is no previous value to compare against"""
+    if previous is None or pd.isna(previous) or previous == 0 or pd.isna(current):
+        return None
+    return (current - previous) / previous * 100
+
+def build_kpi_trends(df):
+    """Daily KPI series and DoD / WoW / MoM deltas for the KPI cards
+    
+    Leads and qualified leads are bucketed by LeadCreatedDate, accounts by
+    ConvertedDate and median speed to lead by the lead's creation day. Deltas
+    compare the latest 1 / 7 / 30 days in the data against the period before.
+    
+    Args:
+        df: DataFrame with (some of) TREND_COLUMNS
+    
+    Returns:
+        Dictionary with 'daily' (DataFrame of KPI values per day) and 'deltas'
+        (KPI name -> {'dod', 'wow', 'mom'} percentages, None if not comparable)
+    """
+    created_day = day_buckets(df, 'LeadCreatedDate')
+    converted_day = day_buckets(df, 'ConvertedDate')
+    
+    series = {}
+    if created_day is not None:
+        series['lead_count'] = created_day.value_counts()
+        if 'Has_L2QR' in df.columns:
+            series['l2qr_count'] = created_day[df['Has_L2QR'].to_numpy(dtype=bool)].value_counts()
+    if converted_day is not None:
+        series['converted_count'] = converted_day.value_counts()
+    if created_day is not None and 'Speed_to_Lead_Seconds' in df.columns:
+        series['median_speed_to_lead_seconds'] = df['Speed_to_Lead_Seconds'].groupby(created_day).median()
+    
+    daily = pd.DataFrame(series)
+    deltas = {}
+    if daily.empty:
+        return {'daily': daily, 'deltas': deltas}
+    
+    # One row per calendar day; days without events count as zero
+    daily = daily.sort_index().asfreq('D')
+    count_kpis = [kpi for kpi in ('lead_count', 'l2qr_count', 'converted_count') if kpi in daily.columns]
+    daily[count_kpis] = daily[count_kpis].fillna(0)
+    
+    end = daily.index.max()
+    one_day = pd.Timedelta(days=1)
+    for kpi in daily.columns:
+        deltas[kpi] = {}
+    for name, days in (('dod', 1), ('wow', 7), ('mom', 30)):
+        current_start = end - pd.Timedelta(days=days - 1)
+        previous_start = current_start - pd.Timedelta(days=days)
+        for kpi in count_kpis:
+            current = daily.loc[current_start:end, kpi].sum()
+            previous = daily.loc[previous_start:current_start - one_day, kpi].sum()
+            deltas[kpi][name] = percent_change(current, previous)
+        if 'median_speed_to_lead_seconds' in daily.columns:
+            # Medians don't add up across days, so take them over the rows of each window
+            seconds = df['Speed_to_Lead_Seconds']
+            current = seconds[(created_day >= current_start) & (created_day <= end)].median()
+            previous = seconds[(created_day >= previous_start) & (created_day < current_start)].median()
+            deltas['median_speed_to_lead_seconds'][name] = percent_change(current, previous)
+    
+    return {'daily': daily, 'deltas': deltas}
+
+def snapshot_date(file_path):
+    """Snapshot date of a person_master file: a date in its name, else its modification time"""
+    match = re.search(r'(20\d{2})[-_]?(\d{2})[-_]?(\d{2})', Path(file_path).stem)
+    if match:
+        try:
+            return datetime(*map(int, match.groups())).date()
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(Path(file_path).stat().st_mtime).date()
+
+def snapshot_metrics(csv_path):
+    """KPI metrics of a person_master file, read in chunks for snapshot rollups
+    
+    Only the columns behind the KPIs are parsed, and nothing is cached or written
+    next to the file, so summarizing dozens of old snapshots neither displaces
+    loaded datasets nor leaves a sidecar per file.
+    """
+    needed = set(METRIC_COLUMNS) | {'Speed_to_Lead'}
+    reader = pd.read_csv(
+        csv_path, usecols=lambda col: col in needed,
+        dtype=csv_read_dtypes(unlisted_as_text=True), chunksize=STREAM_CHUNK_ROWS
+    )
+    with reader:
+        return finalize_metrics(combine_metric_partials(metric_partials(prepare_dataset(chunk)) for chunk in reader))
+
+class SnapshotHistory:
+    """Incremental SQLite store of per-snapshot KPI rollups
+    
+    One row per person_master file holds the calculate_metrics() results plus the
+    file's mtime/size, so only snapshots that are new or changed since they were
+    recorded ever need to be loaded. Trend charts read the rollups only.
+    """
+    
+    METRIC_FIELDS = [
+        'lead_count', 'l2qr_count', 'converted_count',
+        'lead_to_l2qr_pct', 'lead_to_convert_pct', 'l2qr_to_convert_pct',
+        'median_speed_to_lead_seconds', 'activity_count_avg',
+    ]
+    
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        metric_columns = ', '.join(f'{field} REAL' for field in self.METRIC_FIELDS)
+        with self._connect() as con, con:
+            con.execute(f"""
+                CREATE TABLE IF NOT EXISTS snapshot_kpis (
+                    file_path TEXT PRIMARY KEY,
+                    source_mtime_ns INTEGER NOT NULL,
+                    source_size INTEGER NOT NULL,
+                    snapshot_date TEXT NOT NULL,
+                    processed_at TEXT NOT NULL,
+                    {metric_columns}
+                )
+            """)
+    
+    def _connect(self):
+        return closing(sqlite3.connect(str(self.db_path), timeout=30))
+    
+    def pending(self, files):
+        """Files without an up-to-date rollup"""
+        with self._connect() as con:
+            recorded = {
+                row[0]: (row[1], row[2])
+                for row in con.execute("SELECT file_path, source_mtime_ns, source_size FROM snapshot_kpis")
+            }
+        pending = []
+        for file_path in files:
+            stat = Path(file_path).stat()
+            if recorded.get(str(Path(file_path).resolve())) != (stat.st_mtime_ns, stat.st_size):
+                pending.append(file_path)
+        return pending
+    
+    def record(self, file_path, metrics, stat=None):
+        """Insert or replace the rollup for one snapshot
+        
+        Pass the os.stat() taken before loading the file, so a file that changes
+        while it is being processed is picked up again next time.
+        """
+        stat = stat or Path(file_path).stat()
+        values = []
+        for field in self.METRIC_FIELDS:
+            value = metrics.get(field)
+            values.append(None if value is None or pd.isna(value) else float(value))
+        with self._connect() as con, con:
+            con.execute(
+                f"INSERT OR REPLACE INTO snapshot_kpis "
+                f"(file_path, source_mtime_ns, source_size, snapshot_date, processed_at, {', '.join(self.METRIC_FIELDS)}) "
+                f"VALUES ({', '.join('?' * (5 + len(self.METRIC_FIELDS)))})",
+                [
+                    str(Path(file_path).resolve()),
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                    snapshot_date(file_path).isoformat(),
+                    datetime.now(timezone.utc).isoformat(),
+                    *values,
+                ],
+            )
+    
+    def trend(self, files):
+        """Rollups for the given files as a DataFrame indexed by snapshot date"""
+        paths = [str(Path(file_path).resolve()) for file_path in files]
+        if not paths:
+            return pd.DataFrame(columns=self.METRIC_FIELDS)
+        with self._connect() as con:
+            trend = pd.read_sql_query(
+                f"SELECT snapshot_date, {', '.join(self.METRIC_FIELDS)} FROM snapshot_kpis "
+                f"WHERE file_path IN ({', '.join('?' * len(paths))}) ORDER BY snapshot_date",
+                con,
+                params=paths,
+            )
+        trend['snapshot_date'] = pd.to_datetime(trend['snapshot_date'])
+        # Several files from the same day: keep the last one written for that day
+        return trend.groupby('snapshot_date').last()
+
+def history_db_path(output_files):
+    """Location of the snapshot history database for the local Output-Files folder"""
+    if os.environ.get('SURSTITCH_HISTORY_DB'):
+        return Path(os.environ['SURSTITCH_HISTORY_DB'])
+    db_dir = Path(output_files[0]).parent / SIDECAR_DIR_NAME
+    try:
+        db_dir.mkdir(exist_ok=True)
+    except OSError:
+        # Read-only deployments keep the history for the lifetime of the container only
+        db_dir = Path(tempfile.gettempdir())
+    return db_dir / HISTORY_DB_NAME
+
+def views_db_path(output_files):
+    """Location of the saved views database (the temp folder when there are no local files)"""
+    if os.environ.get('SURSTITCH_VIEWS_DB'):
+        return Path(os.environ['SURSTITCH_VIEWS_DB'])
+    if not output_files:
+        return Path(tempfile.gettempdir()) / VIEWS_DB_NAME
+    return history_db_path(output_files).with_name(VIEWS_DB_NAME)
+
+def make_view(columns, column_labels, filters=None):
+    """A table view as a plain dict that can be saved, compared and hashed
+    
+    Args:
+        columns: Visible columns (their order in the table follows the file)
+        column_labels: Display labels; only those that differ from
+            COLUMN_LABEL_DICTIONARY are kept
+        filters: {'status', 'source', 'conversion', 'search'} selections,
+            missing ones meaning no filter
+    """
+    filters = filters or {}
+    return {
+        'columns': sorted(set(columns)),
+        'labels': {
+            col: label for col, label in sorted(column_labels.items())
+            if label != COLUMN_LABEL_DICTIONARY.get(col, col)
+        },
+        'filters': {name: filters.get(name) or default for name, default in VIEW_FILTERS.items()},
+    }
+
+def view_key(view):
+    """Digest of a view's content - equal views share a key whatever they are named"""
+    payload = json.dumps(view, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+
+def view_labels(view):
+    """Full column label mapping of a view (dictionary labels plus its own)"""
+    return {**COLUMN_LABEL_DICTIONARY, **view['labels']}
+
+class ViewStore:
+    """SQLite store of named table views (see make_view)
+    
+    Saving under an existing name replaces that view. Each row also keeps the
+    view_key(), so the viewer can tell which saved view the session matches
+    without decoding every view.
+    """
+    
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        with self._connect() as con, con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS saved_views (
+                    name TEXT PRIMARY KEY,
+                    view_key TEXT NOT NULL,
+                    view_json TEXT NOT NULL,
+                    saved_at TEXT NOT NULL
+                )
+            """)
+    
+    def _connect(self):
+        return closing(sqlite3.connect(str(self.db_path), timeout=30))
+    
+    def keys(self):
+        """{name: view key} of every saved view, by name"""
+        with self._connect() as con:
+            return dict(con.execute("SELECT name, view_key FROM saved_views ORDER BY name COLLATE NOCASE"))
+    
+    def get(self, name):
+        """The view saved under name, or None"""
+        with self._connect() as con:
+            row = con.execute("SELECT view_json FROM saved_views WHERE name = ?", [name]).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def views(self):
+        """Every saved view, most recently saved first"""
+        with self._connect() as con:
+            return [json.loads(row[0]) for row in con.execute("SELECT view_json FROM saved_views ORDER BY saved_at DESC")]
+    
+    def save(self, name, view):
+        """Save a view under name, returning its view key"""
+        key = view_key(view)
+        with self._connect() as con, con:
+            con.execute(
+                "INSERT OR REPLACE INTO saved_views (name, view_key, view_json, saved_at) VALUES (?, ?, ?, ?)",
+                [name, key, json.dumps(view, sort_keys=True), datetime.now(timezone.utc).isoformat()],
+            )
+        return key
+    
+    def delete(self, name):
+        with self._connect() as con, con:
+            con.execute("DELETE FROM saved_views WHERE name = ?", [name])
+
+def peak_memory_bytes():
+    """Peak resident memory of this process so far (None where it can't be read)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+# Estimated size of each Python object an object-dtype array points to (short strings)
+PY_OBJECT_BYTES = 56
+
+def memory_bytes(value, _seen=None):
+    """Approximate memory held by the arrays inside a derived structure
+    
+    Walks dicts, lists, tuples and this module's index/selection objects,
+    counting each array once however often it is referenced. Datasets are
+    not entered (a Selection points back to its Dataset) and DuckDB engines
+    report their own memory.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        return value.nbytes + (value.size * PY_OBJECT_BYTES if value.dtype == object else 0)
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage()
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, dict):
+        # list() copies in one step, so other threads adding entries can't break the walk
+        return sum(memory_bytes(item, seen) for item in list(value.values()))
+    if isinstance(value, (list, tuple)):
+        return sum(memory_bytes(item, seen) for item in value)
+    if isinstance(value, DuckDBBackend):
+        return value.nbytes
+    if isinstance(value, Dataset) or type(value).__module__ != __name__ or not hasattr(value, '__dict__'):
+        return 0
+    return sum(memory_bytes(item, seen) for item in list(vars(value).values()))
+
+def frame_stats(df, nbytes=None):
+    """Row count, column count and in-memory size of a DataFrame for perf records
+    
+    Sizes include string payloads. Walking them is slow on a whole dataset, so
+    pass nbytes when the size is already known (see dataset_stats).
+    """
+    if df is None:
+        return {}
+    return {
+        'rows': len(df),
+        'columns': len(df.columns),
+        'bytes': int(df.memory_usage(index=False, deep=True).sum()) if nbytes is None else nbytes,
+    }
+
+def dataset_stats(dataset):
+    """frame_stats() of a Dataset's rows, sized once per load (empty for streamed datasets)"""
+    if dataset is None or dataset.is_streamed:
+        return {}
+    return frame_stats(dataset.frame, nbytes=dataset.frame_nbytes)
+
+def write_perf_log(record):
+    """Append one record to the JSON performance log if SURSTITCH_PERF_LOG is set"""
+    if not PERF_LOG_PATH:
+        return
+    try:
+        # One short append per record, so concurrent sessions don't interleave lines
+        with open(PERF_LOG_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+    except OSError:
+        pass
+
+class PerfRecorder:
+    """Stage timings, DataFrame sizes and peak memory for one script run
+    
+    Usage:
+        with perf.stage('metrics') as stage:
+            metrics = calculate_metrics(df)
+            stage.update(frame_stats(df))
+    
+    finish() closes the run and writes its record to the JSON log.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.peak_at_start = peak_memory_bytes()
+        self.stages = []
+        self.finished = False
+    
+    @contextmanager
+    def stage(self, name):
+        entry = {'stage': name}
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['ms'] = (time.perf_counter() - start) * 1000
+            self.stages.append(entry)
+    
+    def finish(self, **context):
+        """Total the run, write it to the log and return the record"""
+        peak = peak_memory_bytes()
+        record = {
+            'time': datetime.now(timezone.utc).isoformat(),
+            'event': 'run',
+            **context,
+            'total_ms': (time.perf_counter() - self.started) * 1000,
+            'peak_memory_bytes': peak,
+            # A run that pushed the process to a new high shows how far it raised the peak
+            'peak_memory_growth_bytes': None if peak is None else peak - self.peak_at_start,
+            'stages': self.stages,
+        }
+        write_perf_log(record)
+        self.finished = True
+        return record
+
+class Dataset:
+    """A loaded person_master dataset - the headless API behind the viewer
+    
+    Holds either an in-memory DataFrame (frame) or, for files too large for
+    memory, a StreamedDataset (streamed). Indexes and other derived structures
+    are built on first use and kept on the instance, so a Dataset shared by
+    several callers (e.g. through DatasetCache) builds each of them once.
+    Datasets are read-only and safe to use from several threads.
+    
+    Usage:
+        dataset = Dataset.open('Output-Files/person_master_20250901.csv')
+        dataset.metrics()
+        selection = dataset.filter(status='Open', search='email:acme')
+        selection.count, selection.metrics()
+        selection.rows(['Person_UUID', 'Lead_Status'], page=0, page_size=100)
+        data = selection.export(['Person_UUID', 'Lead_Status'], {'Lead_Status': 'Status'}, 'CSV')
+    """
+    
+    # Sort orders kept per dataset, most recently used first (one int64 per row each)
+    SORT_ORDER_SLOTS = 8
+    # Filter states whose Selection (row mask, count, metrics) is kept, and search
+    # queries whose row mask is kept (one bool per row each)
+    SELECTION_SLOTS = 8
+    SEARCH_MASK_SLOTS = 8
+    
+    def __init__(self, df=None, streamed=None, key=None, name=None):
+        if (df is None) == (streamed is None):
+            raise ValueError("A Dataset needs either a DataFrame or a StreamedDataset")
+        self.frame = df
+        self.streamed = streamed
+        self.key = key
+        self.name = name
+        self.columns = list(df.columns) if df is not None else list(streamed.columns)
+        self.n_rows = len(df) if df is not None else streamed.n_rows
+        self._lock = threading.RLock()
+        self._derived = {}
+        self._build_locks = {}
+        self._sort_orders = OrderedDict()
+        self._search_masks = OrderedDict()
+        self._selections = OrderedDict()
+    
+    @classmethod
+    def open(cls, path=None, uploaded_file=None, key=None, streaming=None, progress=None):
+        """Load a person_master CSV file or upload
+        
+        Args:
+            path: CSV file path
+            uploaded_file: Upload (anything with getvalue()) to read instead of a path
+            key: Dataset key; defaults to file_dataset_key(path) for files
+            streaming: Serve the file from an on-disk Parquet store instead of memory;
+                by default files larger than STREAMING_THRESHOLD_MB are streamed
+            progress: Ingestion progress callback for streaming, see StreamedDataset.ingest
+        """
+        if uploaded_file is not None:
+            df = read_dataset(uploaded_file=uploaded_file)
+            return cls(df, key=key, name=getattr(uploaded_file, 'name', None))
+        path = Path(path)
+        key = key or file_dataset_key(path)
+        if streaming is None:
+            streaming = exceeds_streaming_threshold(path)
+        if streaming:
+            return cls(streamed=StreamedDataset.open(path, progress=progress), key=key, name=path.name)
+        return cls(read_dataset(file_path=path), key=key, name=path.name)
+    
+    @property
+    def is_streamed(self):
+        return self.frame is None
+    
+    @property
+    def empty(self):
+        return self.n_rows == 0
+    
+    @property
+    def frame_nbytes(self):
+        """Memory held by the rows, string payloads included (measured once, 0 when streamed)"""
+        return self._derived_value(
+            'frame_nbytes', lambda: 0 if self.is_streamed else int(self.frame.memory_usage(deep=True).sum())
+        )
+    
+    @property
+    def nbytes(self):
+        """Memory held by the rows and everything derived from them so far
+        
+        Indexes and memoized results are added as they are built, so this is
+        measured on every call (the rows only once). Streamed datasets keep
+        their rows on disk.
+        """
+        frame_bytes = self.frame_nbytes
+        with self._lock:
+            derived = [value for name, value in self._derived.items() if name != 'frame_nbytes']
+            derived += [list(self._sort_orders.values()), list(self._search_masks.values()), list(self._selections.values())]
+        return frame_bytes + memory_bytes(derived)
+    
+    def _derived_value(self, name, build):
+        """Derived structure name, built on first use
+        
+        The shared lock only guards lookups and stores. A build holds a lock of
+        its own name, so a slow build (e.g. the search index) only makes callers
+        of that same structure wait, never reads of values already built.
+        """
+        with self._lock:
+            if name in self._derived:
+                return self._derived[name]
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+        with build_lock:
+            with self._lock:
+                if name in self._derived:
+                    return self._derived[name]
+            value = build()
+            with self._lock:
+                self._derived[name] = value
+        return value
+    
+    def _memoized(self, memo, key, build, slots):
+        """LRU lookup in one of the per-dataset memos, building the value on a miss"""
+        with self._lock:
+            if key in memo:
+                memo.move_to_end(key)
+                return memo[key]
+        value = build()
+        with self._lock:
+            memo[key] = value
+            while len(memo) > slots:
+                memo.popitem(last=False)
+        return value
+    
+    def _require_frame(self, what):
+        if self.is_streamed:
+            raise ValueError(f"{what} needs the rows in memory - use the DuckDB backend for streamed datasets")
+        return self.frame
+    
+    @property
+    def filter_index(self):
+        return self._derived_value('filter_index', lambda: FilterIndex(self._require_frame("Filtering")))
+    
+    @property
+    def search_index(self):
+        return self._derived_value('search_index', lambda: SearchIndex(self._require_frame("Search")))
+    
+    @property
+    def filter_metrics(self):
+        return self._derived_value('filter_metrics', lambda: FilterMetrics(self.frame, self.filter_index))
+    
+    @property
+    def breakdown_cube(self):
+        return self._derived_value('breakdown_cube', lambda: BreakdownCube(self._require_frame("Breakdowns")))
+    
+    @property
+    def duckdb_backend(self):
+        """DuckDB engine over this dataset (the Parquet store for streamed datasets)"""
+        if duckdb is None:
+            raise ValueError("The DuckDB backend needs the duckdb package")
+        return self._derived_value('duckdb_backend', lambda: (
+            DuckDBBackend(parquet_path=self.streamed.store_path) if self.is_streamed else DuckDBBackend(df=self.frame)
+        ))
+    
+    def warm(self, views=()):
+        """Build the indexes and aggregates a viewer session needs up front
+        
+        Selections and KPIs of the given saved views (up to SELECTION_SLOTS) are
+        built too, so opening one of those views doesn't filter again.
+        """
+        self.metrics()
+        self.kpi_trends()
+        if not self.is_streamed:
+            self.filter_index
+            self.search_index
+            for view in list(views)[:self.SELECTION_SLOTS]:
+                self.apply_view(view).metrics()
+        return self
+    
+    def filter_options(self, backend='pandas'):
+        """Distinct values offered by the Status / Source filters"""
+        if backend == 'duckdb' or self.is_streamed:
+            return self.duckdb_backend.filter_options if duckdb is not None else {}
+        return self.filter_index.options
+    
+    def sort_order(self, column, descending=False):
+        """Row positions sorted by column, kept for the most recently used columns"""
+        frame = self._require_frame("Sorting")
+        return self._memoized(
+            self._sort_orders, (column, descending), lambda: sort_order(frame, column, descending), self.SORT_ORDER_SLOTS
+        )
+    
+    def metrics(self):
+        """KPI metrics over all rows (see calculate_metrics)"""
+        if self.is_streamed:
+            return self.streamed.metrics()
+        return self._derived_value('metrics', lambda: calculate_metrics(self.frame))
+    
+    def kpi_trends(self):
+        """Daily KPI aggregate and period-over-period deltas (see build_kpi_trends)"""
+        def build():
+            if self.is_streamed:
+                # Read just the trend columns from the on-disk store
+                return build_kpi_trends(self.streamed.read_columns([col for col in TREND_COLUMNS if col in self.columns]))
+            return build_kpi_trends(self.frame)
+        return self._derived_value('kpi_trends', build)
+    
+    def compare(self, baseline):
+        """Row-level differences against an earlier snapshot
+        
+        Returns a SnapshotDiff whose changed rows are also available as a Dataset
+        (diff.dataset), so they can be filtered, paged and exported like any other.
+        When either snapshot is streamed, DuckDB compares them off their stores
+        (see StreamedSnapshotDiff) and the changed rows are streamed as well.
+        """
+        key = ('diff', baseline.key, self.key)
+        if self.is_streamed or baseline.is_streamed:
+            if duckdb is None:
+                raise ValueError("Comparing streamed datasets needs the duckdb package")
+            diff = StreamedSnapshotDiff(baseline._diff_source(), self._diff_source())
+            diff.dataset = Dataset(streamed=diff.streamed, key=key, name=self.name)
+            return diff
+        diff = SnapshotDiff(baseline.frame, self.frame)
+        diff.dataset = Dataset(diff.frame, key=key, name=self.name)
+        return diff
+    
+    def _diff_source(self):
+        return self.streamed.store_path if self.is_streamed else self.frame
+    
+    def filter(self, status='All', source='All', conversion='All', search=None, column_labels=None, backend='pandas'):
+        """Rows matching the Status / Source / Conversion filters and a search query
+        
+        Args:
+            status, source: Filter value, or 'All'
+            conversion: 'All', 'Converted' or 'Not Converted'
+            search: Search query (see parse_search_query), or None
+            column_labels: Display labels, so 'column:term' can also match a label
+            backend: 'pandas' (in-memory indexes) or 'duckdb' (SQL); streamed datasets
+                always use DuckDB when it is installed
+        
+        Returns:
+            Selection over the matching rows. Selections are memoized per filter
+            state, so repeating a filter state reuses its mask, count and metrics.
+        """
+        search_key = search_query_key(search, column_labels)
+        filtered = (status, source, conversion) != ('All', 'All', 'All') or search_key is not None
+        backend = 'duckdb' if backend == 'duckdb' or (self.is_streamed and (filtered or duckdb is not None)) else 'pandas'
+        state = (status, source, conversion, search_key, backend)
+        return self._memoized(
+            self._selections, state, lambda: self._select(status, source, conversion, search, column_labels, search_key, backend),
+            self.SELECTION_SLOTS
+        )
+    
+    def apply_view(self, view, backend='pandas'):
+        """Selection for a saved view's filters (see make_view)
+        
+        Memoized like filter(): a session showing the view gets the same Selection.
+        """
+        filters = view['filters']
+        return self.filter(
+            filters['status'], filters['source'], filters['conversion'], filters['search'],
+            column_labels=view_labels(view), backend=backend
+        )
+    
+    def _select(self, status, source, conversion, search, column_labels, search_key, backend):
+        if backend == 'duckdb':
+            engine = self.duckdb_backend
+            return Selection(self, query=engine.where(status, source, conversion, search, column_labels), backend=engine)
+        if self.is_streamed:
+            return Selection(self)
+        
+        row_mask = self.filter_index.mask(status, source, conversion)
+        search_mask = None
+        if search_key is not None:
+            search_mask = self._memoized(
+                self._search_masks, search_key, lambda: self.search_index.search(search, column_labels), self.SEARCH_MASK_SLOTS
+            )
+            if search_mask is not None:
+                row_mask = search_mask if row_mask is None else row_mask & search_mask
+        if search_mask is None:
+            search_key = None
+        return Selection(self, row_mask=row_mask, state=(status, source, conversion, search_key), search_mask=search_mask)
+    
+    def export(self, columns, labels=None, fmt='CSV'):
+        """Export every row (see Selection.export)"""
+        return self.filter().export(columns, labels, fmt)
+
+class Selection:
+    """Rows of a Dataset matching one filter state - created by Dataset.filter()
+    
+    Attributes:
+        dataset: The filtered Dataset
+        count: Number of matching rows
+        row_mask: Boolean mask over all rows (None = all rows) for the pandas backend
+        query: Compiled WHERE clause for the DuckDB backend
+    """
+    
+    def __init__(self, dataset, row_mask=None, query=None, backend=None, state=None, search_mask=None):
+        self.dataset = dataset
+        self.row_mask = row_mask
+        self.query = query
+        self._backend = backend
+        self._state = state  # (status, source, conversion, search key) for in-memory selections
+        self._search_mask = search_mask
+        self._metrics = None
+        self._cube_cells = None
+        if backend is not None:
+            self.count = backend.count(query)
+        elif row_mask is None:
+            self.count = dataset.n_rows
+        else:
+            self.count = int(row_mask.sum())
+    
+    def metrics(self):
+        """KPI metrics over the matching rows (computed once per Selection)"""
+        if self._metrics is None:
+            if self._backend is not None:
+                self._metrics = self._backend.metrics(self.query)
+            elif self.row_mask is None:
+                self._metrics = self.dataset.metrics()
+            else:
+                # Summed from per-cell partials - see FilterMetrics
+                status, source, conversion, search_key = self._state
+                self._metrics = self.dataset.filter_metrics.metrics(
+                    status, source, conversion, search_key=search_key, search_mask=self._search_mask
+                )
+        return self._metrics
+    
+    def breakdown(self, dimension):
+        """KPIs per value of dimension (one of BREAKDOWN_DIMENSIONS) over the matching rows
+        
+        Returns:
+            DataFrame indexed by dimension value with BREAKDOWN_COLUMNS, largest groups first
+        """
+        if self._backend is not None:
+            return self._backend.breakdown(self.query, dimension)
+        if self.dataset.is_streamed:
+            backend = self.dataset.duckdb_backend
+            return backend.breakdown(backend.where(), dimension)
+        cube = self.dataset.breakdown_cube
+        if self._cube_cells is None:
+            # One pass over the rows per filter state; each dimension then only sums cells
+            self._cube_cells = cube.cells(self.row_mask)
+        return cube.breakdown(dimension, self._cube_cells, self.row_mask)
+    
+    def rows(self, columns, sort_column=None, descending=False, page=None, page_size=None):
+        """Matching rows of the given columns, optionally sorted and one page at a time
+        
+        Args:
+            columns: Columns to return
+            sort_column: Column to sort by, or None for file order
+            descending: Sort direction
+            page: Zero-based page number (with page_size)
+            page_size: Rows per page, or None for every matching row
+        """
+        offset = (page or 0) * page_size if page_size else 0
+        if self._backend is not None:
+            return self._backend.rows(self.query, columns, sort_column, descending, limit=page_size, offset=offset)
+        
+        dataset = self.dataset
+        if dataset.is_streamed:
+            # Unfiltered streamed rows come straight from the store, in file order
+            stop = offset + page_size if page_size else dataset.n_rows
+            return dataset.streamed.read_rows(offset, stop, columns)
+        
+        frame = dataset.frame
+        if sort_column is None and page_size is None:
+            return select_rows(frame, self.row_mask, columns)
+        order = dataset.sort_order(sort_column, descending) if sort_column else None
+        positions = page_positions(dataset.n_rows, self.row_mask, order, page or 0, page_size or max(dataset.n_rows, 1))
+        return frame.iloc[positions, [frame.columns.get_loc(col) for col in columns]]
+    
+    def export(self, columns, labels=None, fmt='CSV'):
+        """Export the matching rows of the given columns in one of EXPORT_FORMATS
+        
+        Args:
+            columns: Columns to export, in order
+            labels: Optional {column: header} renames
+            fmt: Key of EXPORT_FORMATS
+        
+        Returns:
+            The exported file as bytes
+        """
+        if self._backend is not None:
+            return self._backend.export(self.query, list(columns), dict(labels or {}), fmt)
+        if self.dataset.is_streamed:
+            # Without DuckDB the rows of a streamed dataset never come into memory at once
+            return self.dataset.duckdb_backend.export(self.dataset.duckdb_backend.where(), list(columns), dict(labels or {}), fmt)
+        return write_export(self.dataset.frame, self.row_mask, list(columns), dict(labels or {}), fmt)
+
+class UploadParser:
+    """Parses an uploaded person_master CSV in a background thread
+    
+    The upload is read in chunks of STREAM_CHUNK_ROWS rows. Each chunk is prepared
+    as it arrives and adds to running KPI aggregates, so progress (rows and bytes)
+    and metrics() over the rows parsed so far are available while the rest is still
+    parsing. cancel() stops the parse at the next chunk. Once the dataset is handed
+    over, the same thread warms its indexes (see Dataset.warm), so the first search
+    on an upload doesn't build the search index on the request thread.
+    
+    Usage:
+        parser = UploadParser(uploaded_file, key, on_done=partial(cache.put, key)).start()
+        parser.state, parser.rows_done, parser.fraction, parser.metrics()
+    """
+    
+    def __init__(self, uploaded_file, key=None, on_done=None):
+        self.key = key
+        self.name = getattr(uploaded_file, 'name', None)
+        self.on_done = on_done
+        self.state = 'pending'  # pending -> running -> done / failed / cancelled
+        self.error = None
+        self.dataset = None
+        self.rows_done = 0
+        self.bytes_done = 0
+        self._data = uploaded_file.getvalue()
+        self.total_bytes = len(self._data)
+        self._partials = []
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        self.state = 'running'
+        self._thread = threading.Thread(target=self._run, name='surstitch-upload-parser', daemon=True)
+        self._thread.start()
+        return self
+    
+    def cancel(self):
+        """Stop parsing; a finished parse is left as it is"""
+        self._cancel.set()
+    
+    @property
+    def running(self):
+        return self.state in ('pending', 'running')
+    
+    @property
+    def fraction(self):
+        """Share of the upload parsed so far, 0 to 1"""
+        return min(self.bytes_done / self.total_bytes, 1.0) if self.total_bytes else 1.0
+    
+    def metrics(self):
+        """KPI metrics over the rows parsed so far"""
+        with self._lock:
+            partials = list(self._partials)
+        return finalize_metrics(combine_metric_partials(partials))
+    
+    def wait(self, timeout=None):
+        """Wait for the parse and the index warm-up that follows it"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.dataset
+    
+    def _run(self):
+        try:
+            handle = io.BytesIO(self._data)
+            chunks = []
+            for chunk in pd.read_csv(handle, dtype=csv_read_dtypes(), chunksize=STREAM_CHUNK_ROWS):
+                if self._cancel.is_set():
+                    self.state = 'cancelled'
+                    return
+                chunk = prepare_dataset(chunk)
+                chunks.append(chunk)
+                with self._lock:
+                    self._partials.append(metric_partials(chunk))
+                    self.rows_done += len(chunk)
+                    self.bytes_done = handle.tell()
+            if chunks:
+                df = prepare_dataset(concat_chunks(chunks))
+            else:
+                # Header-only upload - the chunked reader yields nothing
+                df = prepare_dataset(pd.read_csv(io.BytesIO(self._data), dtype=csv_read_dtypes()))
+            del chunks
+            if self._cancel.is_set():
+                self.state = 'cancelled'
+                return
+            self.bytes_done = self.total_bytes
+            self.dataset = Dataset(df, key=self.key, name=self.name)
+            if self.on_done is not None:
+                self.on_done(self.dataset)
+            self.state = 'done'
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = 'failed'
+            return
+        finally:
+            # The raw upload is no longer needed once parsed
+            self._data = None
+        # Sessions already use the dataset; a search meanwhile waits for this build, not a second one
+        try:
+            self.dataset.warm()
+        except Exception:
+            # Whatever failed to build is built again on first use
+            pass
+
+class OutputFilesWatcher:
+    """Polls the Output-Files directory and preloads new or changed person_master files
+    
+    Each poll looks at the PRELOAD_FILES most recent files. A file whose dataset
+    key (path, mtime, size) is not cached yet is opened and warmed in this
+    worker thread and only then inserted into the DatasetCache, so sessions
+    either find the finished Dataset or, while it is loading, wait on the same
+    cache entry instead of parsing the file a second time.
+    
+    Each file version is preloaded once: if the cache later evicts it, sessions
+    load it on demand. Preloading also stops when the next file wouldn't fit in
+    the cache budget, since it would only evict other datasets.
+    
+    views is an optional callable returning saved views whose selections are
+    precomputed along with the rest (see Dataset.warm).
+    """
+    
+    def __init__(self, cache, interval=WATCH_INTERVAL_SECONDS, preload_files=PRELOAD_FILES, views=None):
+        self.cache = cache
+        self.interval = interval
+        self.preload_files = preload_files
+        self.views = views
+        self.last_scan = None
+        self.last_error = None
+        self.preloaded = 0
+        self._known = {}  # resolved path -> dataset key last preloaded
+        self._settling = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._scan_lock = threading.Lock()
+        self._thread = None
+    
+    def start(self):
+        """Start polling in a daemon thread (no-op if already running)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='surstitch-file-watcher', daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+    
+    def request_scan(self):
+        """Poll now instead of waiting for the next interval"""
+        self._wake.set()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self.scan()
+            self._wake.wait(min(self.interval, WATCH_SETTLE_SECONDS) if self._settling else self.interval)
+            self._wake.clear()
+    
+    def scan(self):
+        """Preload any new or changed files among the most recent ones
+        
+        Returns:
+            List of paths loaded by this scan
+        """
+        loaded = []
+        with self._scan_lock:
+            self._settling = False
+            try:
+                views = self.views() if self.views is not None else ()
+                for path in find_output_files()[:self.preload_files]:
+                    stat = path.stat()
+                    if time.time() - stat.st_mtime < WATCH_SETTLE_SECONDS:
+                        # Possibly still being written - retry shortly
+                        self._settling = True
+                        continue
+                    key = file_dataset_key(path)
+                    previous = self._known.get(key[1])
+                    if previous == key:
+                        continue
+                    if key not in self.cache:
+                        if not self.cache.has_room(estimated_memory_bytes(path)):
+                            break
+                        self.cache.get_or_load(key, lambda: Dataset.open(path, key=key).warm(views))
+                        self.preloaded += 1
+                        loaded.append(path)
+                    if previous is not None:
+                        self.cache.discard(previous)
+                    self._known[key[1]] = key
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            self.last_scan = time.time()
+        return loaded
@@ -0,0 +1,88 @@
+"""
+Checks of DatasetCache's budget, eviction order and session leases
+
+Entries only need an nbytes attribute, so plain namespaces of a fixed size
+stand in for Datasets.
+"""
+
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from surstitch_engine import DatasetCache
+
+MB = 1024 * 1024
+
+def entry(nbytes=MB):
+    return SimpleNamespace(nbytes=nbytes)
+
+def test_get_or_load_loads_once():
+    cache = DatasetCache(10 * MB)
+    calls = []
+    loader = lambda: calls.append(1) or entry()
+    first = cache.get_or_load('a', loader)
+    assert cache.get_or_load('a', loader) is first
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    # A loader returning None caches nothing
+    assert cache.get_or_load('b', lambda: None) is None
+    assert 'b' not in cache
+
+def test_evicts_least_recently_used_over_budget():
+    cache = DatasetCache(3 * MB)
+    for key in 'abc':
+        cache.put(key, entry())
+    cache.get_or_load('a', entry)  # 'b' is now the least recently used
+    cache.put('d', entry())
+    assert [key for key in 'abcd' if key in cache] == ['a', 'c', 'd']
+    assert cache.evictions == 1
+    assert cache.stats()['bytes'] == 3 * MB
+
+def test_newest_entry_stays_even_over_budget():
+    cache = DatasetCache(MB)
+    cache.put('a', entry())
+    cache.put('big', entry(5 * MB))
+    assert 'big' in cache and 'a' not in cache
+
+def test_held_entries_are_not_evicted():
+    cache = DatasetCache(2 * MB)
+    cache.put('a', entry())
+    cache.put('b', entry())
+    cache.acquire('session', ['a', None])
+    cache.put('c', entry())
+    assert [key for key in 'abc' if key in cache] == ['a', 'c']
+    assert not cache.discard('a')
+    assert cache.stats()['held'] == 1
+
+def test_switching_datasets_releases_the_old_one():
+    cache = DatasetCache(2 * MB)
+    cache.put('a', entry())
+    cache.acquire('session', ['a'])
+    cache.put('b', entry())
+    cache.acquire('session', ['b'])
+    cache.put('c', entry())
+    assert 'a' not in cache and 'b' in cache
+    cache.acquire('session', [None])
+    assert cache.stats()['sessions'] == 0
+
+def test_expired_lease_releases_its_entries():
+    cache = DatasetCache(MB, lease_seconds=0.05)
+    cache.put('a', entry())
+    cache.acquire('closed session', ['a'])
+    time.sleep(0.1)
+    cache.put('b', entry())
+    assert 'a' not in cache
+    assert cache.stats()['sessions'] == 0
+
+def test_peek_has_no_side_effects():
+    cache = DatasetCache(2 * MB)
+    cache.put('a', entry())
+    cache.put('b', entry())
+    assert cache.peek('a') is not None and cache.peek('missing') is None
+    assert (cache.hits, cache.misses) == (0, 0)
+    # Peeking didn't make 'a' recently used
+    cache.put('c', entry())
+    assert 'a' not in cache
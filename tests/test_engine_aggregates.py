@@ -0,0 +1,124 @@
+"""
+Cross-checks of the precomputed aggregates against the naive computation
+
+FilterMetrics (filtered KPIs summed from per-cell partials) and BreakdownCube
+(KPI breakdowns from cube cells) must give the same results as running
+calculate_metrics() or a pandas groupby over the filtered rows. Runs headlessly
+on a synthetic file from benchmarks/generate_person_master.py.
+"""
+
+import itertools
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+from generate_person_master import write_person_master
+from surstitch_engine import (
+    BREAKDOWN_BLANK_LABEL, BREAKDOWN_DIMENSIONS, Dataset, breakdown_table, calculate_metrics, duckdb,
+)
+
+N_ROWS = 20_000
+SEARCHES = [None, 'garcia', 'email:gmail', 'zzzz']
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    path = write_person_master(tmp_path_factory.mktemp('data') / 'person_master_20250901.csv', N_ROWS, seed=7)
+    return Dataset.open(path, streaming=False)
+
+def filter_states(dataset):
+    """Every combination of the two most common Status / Source values, conversion and search"""
+    options = dataset.filter_options()
+    statuses = ['All'] + options.get('status', [])[:2]
+    sources = ['All'] + options.get('source', [])[:2]
+    return itertools.product(statuses, sources, ['All', 'Converted', 'Not Converted'], SEARCHES)
+
+def naive_mask(dataset, status, source, conversion, search):
+    """Row mask from plain column comparisons (search reuses the search index)"""
+    df = dataset.frame
+    mask = np.ones(len(df), dtype=bool)
+    if status != 'All':
+        mask &= (df['Lead_Status'] == status).to_numpy()
+    if source != 'All':
+        mask &= (df['Lead_Source'] == source).to_numpy()
+    if conversion != 'All':
+        converted = df['Is_Converted_Bool'].to_numpy(dtype=bool)
+        mask &= converted if conversion == 'Converted' else ~converted
+    if search:
+        mask &= dataset.search_index.search(search)
+    return mask
+
+def assert_metrics_equal(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, float) and not math.isnan(value):
+            assert actual[key] == pytest.approx(value, rel=1e-9, abs=1e-9), key
+        elif isinstance(value, float):
+            assert math.isnan(actual[key]), key
+        else:
+            assert actual[key] == value, key
+
+def naive_breakdown(df, dimension):
+    """KPIs per dimension value with a pandas groupby"""
+    values = df[dimension].astype(object)
+    groups = values.where(values.notna(), BREAKDOWN_BLANK_LABEL).astype(str)
+    grouped = df.assign(_speed=df['Speed_to_Lead_Seconds'].astype('float64')).groupby(groups, sort=False)
+    table = pd.DataFrame({
+        'lead_count': grouped.size(),
+        'l2qr_count': grouped['Has_L2QR'].sum(),
+        'converted_count': grouped['Is_Converted_Bool'].sum(),
+        'median_speed_to_lead_seconds': grouped['_speed'].median(),
+    })
+    return breakdown_table(table, dimension)
+
+def assert_breakdowns_equal(actual, expected):
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_index_type=False, rtol=1e-9)
+
+def test_filtered_metrics_match_calculate_metrics(dataset):
+    for status, source, conversion, search in filter_states(dataset):
+        selection = dataset.filter(status, source, conversion, search)
+        expected = calculate_metrics(dataset.frame[naive_mask(dataset, status, source, conversion, search)])
+        assert selection.count == expected['lead_count'], (status, source, conversion, search)
+        assert_metrics_equal(selection.metrics(), expected)
+
+def test_repeated_filter_state_reuses_selection(dataset):
+    first = dataset.filter('All', 'All', 'Converted', 'garcia')
+    assert dataset.filter('All', 'All', 'Converted', 'garcia') is first
+
+def test_breakdowns_match_groupby(dataset):
+    dimensions = [col for col in BREAKDOWN_DIMENSIONS if col in dataset.columns]
+    assert dimensions
+    for status, source, conversion, search in filter_states(dataset):
+        selection = dataset.filter(status, source, conversion, search)
+        rows = dataset.frame[naive_mask(dataset, status, source, conversion, search)]
+        for dimension in dimensions:
+            assert_breakdowns_equal(selection.breakdown(dimension), naive_breakdown(rows, dimension))
+
+@pytest.mark.skipif(duckdb is None, reason="duckdb is not installed")
+def test_duckdb_matches_in_memory(dataset):
+    # DuckDB search scans every column per term, so only one searched state is checked
+    states = [state for state in filter_states(dataset) if state[3] is None] + [('All', 'All', 'Converted', 'garcia')]
+    for status, source, conversion, search in states:
+        in_memory = dataset.filter(status, source, conversion, search)
+        sql = dataset.filter(status, source, conversion, search, backend='duckdb')
+        assert sql.count == in_memory.count
+        assert_metrics_equal(sql.metrics(), in_memory.metrics())
+        assert_breakdowns_equal(sql.breakdown('Lead_Owner'), in_memory.breakdown('Lead_Owner'))
+
+@pytest.mark.skipif(duckdb is None, reason="duckdb is not installed")
+@pytest.mark.parametrize('sort_column, descending', [(None, False), ('Lead_Status', False), ('Lead_Status', True)])
+def test_duckdb_pages_match_in_memory(dataset, sort_column, descending):
+    # Lead_Status repeats on most rows, so the pages only line up if ties keep file order
+    in_memory = dataset.filter('All', 'All', 'Converted', None)
+    sql = dataset.filter('All', 'All', 'Converted', None, backend='duckdb')
+    page_size = 997
+    for page in range(math.ceil(in_memory.count / page_size)):
+        expected = in_memory.rows(['Person_UUID'], sort_column, descending, page=page, page_size=page_size)
+        actual = sql.rows(['Person_UUID'], sort_column, descending, page=page, page_size=page_size)
+        assert actual['Person_UUID'].tolist() == expected['Person_UUID'].tolist(), page
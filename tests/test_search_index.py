@@ -0,0 +1,62 @@
+"""
+Checks of SearchIndex query matching on a small hand-made frame
+
+Covers prefix tokens, AND-ed terms, 'column:term' scoping by column name or
+label, the fallback for unknown scopes and missing values.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from surstitch_engine import SearchIndex, search_query_key
+
+@pytest.fixture(scope='module')
+def index():
+    return SearchIndex(pd.DataFrame({
+        'Full_Name': ['Ana Garcia', 'Bob Smith', 'Garcia Lopez', None],
+        'Email': ['ana@acme.com', 'bob@garcia.io', None, 'dee@acme.com'],
+        'Lead_Owner': ['Smith', 'Jones', 'Jones', 'Smith'],
+    }))
+
+def rows(mask):
+    return np.flatnonzero(mask).tolist()
+
+@pytest.mark.parametrize('query, expected', [
+    ('garcia', [0, 1, 2]),
+    ('GAR', [0, 1, 2]),       # tokens are case-insensitive prefixes
+    ('arc', []),              # ...of whole tokens only
+    ('garcia smith', [0, 1]), # terms are AND-ed, each may match any column
+    ('ana garcia', [0]),
+    ('acme.com', [0, 3]),     # punctuation splits a term into tokens that must all match
+    ('zzz', []),
+])
+def test_prefix_matching(index, query, expected):
+    assert rows(index.search(query)) == expected
+
+@pytest.mark.parametrize('query, expected', [
+    ('email:garcia', [1]),
+    ('name:garcia', [0, 2]),
+    ('owner:smi', [0, 3]),
+    ('EMAIL:acme name:ana', [0]),
+    ('nosuchcolumn:garcia', []),  # unknown scope searches the whole term everywhere
+])
+def test_column_scoped_terms(index, query, expected):
+    assert rows(index.search(query)) == expected
+
+def test_scope_matches_column_labels(index):
+    labels = {'Lead_Owner': 'Rep'}
+    assert rows(index.search('rep:jones', labels)) == [1, 2]
+    assert rows(index.search('rep:jones')) == []
+    assert search_query_key('rep:jones', labels) != search_query_key('rep:jones')
+    assert search_query_key('jones', labels) == search_query_key('jones')
+
+def test_queries_without_tokens(index):
+    assert index.search('') is None
+    assert index.search('  :: ') is None
+    assert index.search('name:') is None
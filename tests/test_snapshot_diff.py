@@ -0,0 +1,83 @@
+"""
+Checks of SnapshotDiff and its DuckDB counterpart StreamedSnapshotDiff
+
+The baseline is the current snapshot with known edits undone (rows dropped,
+a column changed, rows that no longer exist, a duplicate key), so the expected
+counts are known up front. Streamed and mixed comparisons must give exactly
+the in-memory result.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+from generate_person_master import write_person_master
+from surstitch_engine import DIFF_COLUMNS, Dataset, duckdb, pq
+
+N_ROWS = 2_000
+ADDED = 100    # current rows missing from the baseline
+CHANGED = 100  # rows whose Lead_Status differs
+REMOVED = 50   # baseline rows missing from the current snapshot
+
+@pytest.fixture(scope='module')
+def snapshots(tmp_path_factory):
+    folder = tmp_path_factory.mktemp('data')
+    current_path = write_person_master(folder / 'person_master_20250901.csv', N_ROWS, seed=3)
+    current = pd.read_csv(current_path, dtype=str, keep_default_na=False)
+
+    gone = pd.read_csv(write_person_master(folder / 'other.csv', REMOVED, seed=4), dtype=str, keep_default_na=False)
+    gone['Person_UUID'] = 'gone-' + gone['Person_UUID']
+    baseline = current.iloc[ADDED:].copy()
+    baseline.loc[baseline.index[:CHANGED], 'Lead_Status'] = 'Changed Status'
+    # A repeated key keeps its first row
+    baseline = pd.concat([baseline, gone, baseline.iloc[-1:]], ignore_index=True)
+    baseline_path = folder / 'person_master_20250801.csv'
+    baseline.to_csv(baseline_path, index=False)
+    return baseline_path, current_path
+
+def test_snapshot_diff_counts(snapshots):
+    baseline_path, current_path = snapshots
+    diff = Dataset.open(current_path, streaming=False).compare(Dataset.open(baseline_path, streaming=False))
+
+    assert (diff.added_count, diff.changed_count, diff.removed_count) == (ADDED, CHANGED, REMOVED)
+    assert diff.unchanged_count == N_ROWS - ADDED - CHANGED
+    assert diff.duplicate_keys == 1
+    assert diff.column_changes.to_dict() == {'Lead_Status': CHANGED}
+
+    frame = diff.frame
+    assert list(frame.columns[:len(DIFF_COLUMNS)]) == DIFF_COLUMNS
+    assert frame['Change_Type'].value_counts().to_dict() == {'Added': ADDED, 'Changed': CHANGED, 'Removed': REMOVED}
+    changed = frame[frame['Change_Type'] == 'Changed']
+    assert (changed['Changed_Columns'] == 'Lead_Status').all()
+    # Changed rows carry the current values, removed rows the baseline values
+    assert (changed['Lead_Status'] != 'Changed Status').all()
+    assert frame.loc[frame['Change_Type'] == 'Removed', 'Person_UUID'].str.startswith('gone-').all()
+    assert diff.dataset.n_rows == ADDED + CHANGED + REMOVED
+
+def as_text(frame):
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).astype(str).reset_index(drop=True)
+
+@pytest.mark.skipif(duckdb is None or pq is None, reason="streamed comparison needs duckdb and pyarrow")
+@pytest.mark.parametrize('streamed', [(True, True), (True, False), (False, True)], ids=['both', 'baseline', 'current'])
+def test_streamed_diff_matches_in_memory(snapshots, streamed):
+    baseline_path, current_path = snapshots
+    expected = Dataset.open(current_path, streaming=False).compare(Dataset.open(baseline_path, streaming=False))
+    baseline = Dataset.open(baseline_path, streaming=streamed[0])
+    current = Dataset.open(current_path, streaming=streamed[1])
+    diff = current.compare(baseline)
+
+    for count in ('added_count', 'changed_count', 'removed_count', 'unchanged_count', 'duplicate_keys'):
+        assert getattr(diff, count) == getattr(expected, count), count
+    pd.testing.assert_series_equal(diff.column_changes, expected.column_changes)
+    assert diff.dataset.is_streamed
+    rows = diff.streamed.read_rows(0, diff.dataset.n_rows, diff.dataset.columns)
+    assert list(rows.columns) == list(expected.frame.columns)
+    # Columns a streamed store keeps as text come back as text, so compare row identities and a listed column
+    compared = DIFF_COLUMNS + ['Person_UUID', 'Lead_Status']
+    pd.testing.assert_frame_equal(as_text(rows[compared]), as_text(expected.frame[compared]))
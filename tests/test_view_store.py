@@ -0,0 +1,63 @@
+"""
+Checks of saved table views: make_view, view_key and the ViewStore round trip
+
+A view saved to SQLite must come back equal to what was saved, keep the same
+key, and select the same rows as the filters it was made from.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+from generate_person_master import write_person_master
+from surstitch_engine import COLUMN_LABEL_DICTIONARY, Dataset, ViewStore, make_view, view_key, view_labels
+
+FILTERS = {'status': 'Open', 'conversion': 'Converted', 'search': 'email:gmail'}
+
+@pytest.fixture
+def store(tmp_path):
+    return ViewStore(tmp_path / 'views.db')
+
+def test_make_view_normalizes(store):
+    labels = {**COLUMN_LABEL_DICTIONARY, 'Lead_Owner': 'Rep'}
+    view = make_view(['Lead_Owner', 'Person_UUID', 'Lead_Owner'], labels, FILTERS)
+    assert view['columns'] == ['Lead_Owner', 'Person_UUID']
+    # Only labels that differ from the dictionary are stored
+    assert view['labels'] == {'Lead_Owner': 'Rep'}
+    assert view['filters'] == {**FILTERS, 'source': 'All'}
+    assert view_labels(view)['Lead_Owner'] == 'Rep'
+    assert view_key(view) == view_key(make_view(['Person_UUID', 'Lead_Owner'], labels, FILTERS))
+    assert view_key(view) != view_key(make_view(['Person_UUID'], labels, FILTERS))
+
+def test_round_trip(store):
+    first = make_view(['Person_UUID', 'Lead_Owner'], {'Lead_Owner': 'Rep'}, FILTERS)
+    second = make_view(['Person_UUID'], {})
+    assert store.save('Mine', first) == view_key(first)
+    store.save('all', second)
+
+    assert store.get('Mine') == first
+    assert store.get('missing') is None
+    assert store.keys() == {'all': view_key(second), 'Mine': view_key(first)}
+    assert list(store.keys()) == ['all', 'Mine']  # case-insensitive name order
+    assert store.views() == [second, first]  # most recently saved first
+
+    # Saving under an existing name replaces it; the store survives reopening
+    store.save('Mine', second)
+    reopened = ViewStore(store.db_path)
+    assert reopened.get('Mine') == second
+    reopened.delete('Mine')
+    assert reopened.keys() == {'all': view_key(second)}
+
+def test_saved_view_selects_like_its_filters(store, tmp_path):
+    dataset = Dataset.open(write_person_master(tmp_path / 'person_master_20250901.csv', 2_000, seed=5), streaming=False)
+    status = dataset.filter_options()['status'][0]
+    filters = {**FILTERS, 'status': status}
+    store.save('view', make_view(dataset.columns, {}, filters))
+
+    selection = dataset.apply_view(store.get('view'))
+    expected = dataset.filter(status, 'All', 'Converted', 'email:gmail')
+    assert selection.count == expected.count > 0
@@ -4,15 +4,37 @@ Based on ui_template.html design
 Created: Sept 4, 2025
 
 This viewer is designed to work both locally and on Streamlit Cloud
+Loading, indexing, metrics and exports live in surstitch_engine.py
 """
 
 import streamlit as st
 import pandas as pd
-import os
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
-import random
-import json
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+import hashlib
+import math
+import time
+from urllib.parse import quote
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # older Streamlit - every run counts as one shared session
+    get_script_run_ctx = None
+
+from surstitch_engine import (
+    BREAKDOWN_DIMENSIONS, COLUMN_LABEL_DICTIONARY, DATASET_CACHE_BUDGET_MB, DEFAULT_QUERY_BACKEND, DEFAULT_VISIBLE_COLUMNS, DIFF_COLUMNS,
+    EXPORT_FORMATS, PERF_LOG_PATH, QUERY_BACKENDS, STREAMING_THRESHOLD_MB, VIEW_FILTERS, WATCH_INTERVAL_SECONDS,
+    Dataset, DatasetCache, OutputFilesWatcher, PerfRecorder, UploadParser, SnapshotHistory, ViewStore, calculate_metrics,
+    dataset_stats, exceeds_streaming_threshold, file_dataset_key, find_output_files, format_duration, frame_stats, history_db_path, make_view,
+    snapshot_metrics, view_key, view_labels, views_db_path, write_perf_log,
+)
+
+# Cached datasets are shared by every session - with copy-on-write, frames derived from
+# them (column selections, renames, slices) can never write back into the shared copy
+pd.set_option('mode.copy_on_write', True)
 
 # Define Pacific timezone (PDT = UTC-7 during daylight saving, PST = UTC-8 standard)
 # September is during daylight saving time, so use PDT (UTC-7)
@@ -21,71 +43,15 @@ PDT = timezone(timedelta(hours=-7))
 # Last updated timestamp - UPDATE THIS when making code changes (use your local time with timezone)
 LAST_UPDATED = datetime(2025, 9, 5, 16, 15, 0, tzinfo=PDT)
 
-# Predefined column label mappings - edit this dictionary to rename columns directly in code
-# Format: 'original_column_name': 'Display Name'
-# These mappings are applied automatically when the app loads
-# Users can still override these via the UI column rename feature
-COLUMN_LABEL_DICTIONARY = {
-    # Person and Identity Fields
-    'Person_UUID': 'UNIQUE ID',
-    'lead_first_name': 'First Name', 
-    'lead_last_name': 'Last Name',
-    'lead_full_name': 'Full Name',
-    'Email_Clean': 'Email',
-    'Phone_Clean': 'Phone',
-    
-    # Lead Information
-    'Lead_Status': 'Status',
-    'Lead_Status_Detail': 'Status Detail',
-    'Lead_Source': 'Source',
-    'Lead_RecordId': 'Lead ID',
-    'Is_Converted_Bool': 'Converted',
-    'Has_L2QR': 'Has L2QR',
-    'LeadCreatedDate': 'Lead Created',
-    'ConvertedDate': 'Converted Date',
-    
-    # Activity Metrics
-    'Activity_Count': 'Activities',
-    'Activity_Inbound_Calls': 'Calls (In)',
-    'Activity_Outbound_Calls': 'Calls (Out)', 
-    'Activity_Text_Messages': 'SMS',
-    'Activity_Emails': 'Emails',
-    'Activity_Voicemails': 'VMs',
-    'Activity_Form_Fills': 'Forms',
-    
-    # Speed and Performance Metrics
-    'Speed_to_Lead': 'S2L',
-    'First_Call_DateTime': 'First Call Time',
-    'Activity_First_Touch': 'First Touch Time',
-    
-    # Company and Contact Information
-    'Company': 'Company Name',
-    'Title': 'Job Title',
-    'lead_city': 'City',
-    'lead_state': 'State',
-    'lead_country': 'Country',
-    'lead_postal_code': 'Zip Code',
-    
-    # Marketing and Campaign Fields
-    'utm_source': 'UTM Source',
-    'utm_medium': 'UTM Medium', 
-    'utm_campaign': 'UTM Campaign',
-    'utm_content': 'UTM Content',
-    'utm_term': 'UTM Term',
-    
-    # Owner and Assignment
-    'Lead_Owner': 'Owner',
-    'Lead_Owner_Role': 'Owner Role',
-    
-    # Additional metrics and fields
-    'MQL_Date': 'MQL Date',
-    'SQL_Date': 'SQL Date',
-    'Opportunity_Amount': 'Opportunity Value',
-    'Days_to_Convert': 'Days to Convert',
-    
-    # Add more column mappings as needed
-    # Simply edit this dictionary to rename columns without using the UI
-}
+# Paged table view - only one page of rows is serialized and sent to the browser
+PAGE_SIZE_OPTIONS = [50, 100, 250, 500, 1000]
+DEFAULT_PAGE_SIZE = 100
+
+# Number of most recent days shown in KPI sparklines
+SPARKLINE_DAYS = 30
+
+# While an upload is parsing, the KPI bands refresh this often (in seconds) to show progress
+UPLOAD_POLL_SECONDS = 0.5
 
 # Page config - MUST BE FIRST
 st.set_page_config(
@@ -347,122 +313,138 @@ if 'show_sparklines' not in st.session_state:
     st.session_state.show_sparklines = False
 if 'show_deltas' not in st.session_state:
     st.session_state.show_deltas = False
-if 'uploaded_file' not in st.session_state:
-    st.session_state.uploaded_file = None
-if 'selected_columns' not in st.session_state:
-    st.session_state.selected_columns = None
+if 'show_snapshot_trends' not in st.session_state:
+    st.session_state.show_snapshot_trends = False
+if 'show_breakdown' not in st.session_state:
+    st.session_state.show_breakdown = False
+if 'column_fragments' not in st.session_state:
+    # Keys of the fragments the last full run drew from the column setup (see rerun_column_fragments)
+    st.session_state.column_fragments = []
 if 'column_labels' not in st.session_state:
     # Initialize with predefined dictionary labels
     st.session_state.column_labels = COLUMN_LABEL_DICTIONARY.copy()
-if 'editing_column' not in st.session_state:
-    st.session_state.editing_column = None
+if 'column_editor_version' not in st.session_state:
+    st.session_state.column_editor_version = 0
 if 'column_visibility' not in st.session_state:
     st.session_state.column_visibility = {}
 
-def find_output_files():
-    """Find all person_master CSV files in Output-Files directory"""
-    # Try different paths for local development
-    possible_paths = [
-        Path("Output-Files"),  # If running from main SurStitch directory
-        Path("../../Output-Files"),  # If running from UI/STREAMLIT
-        Path("D:/08 - APPS & DEVELOPMENT/salesforce-data-anlayzer/SurStitch/Output-Files"),  # Absolute path
-    ]
-    
-    for base_path in possible_paths:
-        if base_path.exists():
-            csv_files = list(base_path.glob("person_master_*.csv"))
-            if csv_files:
-                return sorted(csv_files, reverse=True)
-    return []
-
-def load_data(file_path=None, uploaded_file=None):
-    """Load data from file path or uploaded file"""
+@st.cache_resource
+def get_dataset_cache():
+    """Shared dataset cache - st.cache_resource keeps one instance across reruns and sessions"""
+    return DatasetCache(budget_bytes=DATASET_CACHE_BUDGET_MB * 1024 * 1024)
+
+def saved_views():
+    """Every saved view, read from the watcher thread (outside any session)"""
+    return ViewStore(views_db_path(find_output_files())).views()
+
+@st.cache_resource
+def get_file_watcher():
+    """Background preloader for new person_master files, started once per process
+    
+    Saved views are precomputed for each preloaded file as well.
+    """
+    return OutputFilesWatcher(get_dataset_cache(), views=saved_views).start()
+
+def current_session_id():
+    """Id of the browser session running this script ('local' outside a Streamlit server)"""
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    return ctx.session_id if ctx is not None else 'local'
+
+def upload_dataset_key(uploaded_file):
+    """Cache key for an uploaded file: hash of its content"""
+    # Hashing a large upload is not free, so remember the digest per upload in the session
+    digests = st.session_state.setdefault('upload_digests', {})
+    file_id = getattr(uploaded_file, 'file_id', None)
+    if file_id not in digests:
+        digests[file_id] = hashlib.blake2b(uploaded_file.getvalue(), digest_size=16).hexdigest()
+    return ('upload', digests[file_id])
+
+def load_dataset(file_path):
+    """Load a local file through the shared dataset cache
+    
+    Files larger than STREAMING_THRESHOLD_MB are opened in streaming mode.
+    
+    Returns:
+        The Dataset, or None if nothing could be loaded. dataset.key identifies
+        this exact data version for derived caches.
+    """
+    if not file_path:
+        return None
     try:
-        if uploaded_file is not None:
-            df = pd.read_csv(uploaded_file)
-        elif file_path:
-            df = pd.read_csv(file_path)
-        else:
-            return None
-            
-        # Ensure required columns exist
-        required_cols = ['Person_UUID', 'Lead_Status', 'Lead_Source']
-        for col in required_cols:
-            if col not in df.columns:
-                df[col] = 'Unknown'
-                
-        return df
+        key = file_dataset_key(file_path)
+        loader = partial(Dataset.open, file_path, key=key)
+        if exceeds_streaming_threshold(file_path):
+            with st.spinner(f"Indexing {Path(file_path).name} in chunks..."):
+                return get_dataset_cache().get_or_load(key, loader)
+        return get_dataset_cache().get_or_load(key, loader)
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None
 
-def calculate_metrics(df):
-    """Calculate all KPI metrics from dataframe"""
-    if df is None or df.empty:
-        return {
-            'lead_count': 0,
-            'l2qr_count': 0,
-            'converted_count': 0,
-            'lead_to_convert_pct': 0,
-            'lead_to_l2qr_pct': 0,
-            'l2qr_to_convert_pct': 0,
-            'median_speed_to_lead': '00:00',
-            'activity_count_avg': 0
-        }
-    
-    metrics = {}
-    
-    # Main metrics
-    metrics['lead_count'] = len(df)
-    
-    # Check for L2QR column
-    if 'Has_L2QR' in df.columns:
-        metrics['l2qr_count'] = df['Has_L2QR'].astype(str).str.lower().isin(['true', 'yes', '1']).sum()
-    else:
-        metrics['l2qr_count'] = 0
-    
-    # Check for conversion column
-    if 'Is_Converted_Bool' in df.columns:
-        metrics['converted_count'] = df['Is_Converted_Bool'].astype(str).str.lower().isin(['true', 'yes', '1']).sum()
-    else:
-        metrics['converted_count'] = 0
-    
-    # Calculate percentages
-    if metrics['lead_count'] > 0:
-        metrics['lead_to_convert_pct'] = (metrics['converted_count'] / metrics['lead_count']) * 100
-        metrics['lead_to_l2qr_pct'] = (metrics['l2qr_count'] / metrics['lead_count']) * 100
-    else:
-        metrics['lead_to_convert_pct'] = 0
-        metrics['lead_to_l2qr_pct'] = 0
+def active_upload():
+    """The uploaded file to show, unless its parse was cancelled for a local file"""
+    uploaded_file = st.session_state.get('csv_uploader')
+    if uploaded_file is None or getattr(uploaded_file, 'file_id', None) == st.session_state.get('dismissed_upload'):
+        return None
+    return uploaded_file
+
+def load_upload(uploaded_file):
+    """Dataset for an upload, parsed in a background thread
     
-    if metrics['l2qr_count'] > 0:
-        metrics['l2qr_to_convert_pct'] = (metrics['converted_count'] / metrics['l2qr_count']) * 100
-    else:
-        metrics['l2qr_to_convert_pct'] = 0
-    
-    # Calculate median speed to lead
-    if 'Speed_to_Lead' in df.columns:
-        # Parse time format (HH:MM or similar)
-        try:
-            speed_values = df['Speed_to_Lead'].dropna()
-            if not speed_values.empty:
-                # Get median value
-                median_val = speed_values.iloc[len(speed_values)//2]
-                metrics['median_speed_to_lead'] = str(median_val)[:5]  # Keep HH:MM format
-            else:
-                metrics['median_speed_to_lead'] = '00:00'
-        except:
-            metrics['median_speed_to_lead'] = '00:00'
-    else:
-        metrics['median_speed_to_lead'] = '00:00'
+    Returns:
+        Tuple of (Dataset or None, UploadParser or None). The parser is returned
+        while it is still running, so the page can show progress and KPIs so far.
+    """
+    key = upload_dataset_key(uploaded_file)
+    cache = get_dataset_cache()
+    if key in cache:
+        return cache.get_or_load(key, lambda: None), None
+    
+    parser = st.session_state.get('upload_parser')
+    if parser is None or parser.key != key:
+        if parser is not None:
+            parser.cancel()
+        parser = UploadParser(uploaded_file, key, on_done=partial(cache.put, key)).start()
+        st.session_state.upload_parser = parser
+    if parser.running:
+        return None, parser
+    
+    # Finished - from now on the dataset comes from the shared cache
+    st.session_state.upload_parser = None
+    if parser.state == 'failed':
+        st.error(f"Error loading data: {parser.error}")
+    return parser.dataset, None
+
+def cancel_upload(dismiss=False):
+    """Stop parsing the current upload (on_change of the file widgets)
     
-    # Activity count
-    if 'Activity_Count' in df.columns:
-        metrics['activity_count_avg'] = df['Activity_Count'].mean()
-    else:
-        metrics['activity_count_avg'] = 0
+    With dismiss, the upload is also set aside so the selected local file is shown;
+    uploading a file again parses it.
+    """
+    parser = st.session_state.get('upload_parser')
+    if parser is None or not parser.running:
+        return
+    parser.cancel()
+    st.session_state.upload_parser = None
+    if dismiss and st.session_state.get('csv_uploader') is not None:
+        st.session_state.dismissed_upload = getattr(st.session_state.csv_uploader, 'file_id', None)
+
+@st.cache_resource(max_entries=2, show_spinner="Comparing snapshots...")
+def get_snapshot_diff(baseline_key, current_key, _baseline, _current):
+    """Snapshot diff per pair of dataset versions, shared across sessions"""
+    return _current.compare(_baseline)
+
+def build_export(selection, columns, labels, fmt):
+    """Export bytes of a Selection for one download
     
-    return metrics
+    Passed to st.download_button as a deferred callable, so this only runs when
+    a user actually clicks a download button. The bytes are not kept afterwards:
+    a cached copy would sit outside the dataset cache's memory budget.
+    """
+    started = time.perf_counter()
+    data = selection.export(columns, dict(labels), fmt)
+    record_export_timing(fmt, selection.count, len(data), started)
+    return data
 
 def calculate_column_widths(columns, column_labels):
     """Calculate appropriate column widths based on header labels.
@@ -521,31 +503,74 @@ def calculate_column_widths(columns, column_labels):
     
     return column_config
 
-def generate_sparkline_data(base_value, num_points=8):
-    """Generate fake sparkline data for demo purposes"""
-    points = [base_value * random.uniform(0.8, 1.2) for _ in range(num_points)]
-    return points
-
-def generate_delta(current, trend='up'):
-    """Generate fake delta values for demo purposes"""
-    if trend == 'up':
-        dod = random.uniform(0.1, 2.0)
-        wow = random.uniform(1.0, 8.0)
-        mom = random.uniform(5.0, 20.0)
-    elif trend == 'down':
-        dod = -random.uniform(0.1, 2.0)
-        wow = -random.uniform(1.0, 8.0)
-        mom = -random.uniform(5.0, 20.0)
-    else:
-        dod = 0
-        wow = random.uniform(-2.0, 2.0)
-        mom = random.uniform(-5.0, 5.0)
-    
-    return {
-        'dod': dod,
-        'wow': wow,
-        'mom': mom
+def render_sparkline(trends, kpi, scale=1):
+    """Line chart of the last SPARKLINE_DAYS daily values of a KPI"""
+    daily = trends['daily']
+    if kpi not in daily.columns:
+        st.caption("No dated rows to chart")
+        return
+    st.line_chart(daily[kpi].iloc[-SPARKLINE_DAYS:] * scale, height=50, use_container_width=True)
+
+def delta_chips_html(trends, kpi, lower_is_better=False):
+    """DoD / WoW / MoM chips for a KPI, colored by whether the change is an improvement"""
+    deltas = trends['deltas'].get(kpi, {})
+    chips = []
+    for label, period in (('DoD', 'dod'), ('WoW', 'wow'), ('MoM', 'mom')):
+        change = deltas.get(period)
+        if change is None:
+            chips.append(f'<span class="chip neutral">{label} ■ n/a</span>')
+        elif round(change, 1) == 0:
+            chips.append(f'<span class="chip neutral">{label} ■ 0.0%</span>')
+        else:
+            improved = change < 0 if lower_is_better else change > 0
+            arrow = '▲' if change > 0 else '▼'
+            chips.append(f'<span class="chip {"up" if improved else "down"}">{label} {arrow} {change:+.1f}%</span>')
+    return f'<div style="margin-top: 8px;">{"".join(chips)}</div>'
+
+@st.cache_resource
+def get_snapshot_history(db_path):
+    """Snapshot history store shared across sessions"""
+    return SnapshotHistory(db_path)
+
+@st.cache_resource
+def get_view_store(db_path):
+    """Saved views store shared across sessions"""
+    return ViewStore(db_path)
+
+@st.cache_resource
+def get_perf_events():
+    """Recent export timings - exports run outside script runs, so they're kept here for the panel"""
+    return deque(maxlen=10)
+
+def record_export_timing(fmt, rows, nbytes, started):
+    """Log how long generating one export took"""
+    event = {
+        'time': datetime.now(timezone.utc).isoformat(),
+        'event': 'export',
+        'format': fmt,
+        'rows': rows,
+        'bytes': nbytes,
+        'ms': (time.perf_counter() - started) * 1000,
     }
+    get_perf_events().append(event)
+    write_perf_log(event)
+
+@contextmanager
+def fragment_perf(name, **context):
+    """Stage recorder for a fragment
+    
+    During a full run a fragment's stages go into the page's recorder. A fragment
+    rerun doesn't run the script, so the page's recorder has already finished:
+    the rerun gets a recorder of its own, logged with the fragment's name and
+    kept for the Performance panel.
+    """
+    if not perf.finished:
+        yield perf
+        return
+    recorder = PerfRecorder()
+    yield recorder
+    record = recorder.finish(event='fragment', fragment=name, session=current_session_id(), **context)
+    st.session_state.fragment_perf_record = record
 
 def get_relative_time(last_updated):
     """Calculate relative time from last update"""
@@ -586,6 +611,513 @@ def get_relative_time(last_updated):
         years = int(days / 365)
         return f"{years} year{'s' if years != 1 else ''} ago"
 
+def reset_column_editor():
+    """Drop pending edits so the column editor redraws from session state"""
+    st.session_state.column_editor_version += 1
+
+def visible_columns(columns):
+    """Columns of a dataset the table shows, in column manager order"""
+    columns = set(columns)
+    return [col for col, visible in st.session_state.column_visibility.items() if visible and col in columns]
+
+def rerun_column_fragments(labels_changed=False):
+    """Redraw what shows the column setup after a column manager change (from widget callbacks)
+    
+    Only the column manager and the table fragments rerun, which page the memoized
+    Selection. A label change also redraws the breakdown. Labels decide what an
+    active column:term search matches, so then the whole page reruns to filter again.
+    """
+    if labels_changed and ':' in (st.session_state.get('filter_search') or ''):
+        st.rerun()
+    fragments = [key for key in st.session_state.column_fragments if labels_changed or key != 'breakdown']
+    st.rerun(['column_manager'] + fragments)
+
+def show_all_columns(dataset_columns, visible):
+    for col in dataset_columns:
+        st.session_state.column_visibility[col] = visible
+    reset_column_editor()
+    rerun_column_fragments()
+
+def reset_columns(dataset_columns):
+    # Predefined dictionary labels and the default columns
+    st.session_state.column_labels = COLUMN_LABEL_DICTIONARY.copy()
+    for col in dataset_columns:
+        st.session_state.column_visibility[col] = col in DEFAULT_VISIBLE_COLUMNS
+    reset_column_editor()
+    rerun_column_fragments(labels_changed=True)
+
+def apply_column_edits(current):
+    """Write the rows the user touched in the column editor back in one batch"""
+    editor_state = st.session_state.get(f"column_editor_{st.session_state.column_editor_version}") or {}
+    labels_changed = False
+    for row, changes in editor_state.get('edited_rows', {}).items():
+        col = current.at[int(row), 'Column']
+        if 'Show' in changes:
+            st.session_state.column_visibility[col] = bool(changes['Show'])
+        label = (changes.get('Label') or '').strip()
+        if 'Label' in changes and label != current.at[int(row), 'Label']:
+            st.session_state.column_labels[col] = label or col
+            labels_changed = True
+    reset_column_editor()
+    rerun_column_fragments(labels_changed)
+
+@st.fragment(key="column_manager")
+def render_column_manager(dataset_columns):
+    """Sidebar column manager
+    
+    One editable table of every column (show/hide and display label) inside a
+    form, so edits cost nothing until Apply commits them to column_visibility
+    and column_labels in one batch. Rendering is a single widget whatever the
+    column count. Applying reruns only this and the table fragments (see
+    rerun_column_fragments), which read the columns from session state.
+    """
+    # Column Manager Container
+    st.markdown('<div class="column-manager">', unsafe_allow_html=True)
+    
+    # Quick actions
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.button("Show All", type="secondary", key="show_all_cols", on_click=show_all_columns, args=(dataset_columns, True))
+    with col2:
+        st.button("Hide All", type="secondary", key="hide_all_cols", on_click=show_all_columns, args=(dataset_columns, False))
+    with col3:
+        st.button("Reset", type="secondary", key="reset_cols", on_click=reset_columns, args=(dataset_columns,))
+    
+    # Display labels: session state > dictionary > original column name
+    current = pd.DataFrame({
+        'Show': [bool(st.session_state.column_visibility.get(col, False)) for col in dataset_columns],
+        'Label': [st.session_state.column_labels.get(col, COLUMN_LABEL_DICTIONARY.get(col, col)) or col for col in dataset_columns],
+        'Column': list(dataset_columns),
+    })
+    
+    with st.form("column_manager_form", border=False):
+        st.data_editor(
+            current,
+            key=f"column_editor_{st.session_state.column_editor_version}",
+            hide_index=True,
+            use_container_width=True,
+            height=min(35 * (len(current) + 1) + 3, 420),
+            num_rows="fixed",
+            disabled=['Column'],
+            column_config={
+                'Show': st.column_config.CheckboxColumn("Show", width="small", help="Show/Hide column"),
+                'Label': st.column_config.TextColumn("Label", help="Rename column"),
+                'Column': st.column_config.TextColumn("Column", help="Name in the CSV file"),
+            },
+        )
+        col_apply, col_discard = st.columns(2)
+        with col_apply:
+            st.form_submit_button(
+                "Apply", type="primary", use_container_width=True, on_click=apply_column_edits, args=(current,)
+            )
+        with col_discard:
+            # Redrawing the editor from session state drops the pending edits
+            st.form_submit_button("Discard", use_container_width=True, on_click=reset_column_editor)
+    
+    st.markdown("</div>", unsafe_allow_html=True)
+
+def current_view():
+    """The session's visible columns, labels and filters as a view (see make_view)"""
+    return make_view(
+        [col for col, visible in st.session_state.column_visibility.items() if visible],
+        st.session_state.column_labels,
+        {name: st.session_state.get(f"filter_{name}") for name in VIEW_FILTERS},
+    )
+
+def apply_view(view, dataset_columns):
+    """Replace the session's columns, labels and filters with a saved view in one step
+    
+    Must run before the column manager and filter widgets are drawn. The table
+    then comes from the Selection memoized under the view's filters, which the
+    file watcher precomputes for preloaded files.
+    """
+    visible = set(view['columns'])
+    st.session_state.column_visibility = {col: col in visible for col in dict.fromkeys([*dataset_columns, *view['columns']])}
+    st.session_state.column_labels = view_labels(view)
+    for name, value in view['filters'].items():
+        st.session_state[f"filter_{name}"] = value
+    reset_column_editor()
+
+def keep_filter_choice(key, options):
+    """Fall back to 'All' when a view's filter value isn't offered by the current file"""
+    if st.session_state.get(key, 'All') not in options:
+        st.session_state[key] = 'All'
+
+def open_saved_view(view_store):
+    name = st.session_state.saved_view_choice
+    view = view_store.get(name)
+    if view is not None:
+        st.session_state.pending_view = view
+        st.query_params['view'] = name
+
+def save_current_view(view_store):
+    name = st.session_state.view_name.strip()
+    if name:
+        view_store.save(name, current_view())
+        st.session_state.saved_view_choice = name
+        st.session_state.view_name = ""
+        st.query_params['view'] = name
+
+def delete_saved_view(view_store):
+    name = st.session_state.saved_view_choice
+    view_store.delete(name)
+    st.session_state.pop('saved_view_choice', None)
+    if st.query_params.get('view') == name:
+        del st.query_params['view']
+
+def render_saved_views(view_store):
+    """Sidebar section to save the current view and reopen saved ones"""
+    st.markdown("#### 💾 Saved Views")
+    
+    saved = view_store.keys()
+    if saved:
+        if st.session_state.get('saved_view_choice') not in saved:
+            st.session_state.pop('saved_view_choice', None)
+        st.selectbox("Saved view", options=list(saved), key="saved_view_choice", label_visibility="collapsed")
+        col_open, col_delete = st.columns(2)
+        with col_open:
+            st.button("Open", key="open_view", on_click=open_saved_view, args=(view_store,), use_container_width=True)
+        with col_delete:
+            st.button("Delete", key="delete_view", on_click=delete_saved_view, args=(view_store,), use_container_width=True)
+        
+        # Compare digests rather than whole views to find the one on screen
+        current_key = view_key(current_view())
+        matching = [name for name, key in saved.items() if key == current_key]
+        st.caption(f"Showing saved view: {matching[0]} (link: ?view={quote(matching[0])})" if matching else "Current view is not saved")
+    
+    col_name, col_save = st.columns([3, 2])
+    with col_name:
+        st.text_input("View name", key="view_name", placeholder="Name this view", label_visibility="collapsed")
+    with col_save:
+        st.button("Save", key="save_view", on_click=save_current_view, args=(view_store,), use_container_width=True)
+
+def render_kpi_bands(metrics, kpi_trends, upload_parser=None):
+    """Lead and calling KPI cards with their sparklines and deltas
+    
+    Rendered as a fragment. While an upload is parsing, it reruns on its own every
+    UPLOAD_POLL_SECONDS with the KPIs of the rows parsed so far.
+    """
+    if upload_parser is not None:
+        if not upload_parser.running:
+            # Parsing finished - rerun the page to pick the dataset up from the cache
+            st.rerun()
+        metrics = upload_parser.metrics()
+        st.progress(
+            upload_parser.fraction,
+            text=f"Parsing {upload_parser.name}: {upload_parser.rows_done:,} rows · "
+                 f"{upload_parser.bytes_done / 1024 / 1024:,.1f} / {upload_parser.total_bytes / 1024 / 1024:,.1f} MB"
+        )
+    
+    # Main KPIs - More compact layout
+    st.markdown("#### Lead Metrics")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        # Put all HTML in one block to keep it contained
+        card_html = f"""
+        <div style="background: white; border-radius: 16px; border: 1px solid #D6E7FB; box-shadow: 0 1px 2px rgba(0,0,0,.06); padding: 12px; height: 100%;">
+            <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">TOTAL LEADS</div>
+            <div style="font-size: 42px; font-weight: 900; color: #0176D3; line-height: 1;">{metrics["lead_count"]:,}</div>
+        </div>
+        """
+        st.markdown(card_html, unsafe_allow_html=True)
+        
+        if st.session_state.show_sparklines:
+            render_sparkline(kpi_trends, 'lead_count')
+        
+        if st.session_state.show_deltas:
+            st.markdown(delta_chips_html(kpi_trends, 'lead_count'), unsafe_allow_html=True)
+    
+    with col2:
+        card_html = f"""
+        <div style="background: white; border-radius: 16px; border: 1px solid #D6E7FB; box-shadow: 0 1px 2px rgba(0,0,0,.06); padding: 12px; height: 100%;">
+            <div style="display: flex; justify-content: space-between; gap: 12px;">
+                <div style="flex: 1;">
+                    <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">TOTAL QUALIFIED LEADS</div>
+                    <div style="font-size: 42px; font-weight: 900; color: #0176D3; line-height: 1;">{metrics["l2qr_count"]:,}</div>
+                </div>
+                <div style="flex: 1; text-align: right;">
+                    <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">LEADS → QUALIFIED LEADS</div>
+                    <div style="font-size: 28px; font-weight: 800; color: #1B5297; line-height: 1;">{metrics["lead_to_l2qr_pct"]:.1f}%</div>
+                </div>
+            </div>
+        </div>
+        """
+        st.markdown(card_html, unsafe_allow_html=True)
+        
+        if st.session_state.show_sparklines:
+            render_sparkline(kpi_trends, 'l2qr_count')
+        
+        if st.session_state.show_deltas:
+            st.markdown(delta_chips_html(kpi_trends, 'l2qr_count'), unsafe_allow_html=True)
+    
+    with col3:
+        card_html = f"""
+        <div style="background: white; border-radius: 16px; border: 1px solid #D6E7FB; box-shadow: 0 1px 2px rgba(0,0,0,.06); padding: 12px; height: 100%;">
+            <div style="display: flex; justify-content: space-between; gap: 10px;">
+                <div style="flex: 1;">
+                    <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">TOTAL ACCOUNTS</div>
+                    <div style="font-size: 42px; font-weight: 900; color: #0176D3; line-height: 1;">{metrics["converted_count"]:,}</div>
+                </div>
+                <div style="flex: 1; text-align: center;">
+                    <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">LEADS → ACCOUNTS</div>
+                    <div style="font-size: 28px; font-weight: 800; color: #1B5297; line-height: 1;">{metrics["lead_to_convert_pct"]:.2f}%</div>
+                </div>
+                <div style="flex: 1; text-align: right;">
+                    <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">QUALIFIED LEADS → ACCOUNTS</div>
+                    <div style="font-size: 28px; font-weight: 800; color: #1B5297; line-height: 1;">{metrics["l2qr_to_convert_pct"]:.2f}%</div>
+                </div>
+            </div>
+        </div>
+        """
+        st.markdown(card_html, unsafe_allow_html=True)
+        
+        if st.session_state.show_sparklines:
+            render_sparkline(kpi_trends, 'converted_count')
+        
+        if st.session_state.show_deltas:
+            st.markdown(delta_chips_html(kpi_trends, 'converted_count'), unsafe_allow_html=True)
+    
+    
+    # Secondary KPIs - More compact
+    st.markdown("#### Calling Metrics")
+    col1 = st.columns(1)[0]
+    
+    with col1:
+        card_html = f"""
+        <div style="background: white; border-radius: 16px; border: 1px solid #E6EEF9; box-shadow: 0 1px 2px rgba(0,0,0,.06); padding: 12px; height: 100%; max-width: 350px;">
+            <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">MEDIAN SPEED TO LEAD</div>
+            <div style="font-size: 32px; font-weight: 800; color: #1B5297; line-height: 1;">{metrics["median_speed_to_lead"]}</div>
+            <div style="font-size: 12px; color: #6b7280; margin-top: 6px;">P90 {metrics["p90_speed_to_lead"]} · P99 {metrics["p99_speed_to_lead"]}</div>
+        </div>
+        """
+        st.markdown(card_html, unsafe_allow_html=True)
+        
+        if st.session_state.show_sparklines:
+            # For time-based metrics, show daily medians in minutes
+            # Create a narrower chart container
+            with st.container():
+                col_chart, col_empty = st.columns([1, 2])
+                with col_chart:
+                    render_sparkline(kpi_trends, 'median_speed_to_lead_seconds', scale=1 / 60)
+        
+        if st.session_state.show_deltas:
+            # A faster speed to lead is an improvement
+            st.markdown(delta_chips_html(kpi_trends, 'median_speed_to_lead_seconds', lower_is_better=True), unsafe_allow_html=True)
+
+@st.fragment(key="breakdown")
+def render_breakdown(selection, dimensions):
+    """KPI breakdown of a Selection - a fragment, so switching dimensions reruns only this"""
+    with fragment_perf('breakdown', dataset=selection.dataset.key) as recorder:
+        st.markdown("#### KPI Breakdown")
+        breakdown_dimension = st.radio(
+            "Break down by",
+            options=dimensions,
+            format_func=lambda col: st.session_state.column_labels.get(col) or col,
+            horizontal=True,
+            key="breakdown_dimension"
+        )
+        with recorder.stage('breakdown') as stage:
+            breakdown = selection.breakdown(breakdown_dimension)
+            stage.update(frame_stats(breakdown))
+        breakdown = breakdown.reset_index()
+        breakdown['median_speed_to_lead_seconds'] = [
+            format_duration(seconds) for seconds in breakdown['median_speed_to_lead_seconds']
+        ]
+        with recorder.stage('render breakdown'):
+            st.dataframe(
+                breakdown,
+                column_config={
+                    breakdown_dimension: st.session_state.column_labels.get(breakdown_dimension) or breakdown_dimension,
+                    'lead_count': st.column_config.NumberColumn("Leads", format="%d"),
+                    'l2qr_count': st.column_config.NumberColumn("Qualified Leads", format="%d"),
+                    'converted_count': st.column_config.NumberColumn("Accounts", format="%d"),
+                    'lead_to_l2qr_pct': st.column_config.NumberColumn("Lead → Qualified", format="%.1f%%"),
+                    'lead_to_convert_pct': st.column_config.NumberColumn("Lead → Account", format="%.1f%%"),
+                    'l2qr_to_convert_pct': st.column_config.NumberColumn("Qualified → Account", format="%.1f%%"),
+                    'median_speed_to_lead_seconds': "Median Speed to Lead",
+                },
+                use_container_width=True,
+                height=min(400, 38 + 35 * len(breakdown)),
+                hide_index=True
+            )
+
+@st.fragment(key="table")
+def render_table(selection, leading_columns=()):
+    """Paged table and export buttons for a Selection
+    
+    Rendered as a fragment: sorting, paging, export options and column manager
+    changes rerun only this function, which pages the memoized Selection instead
+    of refiltering. Shows leading_columns, then the visible columns.
+    """
+    with fragment_perf('table', dataset=selection.dataset.key) as recorder:
+        table_dataset = selection.dataset
+        filtered_count = selection.count
+        table_columns = list(leading_columns) + visible_columns(table_dataset.columns)
+        
+        # Display the dataframe with selected columns and custom labels
+        if table_columns:
+            # Paged mode sorts server-side and only sends the visible page to the browser
+            col_paged, col_sort, col_order, col_size, col_page = st.columns([1.2, 2, 1, 1, 1])
+            with col_paged:
+                paged_view = st.toggle("Paged view", value=True, help="Send only one page of rows to the browser")
+            
+            if paged_view:
+                with col_sort:
+                    sort_column = st.selectbox(
+                        "Sort by",
+                        options=[None] + table_columns,
+                        format_func=lambda col: "File order" if col is None else st.session_state.column_labels.get(col) or col,
+                        key="table_sort_column"
+                    )
+                with col_order:
+                    sort_descending = st.selectbox(
+                        "Order",
+                        options=["Ascending", "Descending"],
+                        key="table_sort_direction"
+                    ) == "Descending"
+                with col_size:
+                    page_size = st.selectbox(
+                        "Rows per page",
+                        options=PAGE_SIZE_OPTIONS,
+                        index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE),
+                        key="table_page_size"
+                    )
+                page_count = max(1, math.ceil(filtered_count / page_size))
+                # Filters may have shrunk the result since the page was chosen
+                if st.session_state.get('table_page', 1) > page_count:
+                    st.session_state.table_page = page_count
+                with col_page:
+                    page_number = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="table_page")
+                
+                first_row = (page_number - 1) * page_size
+                with recorder.stage('sort + page') as stage:
+                    display_df = selection.rows(table_columns, sort_column, sort_descending, page=page_number - 1, page_size=page_size)
+                    display_stats = frame_stats(display_df)
+                    stage.update(display_stats)
+                st.caption(f"Showing rows {min(first_row + 1, filtered_count):,}–{first_row + len(display_df):,} of {filtered_count:,} (page {page_number:,} of {page_count:,})")
+            else:
+                with recorder.stage('select rows') as stage:
+                    # Materialize only the filtered rows of the selected columns
+                    display_df = selection.rows(table_columns)
+                    # Measured once - renaming below doesn't change the size
+                    display_stats = frame_stats(display_df)
+                    stage.update(display_stats)
+            
+            # Rename columns based on user labels
+            rename_dict = {}
+            for col in table_columns:
+                if col in st.session_state.column_labels and st.session_state.column_labels[col]:
+                    rename_dict[col] = st.session_state.column_labels[col]
+            
+            if rename_dict:
+                display_df = display_df.rename(columns=rename_dict)
+            
+            # Calculate column widths based on header labels
+            with recorder.stage('column widths'):
+                column_config = calculate_column_widths(table_columns, st.session_state.column_labels)
+            
+            # Serializing the frame for the browser happens inside st.dataframe
+            with recorder.stage('render table') as stage:
+                st.dataframe(
+                    display_df,
+                    column_config=column_config,
+                    use_container_width=True,
+                    height=400,
+                    hide_index=True
+                )
+                stage.update(display_stats)
+        else:
+            st.warning("No columns selected. Please select columns to display in the configuration section above.")
+        
+        # Export button - exports with selected columns and custom labels
+        if table_columns:
+            # Exports are generated only when a download button is clicked (deferred callables)
+            export_columns = tuple(table_columns)
+            export_labels = tuple(
+                (col, st.session_state.column_labels[col])
+                for col in export_columns
+                if st.session_state.column_labels.get(col)
+            )
+            all_columns = tuple(table_dataset.columns)
+            
+            col1, col2, col3 = st.columns([2, 2, 1])
+            with col3:
+                export_format = st.selectbox(
+                    "Export format",
+                    options=list(EXPORT_FORMATS.keys()),
+                    label_visibility="collapsed"
+                )
+            extension, mime = EXPORT_FORMATS[export_format]
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            
+            with col1:
+                st.download_button(
+                    label="📥 Export Filtered Data (Custom Columns)",
+                    data=partial(build_export, selection, export_columns, export_labels, export_format),
+                    file_name=f"surstitch_export_{timestamp}.{extension}",
+                    mime=mime
+                )
+            with col2:
+                # Also offer full export
+                st.download_button(
+                    label="📥 Export All Data (All Columns)",
+                    data=partial(build_export, selection, all_columns, (), export_format),
+                    file_name=f"surstitch_full_export_{timestamp}.{extension}",
+                    mime=mime,
+                    type="secondary"
+                )
+
+@st.fragment(key="streamed_page")
+def render_streamed_page(dataset):
+    """One page of a streamed dataset - a fragment, so paging reruns only this"""
+    with fragment_perf('streamed page', dataset=dataset.key) as recorder:
+        columns = visible_columns(dataset.columns)
+        if columns:
+            col_size, col_page, col_spacer = st.columns([1, 1, 3])
+            with col_size:
+                page_size = st.selectbox(
+                    "Rows per page",
+                    options=PAGE_SIZE_OPTIONS,
+                    index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE),
+                    key="streamed_page_size"
+                )
+            page_count = max(1, math.ceil(dataset.n_rows / page_size))
+            # A different file or page size may have fewer pages than the current one
+            if st.session_state.get('streamed_page', 1) > page_count:
+                st.session_state.streamed_page = page_count
+            with col_page:
+                page_number = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="streamed_page")
+            first_row = (page_number - 1) * page_size
+            with recorder.stage('read page') as stage:
+                display_df = dataset.filter().rows(columns, page=page_number - 1, page_size=page_size)
+                display_stats = frame_stats(display_df)
+                stage.update(display_stats)
+            st.caption(f"Showing rows {first_row + 1:,}–{first_row + len(display_df):,} of {dataset.n_rows:,} (page {page_number:,} of {page_count:,})")
+            
+            rename_dict = {
+                col: st.session_state.column_labels[col]
+                for col in columns
+                if st.session_state.column_labels.get(col)
+            }
+            with recorder.stage('render table') as stage:
+                st.dataframe(
+                    display_df.rename(columns=rename_dict),
+                    column_config=calculate_column_widths(columns, st.session_state.column_labels),
+                    use_container_width=True,
+                    height=400,
+                    hide_index=True
+                )
+                stage.update(display_stats)
+        else:
+            st.warning("No columns selected. Please select columns to display in the configuration section above.")
+
+# Stage timings for this run - shown in the sidebar "Performance" expander at the end
+perf = PerfRecorder()
+
+# New exports are parsed and indexed in the background, so sessions open them warm
+file_watcher = get_file_watcher() if WATCH_INTERVAL_SECONDS > 0 else None
+
 # LOAD DATA FIRST (before sidebar)
 # Load data early so we can check if we have data
 output_files = find_output_files()
@@ -594,12 +1126,25 @@ if output_files:
 else:
     selected_path = None
 
+# A ?view=<name> link opens that saved view once, when the session starts
+view_store = get_view_store(str(views_db_path(output_files)))
+if 'url_view_checked' not in st.session_state:
+    st.session_state.url_view_checked = True
+    url_view = st.query_params.get('view')
+    if url_view and view_store.get(url_view) is not None:
+        st.session_state.pending_view = view_store.get(url_view)
+        st.session_state.saved_view_choice = url_view
+
 # Try to load data from uploaded file or local file
-df = None  # Initialize df
-if 'uploaded_file' in st.session_state and st.session_state.uploaded_file:
-    df = load_data(uploaded_file=st.session_state.uploaded_file)
-elif selected_path:
-    df = load_data(file_path=selected_path)
+dataset = None
+upload_parser = None  # Set while an upload is still parsing in the background
+# The uploader widget keeps its file between runs - session state itself holds no data
+with perf.stage('load') as stage:
+    if active_upload():
+        dataset, upload_parser = load_upload(active_upload())
+    elif selected_path:
+        dataset = load_dataset(file_path=selected_path)
+    stage.update(dataset_stats(dataset))
 
 # SIDEBAR CONFIGURATION
 with st.sidebar:
@@ -628,23 +1173,86 @@ with st.sidebar:
         selected_file = st.selectbox(
             "Select Local File",
             options=list(file_options.keys()),
-            index=0 if file_options else None
+            index=0 if file_options else None,
+            # Picking a local file while an upload is still parsing cancels the upload
+            on_change=partial(cancel_upload, dismiss=True)
         )
         selected_path = file_options.get(selected_file)
         # Load the selected file if it's different from what's already loaded
-        if selected_path and (df is None or not st.session_state.uploaded_file):
-            df = load_data(file_path=selected_path)
+        if selected_path and ((dataset is None and upload_parser is None) or not active_upload()):
+            with perf.stage('load selected file') as stage:
+                dataset = load_dataset(file_path=selected_path)
+                stage.update(dataset_stats(dataset))
     
     # File uploader
     uploaded_file = st.file_uploader(
         "Or Upload CSV",
         type=['csv'],
-        key="csv_uploader"
+        key="csv_uploader",
+        on_change=cancel_upload
     )
-    if uploaded_file:
-        st.session_state.uploaded_file = uploaded_file
-        # Load the uploaded file immediately
-        df = load_data(uploaded_file=uploaded_file)
+    if active_upload():
+        with perf.stage('load upload') as stage:
+            dataset, upload_parser = load_upload(uploaded_file)
+            stage.update(dataset_stats(dataset))
+    elif uploaded_file:
+        st.caption("Upload cancelled - showing the selected local file. Upload the file again to parse it.")
+    if upload_parser is not None:
+        st.button("Cancel upload", key="cancel_upload", on_click=partial(cancel_upload, dismiss=True))
+    dataset_key = dataset.key if dataset is not None else None
+    
+    # Snapshot comparison - diff the current data against another local snapshot
+    snapshot_diff = None
+    baseline_key = None
+    current_name = active_upload().name if active_upload() else (selected_path.name if selected_path else None)
+    baseline_options = [f for f in output_files if f.name != current_name]
+    if dataset is not None and baseline_options:
+        if st.toggle("Compare with another snapshot", key="compare_snapshots"):
+            baseline_path = st.selectbox(
+                "Baseline snapshot",
+                options=baseline_options,
+                format_func=lambda f: f.name,
+                key="baseline_snapshot"
+            )
+            with perf.stage('load baseline') as stage:
+                baseline = load_dataset(file_path=baseline_path)
+                stage.update(dataset_stats(baseline))
+            if baseline is not None and (baseline.is_streamed or dataset.is_streamed) and 'duckdb' not in QUERY_BACKENDS:
+                st.warning("Comparing snapshots served from disk needs the duckdb package.")
+            elif baseline is not None:
+                baseline_key = baseline.key
+                with perf.stage('snapshot diff') as stage:
+                    snapshot_diff = get_snapshot_diff(baseline_key, dataset_key, baseline, dataset)
+                    stage.update(dataset_stats(snapshot_diff.dataset), rows=snapshot_diff.dataset.n_rows)
+    
+    # Hold the datasets this session shows, so they stay shared and are not evicted under it
+    get_dataset_cache().acquire(current_session_id(), [dataset_key, baseline_key])
+    
+    # Dataset cache statistics
+    cache_stats = get_dataset_cache().stats()
+    st.caption(
+        f"Dataset cache: {cache_stats['entries']} cached ({cache_stats['held']} in use by "
+        f"{cache_stats['sessions']} session{'s' if cache_stats['sessions'] != 1 else ''}) · "
+        f"{cache_stats['bytes'] / 1024 / 1024:,.1f} / {cache_stats['budget_bytes'] / 1024 / 1024:,.0f} MB · "
+        f"{cache_stats['hits']} hits / {cache_stats['misses']} misses"
+    )
+    if file_watcher is not None and file_watcher.last_scan is not None:
+        st.caption(
+            f"Watching Output-Files: last checked {get_relative_time(datetime.fromtimestamp(file_watcher.last_scan, timezone.utc))}, "
+            f"{file_watcher.preloaded} file{'s' if file_watcher.preloaded != 1 else ''} preloaded"
+            + (f" · {file_watcher.last_error}" if file_watcher.last_error else "")
+        )
+    
+    # Query engine - only offered when DuckDB is installed
+    if len(QUERY_BACKENDS) > 1:
+        st.selectbox(
+            "Query engine",
+            options=QUERY_BACKENDS,
+            index=QUERY_BACKENDS.index(DEFAULT_QUERY_BACKEND),
+            format_func=lambda name: {'pandas': 'In-memory (pandas)', 'duckdb': 'DuckDB (SQL)'}[name],
+            help="DuckDB runs filters, search, KPIs and exports as SQL. Very large files always use it",
+            key="query_backend"
+        )
     
     st.divider()
     
@@ -670,118 +1278,45 @@ with st.sidebar:
         ):
             st.session_state.show_deltas = not st.session_state.show_deltas
     
+    if st.button(
+        "🗂️ Snapshot Trends" + (" ✓" if st.session_state.show_snapshot_trends else ""),
+        key="toggle_snapshot_trends",
+        type="primary" if st.session_state.show_snapshot_trends else "secondary",
+        help="KPI trends across all local person_master files",
+        use_container_width=True
+    ):
+        st.session_state.show_snapshot_trends = not st.session_state.show_snapshot_trends
+    
+    if st.button(
+        "🧮 KPI Breakdown" + (" ✓" if st.session_state.show_breakdown else ""),
+        key="toggle_breakdown",
+        type="primary" if st.session_state.show_breakdown else "secondary",
+        help="KPIs of the filtered rows by owner, source, campaign or state",
+        use_container_width=True
+    ):
+        st.session_state.show_breakdown = not st.session_state.show_breakdown
+    
     st.divider()
     
     # Column Configuration Section
-    if df is not None and not df.empty:
+    dataset_columns = dataset.columns if dataset is not None else []
+    
+    if dataset_columns and not dataset.empty:
         st.markdown("#### 📊 Table Columns")
         
+        # A view opened from the Saved Views section or a ?view= link replaces the whole setup
+        pending_view = st.session_state.pop('pending_view', None)
+        if pending_view is not None:
+            apply_view(pending_view, dataset_columns)
         # Initialize column visibility if not set
-        if not st.session_state.column_visibility:
-            # Default columns to show
-            default_cols = [
-                'Person_UUID', 'lead_first_name', 'Lead_Status', 'Lead_Status_Detail',
-                'Has_L2QR', 'Activity_Count', 'Speed_to_Lead', 
-                'Activity_Inbound_Calls', 'Activity_Outbound_Calls', 'Activity_Text_Messages',
-                'Activity_Emails', 'Activity_Voicemails', 'Activity_Form_Fills',
-                'Is_Converted_Bool', 'Lead_RecordId'
-            ]
+        elif not st.session_state.column_visibility:
             # Initialize visibility for all columns
-            for col in df.columns:
-                st.session_state.column_visibility[col] = col in default_cols
-        
-        # Update selected_columns based on visibility
-        st.session_state.selected_columns = [col for col, visible in st.session_state.column_visibility.items() if visible and col in df.columns]
+            for col in dataset_columns:
+                st.session_state.column_visibility[col] = col in DEFAULT_VISIBLE_COLUMNS
         
-        # Column Manager Container
-        st.markdown('<div class="column-manager">', unsafe_allow_html=True)
+        render_column_manager(dataset_columns)
         
-        # Quick actions
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            if st.button("Show All", type="secondary", key="show_all_cols"):
-                for col in df.columns:
-                    st.session_state.column_visibility[col] = True
-                st.rerun()
-        with col2:
-            if st.button("Hide All", type="secondary", key="hide_all_cols"):
-                for col in df.columns:
-                    st.session_state.column_visibility[col] = False
-                st.rerun()
-        with col3:
-            if st.button("Reset", type="secondary", key="reset_cols"):
-                # Reset to predefined dictionary labels
-                st.session_state.column_labels = COLUMN_LABEL_DICTIONARY.copy()
-                st.session_state.editing_column = None
-                # Reset to default columns
-                default_cols = [
-                    'Person_UUID', 'lead_first_name', 'Lead_Status', 'Lead_Status_Detail',
-                    'Has_L2QR', 'Activity_Count', 'Speed_to_Lead', 
-                    'Activity_Inbound_Calls', 'Activity_Outbound_Calls', 'Activity_Text_Messages',
-                    'Activity_Emails', 'Activity_Voicemails', 'Activity_Form_Fills',
-                    'Is_Converted_Bool', 'Lead_RecordId'
-                ]
-                for col in df.columns:
-                    st.session_state.column_visibility[col] = col in default_cols
-                st.rerun()
-        
-        st.markdown("<div style='margin-top: 12px;'>", unsafe_allow_html=True)
-        
-        # Create rows for each column with more compact layout
-        for idx, col in enumerate(df.columns):
-            # Use columns directly without container for better height control
-            col_left, col_vis, col_edit = st.columns([4, 1, 1])
-            
-            with col_left:
-                # Check if we're editing this column
-                if st.session_state.editing_column == col:
-                    # Show text input for editing
-                    # Check session state first, then dictionary, then use original column name
-                    current_label = st.session_state.column_labels.get(col, COLUMN_LABEL_DICTIONARY.get(col, col))
-                    new_label = st.text_input(
-                        "Edit column name",
-                        value=current_label,
-                        key=f"edit_input_{col}",
-                        label_visibility="collapsed"
-                    )
-                    # Save on Enter or when focus changes
-                    if new_label != current_label:
-                        st.session_state.column_labels[col] = new_label
-                        st.session_state.editing_column = None
-                        st.rerun()
-                else:
-                    # Display column name (custom label from session or dictionary)
-                    # Priority: session state > dictionary > original column name
-                    display_name = st.session_state.column_labels.get(col, COLUMN_LABEL_DICTIONARY.get(col, col))
-                    st.markdown(f"<div class='column-name' style='padding-top: 5px;'>{display_name}</div>", unsafe_allow_html=True)
-            
-            with col_vis:
-                # Visibility toggle button with circle indicator
-                is_visible = st.session_state.column_visibility.get(col, False)
-                visibility_indicator = "🟢" if is_visible else "⚫"
-                visibility_key = f"vis_{col}_{idx}"
-                if st.button(
-                    visibility_indicator, 
-                    key=visibility_key, 
-                    help="Show/Hide column",
-                    use_container_width=True
-                ):
-                    st.session_state.column_visibility[col] = not is_visible
-                    st.rerun()
-            
-            with col_edit:
-                # Edit button
-                edit_key = f"edit_{col}_{idx}"
-                if st.button(
-                    "✏️", 
-                    key=edit_key, 
-                    help="Rename column",
-                    use_container_width=True
-                ):
-                    st.session_state.editing_column = col
-                    st.rerun()
-            
-        st.markdown("</div></div>", unsafe_allow_html=True)
+        render_saved_views(view_store)
 
 # MAIN AREA
 # Header with title and refresh button
@@ -791,271 +1326,251 @@ with col_title:
 
 with col_refresh:
     if st.button("🔄", help="Refresh data"):
+        # Look for new or changed files now rather than at the next poll
+        if file_watcher is not None:
+            file_watcher.request_scan()
         st.rerun()
 
 # Show alert only if no data is loaded from any source
-if df is None or (isinstance(df, pd.DataFrame) and df.empty):
-    if not output_files and not st.session_state.uploaded_file:
+if dataset is None or dataset.empty:
+    if not output_files and not active_upload():
         st.info("No data loaded. Please use the sidebar to upload a CSV file or select a local file.")
 
 # Data is already loaded above, no need to reload unless explicitly refreshed
 
+# DuckDB engine for the loaded dataset when selected in the sidebar
+use_duckdb = st.session_state.get('query_backend', DEFAULT_QUERY_BACKEND) == 'duckdb'
+
 # Calculate metrics
-metrics = calculate_metrics(df)
-
-# Main KPIs - More compact layout
-st.markdown("#### Lead Metrics")
-col1, col2, col3 = st.columns(3)
-
-with col1:
-    # Put all HTML in one block to keep it contained
-    card_html = f"""
-    <div style="background: white; border-radius: 16px; border: 1px solid #D6E7FB; box-shadow: 0 1px 2px rgba(0,0,0,.06); padding: 12px; height: 100%;">
-        <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">TOTAL LEADS</div>
-        <div style="font-size: 42px; font-weight: 900; color: #0176D3; line-height: 1;">{metrics["lead_count"]:,}</div>
-    </div>
-    """
-    st.markdown(card_html, unsafe_allow_html=True)
-    
-    if st.session_state.show_sparklines:
-        # In a real app, you'd calculate actual historical data
-        sparkline_data = generate_sparkline_data(metrics['lead_count'])
-        st.line_chart(pd.DataFrame(sparkline_data), height=50, use_container_width=True)
-    
-    if st.session_state.show_deltas:
-        deltas = generate_delta(metrics['lead_count'], 'up')
-        delta_html = f"""
-        <div style="margin-top: 8px;">
-            <span class="chip up">DoD ▲ +{deltas['dod']:.1f}%</span>
-            <span class="chip up">WoW ▲ +{deltas['wow']:.1f}%</span>
-            <span class="chip up">MoM ▲ +{deltas['mom']:.1f}%</span>
-        </div>
-        """
-        st.markdown(delta_html, unsafe_allow_html=True)
-
-with col2:
-    card_html = f"""
-    <div style="background: white; border-radius: 16px; border: 1px solid #D6E7FB; box-shadow: 0 1px 2px rgba(0,0,0,.06); padding: 12px; height: 100%;">
-        <div style="display: flex; justify-content: space-between; gap: 12px;">
-            <div style="flex: 1;">
-                <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">TOTAL QUALIFIED LEADS</div>
-                <div style="font-size: 42px; font-weight: 900; color: #0176D3; line-height: 1;">{metrics["l2qr_count"]:,}</div>
-            </div>
-            <div style="flex: 1; text-align: right;">
-                <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">LEADS → QUALIFIED LEADS</div>
-                <div style="font-size: 28px; font-weight: 800; color: #1B5297; line-height: 1;">{metrics["lead_to_l2qr_pct"]:.1f}%</div>
-            </div>
-        </div>
-    </div>
-    """
-    st.markdown(card_html, unsafe_allow_html=True)
-    
-    if st.session_state.show_sparklines:
-        sparkline_data = generate_sparkline_data(metrics['l2qr_count'])
-        st.line_chart(pd.DataFrame(sparkline_data), height=50, use_container_width=True)
-    
-    if st.session_state.show_deltas:
-        deltas = generate_delta(metrics['l2qr_count'], 'up')
-        delta_html = f"""
-        <div style="margin-top: 8px;">
-            <span class="chip up">DoD ▲ +{deltas['dod']:.1f}%</span>
-            <span class="chip up">WoW ▲ +{deltas['wow']:.1f}%</span>
-            <span class="chip up">MoM ▲ +{deltas['mom']:.1f}%</span>
-        </div>
-        """
-        st.markdown(delta_html, unsafe_allow_html=True)
-
-with col3:
-    card_html = f"""
-    <div style="background: white; border-radius: 16px; border: 1px solid #D6E7FB; box-shadow: 0 1px 2px rgba(0,0,0,.06); padding: 12px; height: 100%;">
-        <div style="display: flex; justify-content: space-between; gap: 10px;">
-            <div style="flex: 1;">
-                <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">TOTAL ACCOUNTS</div>
-                <div style="font-size: 42px; font-weight: 900; color: #0176D3; line-height: 1;">{metrics["converted_count"]:,}</div>
-            </div>
-            <div style="flex: 1; text-align: center;">
-                <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">LEADS → ACCOUNTS</div>
-                <div style="font-size: 28px; font-weight: 800; color: #1B5297; line-height: 1;">{metrics["lead_to_convert_pct"]:.2f}%</div>
-            </div>
-            <div style="flex: 1; text-align: right;">
-                <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">QUALIFIED LEADS → ACCOUNTS</div>
-                <div style="font-size: 28px; font-weight: 800; color: #1B5297; line-height: 1;">{metrics["l2qr_to_convert_pct"]:.2f}%</div>
-            </div>
-        </div>
-    </div>
-    """
-    st.markdown(card_html, unsafe_allow_html=True)
-    
-    if st.session_state.show_sparklines:
-        sparkline_data = generate_sparkline_data(metrics['converted_count'])
-        st.line_chart(pd.DataFrame(sparkline_data), height=50, use_container_width=True)
-    
-    if st.session_state.show_deltas:
-        deltas = generate_delta(metrics['converted_count'], 'up')
-        delta_html = f"""
-        <div style="margin-top: 8px;">
-            <span class="chip up">DoD ▲ +{deltas['dod']:.1f}%</span>
-            <span class="chip up">WoW ▲ +{deltas['wow']:.1f}%</span>
-            <span class="chip up">MoM ▲ +{deltas['mom']:.1f}%</span>
-        </div>
-        """
-        st.markdown(delta_html, unsafe_allow_html=True)
+with perf.stage('metrics'):
+    if upload_parser is not None:
+        # KPIs over the rows parsed so far
+        metrics = upload_parser.metrics()
+    elif dataset is None:
+        metrics = calculate_metrics(None)
+    elif use_duckdb and not dataset.is_streamed and not dataset.empty:
+        metrics = dataset.filter(backend='duckdb').metrics()
+    else:
+        metrics = dataset.metrics()
 
+# Daily KPI trends for sparklines and deltas (built once per dataset)
+with perf.stage('kpi trends'):
+    if (st.session_state.show_sparklines or st.session_state.show_deltas) and dataset is not None:
+        kpi_trends = dataset.kpi_trends()
+    else:
+        kpi_trends = {'daily': pd.DataFrame(), 'deltas': {}}
 
-# Secondary KPIs - More compact
-st.markdown("#### Calling Metrics")
-col1 = st.columns(1)[0]
+# KPI bands - a fragment, so while an upload is parsing only they refresh
+st.fragment(render_kpi_bands, run_every=UPLOAD_POLL_SECONDS if upload_parser is not None else None)(
+    metrics, kpi_trends, upload_parser
+)
 
-with col1:
-    card_html = f"""
-    <div style="background: white; border-radius: 16px; border: 1px solid #E6EEF9; box-shadow: 0 1px 2px rgba(0,0,0,.06); padding: 12px; height: 100%; max-width: 350px;">
-        <div style="font-size: 11px; letter-spacing: 0.04em; text-transform: uppercase; color: #1B5297; opacity: 0.9; margin-bottom: 6px;">MEDIAN SPEED TO LEAD</div>
-        <div style="font-size: 32px; font-weight: 800; color: #1B5297; line-height: 1;">{metrics["median_speed_to_lead"]}</div>
-    </div>
-    """
-    st.markdown(card_html, unsafe_allow_html=True)
-    
-    if st.session_state.show_sparklines:
-        # For time-based metrics, show as minutes
-        sparkline_data = generate_sparkline_data(1, num_points=8)  # Using 1 minute as base
-        # Create a narrower chart container
-        with st.container():
-            col_chart, col_empty = st.columns([1, 2])
-            with col_chart:
-                st.line_chart(pd.DataFrame(sparkline_data), height=50, use_container_width=True)
-    
-    if st.session_state.show_deltas:
-        deltas = generate_delta(1, 'neutral')
-        delta_html = f"""
-        <div style="margin-top: 8px; max-width: 400px;">
-            <span class="chip neutral">DoD ■ {deltas['dod']:.1f}%</span>
-            <span class="chip {"down" if deltas['wow'] < 0 else "up"}">WoW {"▼" if deltas['wow'] < 0 else "▲"} {abs(deltas['wow']):.1f}%</span>
-            <span class="chip {"down" if deltas['mom'] < 0 else "up"}">MoM {"▼" if deltas['mom'] < 0 else "▲"} {abs(deltas['mom']):.1f}%</span>
-        </div>
-        """
-        st.markdown(delta_html, unsafe_allow_html=True)
+# Snapshot Trends - KPIs across every local person_master file
+if st.session_state.show_snapshot_trends:
+    st.markdown("#### Snapshot Trends")
+    if not output_files:
+        st.info("Snapshot trends need local person_master files in the Output-Files directory.")
+    else:
+        with perf.stage('snapshot trends'):
+            history = get_snapshot_history(str(history_db_path(output_files)))
+            
+            # Only snapshots that are new or changed since they were recorded get summarized.
+            # Files already in the dataset cache reuse their metrics; the rest are read in
+            # chunks outside the cache, so old snapshots don't evict the datasets in use
+            pending_files = history.pending(output_files)
+            if pending_files:
+                progress = st.progress(0.0)
+                for i, snapshot_path in enumerate(pending_files):
+                    progress.progress(i / len(pending_files), text=f"Summarizing {snapshot_path.name}...")
+                    snapshot_stat = snapshot_path.stat()
+                    try:
+                        cached = get_dataset_cache().peek(file_dataset_key(snapshot_path))
+                        snapshot_kpis = cached.metrics() if cached is not None else snapshot_metrics(snapshot_path)
+                    except Exception as e:
+                        st.error(f"Error summarizing {snapshot_path.name}: {str(e)}")
+                        continue
+                    history.record(snapshot_path, snapshot_kpis, snapshot_stat)
+                progress.empty()
+            
+            snapshot_trend = history.trend(output_files)
+        if len(snapshot_trend) < 2:
+            st.caption("At least two snapshots are needed to show a trend.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.caption("Leads / Qualified Leads / Accounts")
+                st.line_chart(snapshot_trend[['lead_count', 'l2qr_count', 'converted_count']], height=200, use_container_width=True)
+            with col2:
+                st.caption("Conversion Rates (%)")
+                st.line_chart(snapshot_trend[['lead_to_l2qr_pct', 'lead_to_convert_pct', 'l2qr_to_convert_pct']], height=200, use_container_width=True)
+            with col3:
+                st.caption("Median Speed to Lead (minutes)")
+                st.line_chart(snapshot_trend['median_speed_to_lead_seconds'] / 60, height=200, use_container_width=True)
+
+# Snapshot Diff summary - the changed rows themselves go to the table below
+if snapshot_diff is not None:
+    st.markdown("#### Snapshot Diff")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Added", f"{snapshot_diff.added_count:,}")
+    col2.metric("Removed", f"{snapshot_diff.removed_count:,}")
+    col3.metric("Changed", f"{snapshot_diff.changed_count:,}")
+    col4.metric("Unchanged", f"{snapshot_diff.unchanged_count:,}")
+    if not snapshot_diff.column_changes.empty:
+        st.caption("Changed rows per field")
+        column_changes = snapshot_diff.column_changes.head(20)
+        column_changes.index = [st.session_state.column_labels.get(col) or col for col in column_changes.index]
+        st.bar_chart(column_changes, height=220, use_container_width=True)
+    if snapshot_diff.duplicate_keys:
+        st.caption(f"{snapshot_diff.duplicate_keys:,} rows with duplicate Person_UUID values were ignored.")
 
 # Data Table Section
 st.markdown("### Person Master Data")
 
-if df is not None and not df.empty:
+# The table shows the loaded dataset, or the changed rows when comparing snapshots
+table_dataset = dataset
+leading_columns = ()
+if snapshot_diff is not None:
+    table_dataset = snapshot_diff.dataset
+    leading_columns = tuple(DIFF_COLUMNS)
+
+# Fragments below drawn from the column setup, so column manager changes can rerun just them
+column_fragments = []
+
+# With DuckDB selected the table queries SQL - streamed files always do when DuckDB is installed,
+# straight from their Parquet store
+streamed_table = table_dataset is not None and table_dataset.is_streamed
+table_backend = 'duckdb' if use_duckdb or (streamed_table and 'duckdb' in QUERY_BACKENDS) else 'pandas'
+
+if table_dataset is not None and not table_dataset.empty and (table_backend == 'duckdb' or not streamed_table):
     # Filters
     col1, col2, col3, col4 = st.columns(4)
     
+    filter_options = table_dataset.filter_options(table_backend)
+    
     with col1:
         # Lead Status filter
-        if 'Lead_Status' in df.columns:
-            status_options = ['All'] + sorted(df['Lead_Status'].dropna().unique().tolist())
-            selected_status = st.selectbox("Lead Status", status_options)
+        if 'status' in filter_options:
+            status_options = ['All'] + filter_options['status']
+            keep_filter_choice('filter_status', status_options)
+            selected_status = st.selectbox("Lead Status", status_options, key='filter_status')
         else:
             selected_status = 'All'
     
     with col2:
         # Lead Source filter
-        if 'Lead_Source' in df.columns:
-            source_options = ['All'] + sorted(df['Lead_Source'].dropna().unique().tolist())
-            selected_source = st.selectbox("Lead Source", source_options)
+        if 'source' in filter_options:
+            source_options = ['All'] + filter_options['source']
+            keep_filter_choice('filter_source', source_options)
+            selected_source = st.selectbox("Lead Source", source_options, key='filter_source')
         else:
             selected_source = 'All'
     
     with col3:
         # Conversion Status filter
         conversion_options = ['All', 'Converted', 'Not Converted']
-        selected_conversion = st.selectbox("Conversion Status", conversion_options)
+        keep_filter_choice('filter_conversion', conversion_options)
+        selected_conversion = st.selectbox("Conversion Status", conversion_options, key='filter_conversion')
     
     with col4:
         # Search box
-        search_term = st.text_input("Search all fields...", placeholder="Enter search term")
-    
-    # Apply filters
-    filtered_df = df.copy()
-    
-    if selected_status != 'All' and 'Lead_Status' in df.columns:
-        filtered_df = filtered_df[filtered_df['Lead_Status'] == selected_status]
-    
-    if selected_source != 'All' and 'Lead_Source' in df.columns:
-        filtered_df = filtered_df[filtered_df['Lead_Source'] == selected_source]
+        search_term = st.text_input(
+            "Search all fields...",
+            placeholder="Enter search term",
+            help="Words match by prefix. Use column:term to search one column, e.g. email:acme",
+            key='filter_search'
+        )
     
-    if selected_conversion != 'All' and 'Is_Converted_Bool' in df.columns:
-        if selected_conversion == 'Converted':
-            filtered_df = filtered_df[filtered_df['Is_Converted_Bool'].astype(str).str.lower().isin(['true', 'yes', '1'])]
-        else:
-            filtered_df = filtered_df[~filtered_df['Is_Converted_Bool'].astype(str).str.lower().isin(['true', 'yes', '1'])]
+    # Apply filters - a boolean mask over all rows (pandas) or one SQL WHERE clause (DuckDB)
+    with perf.stage(f"filter + search ({table_backend})"):
+        selection = table_dataset.filter(
+            selected_status, selected_source, selected_conversion, search_term,
+            column_labels=st.session_state.column_labels, backend=table_backend
+        )
+        total_count = table_dataset.n_rows
+        filtered_count = selection.count
     
-    if search_term:
-        # Search across all string columns
-        mask = filtered_df.astype(str).apply(lambda x: x.str.contains(search_term, case=False, na=False)).any(axis=1)
-        filtered_df = filtered_df[mask]
+    with perf.stage(f"filtered metrics ({table_backend})"):
+        filtered_metrics = selection.metrics()
     
     # Stats bar
-    filtered_metrics = calculate_metrics(filtered_df)
     st.markdown(f"""
     <div style="display: flex; gap: 32px; padding: 16px; background: #f9fafb; border: 1px solid #e5e7eb; border-radius: 12px; margin: 16px 0;">
-        <div><b>Filtered Records:</b> {len(filtered_df):,} / {len(df):,}</div>
+        <div><b>Filtered Records:</b> {filtered_count:,} / {total_count:,}</div>
         <div><b>Filtered Conversion Rate:</b> {filtered_metrics['lead_to_convert_pct']:.2f}%</div>
         <div><b>Median Speed to Lead:</b> {filtered_metrics['median_speed_to_lead']}</div>
     </div>
     """, unsafe_allow_html=True)
     
-    # Display the dataframe with selected columns and custom labels
-    if st.session_state.selected_columns:
-        # Create a copy of the dataframe with selected columns
-        display_df = filtered_df[st.session_state.selected_columns].copy()
-        
-        # Rename columns based on user labels
-        rename_dict = {}
-        for col in st.session_state.selected_columns:
-            if col in st.session_state.column_labels and st.session_state.column_labels[col]:
-                rename_dict[col] = st.session_state.column_labels[col]
-        
-        if rename_dict:
-            display_df = display_df.rename(columns=rename_dict)
-        
-        # Calculate column widths based on header labels
-        column_config = calculate_column_widths(st.session_state.selected_columns, st.session_state.column_labels)
-        
-        st.dataframe(
-            display_df,
-            column_config=column_config,
-            use_container_width=True,
-            height=400,
-            hide_index=True
-        )
-    else:
-        st.warning("No columns selected. Please select columns to display in the configuration section above.")
-    
-    # Export button - exports with selected columns and custom labels
-    if st.session_state.selected_columns:
-        export_df = filtered_df[st.session_state.selected_columns].copy()
-        
-        # Apply custom labels to export
-        rename_dict = {}
-        for col in st.session_state.selected_columns:
-            if col in st.session_state.column_labels and st.session_state.column_labels[col]:
-                rename_dict[col] = st.session_state.column_labels[col]
-        
-        if rename_dict:
-            export_df = export_df.rename(columns=rename_dict)
-        
-        csv = export_df.to_csv(index=False)
-        
-        col1, col2 = st.columns(2)
-        with col1:
-            st.download_button(
-                label="📥 Export Filtered Data (Custom Columns)",
-                data=csv,
-                file_name=f"surstitch_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
+    # KPI breakdown of the filtered rows - switching dimensions only re-sums the precomputed cube
+    breakdown_dimensions = [col for col in BREAKDOWN_DIMENSIONS if col in table_dataset.columns]
+    if st.session_state.show_breakdown and breakdown_dimensions:
+        render_breakdown(selection, breakdown_dimensions)
+        column_fragments.append('breakdown')
+    
+    # Table and exports rerun on their own when sorting, paging, picking an export format or changing columns
+    render_table(selection, leading_columns)
+    column_fragments.append('table')
+elif snapshot_diff is not None:
+    st.info("No differences between the two snapshots.")
+elif dataset is not None and dataset.is_streamed:
+    # Streaming mode without DuckDB - rows stay on disk, so only paging is available
+    st.info(
+        f"This file is larger than {STREAMING_THRESHOLD_MB:,} MB and is served from an on-disk columnar store. "
+        "KPIs cover all rows; filters, search and exports need the duckdb package in this mode."
+    )
+    render_streamed_page(dataset)
+    column_fragments.append('streamed_page')
+elif upload_parser is not None:
+    st.info(f"Parsing {upload_parser.name}... KPIs above cover the rows read so far; the table appears when parsing finishes.")
+else:
+    st.warning("No data loaded. Please upload a CSV file or ensure Output-Files directory contains person_master CSV files.")
+st.session_state.column_fragments = column_fragments
+
+# Performance panel - this run's stage timings, written last so every stage is included
+perf_record = perf.finish(
+    session=current_session_id(),
+    dataset=dataset_key,
+    query_backend=table_backend,
+    dataset_rows=dataset.n_rows if dataset is not None else 0,
+)
+with st.sidebar:
+    with st.expander("⏱️ Performance"):
+        st.caption(f"This run: {perf_record['total_ms']:,.0f} ms")
+        if perf_record['stages']:
+            stage_table = pd.DataFrame(perf_record['stages']).reindex(columns=['stage', 'ms', 'rows', 'columns', 'bytes'])
+            stage_table['MB'] = stage_table.pop('bytes') / 1024 / 1024
+            st.dataframe(
+                stage_table,
+                column_config={
+                    'stage': 'Stage',
+                    'ms': st.column_config.NumberColumn('ms', format="%.1f"),
+                    'rows': st.column_config.NumberColumn('Rows', format="%d"),
+                    'columns': st.column_config.NumberColumn('Cols', format="%d"),
+                    'MB': st.column_config.NumberColumn('MB', format="%.2f"),
+                },
+                use_container_width=True,
+                hide_index=True
             )
-        with col2:
-            # Also offer full export
-            full_csv = filtered_df.to_csv(index=False)
-            st.download_button(
-                label="📥 Export All Data (All Columns)",
-                data=full_csv,
-                file_name=f"surstitch_full_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv",
-                type="secondary"
+        if perf_record['peak_memory_bytes'] is not None:
+            st.caption(
+                f"Peak process memory: {perf_record['peak_memory_bytes'] / 1024 / 1024:,.0f} MB"
+                + (f" (raised {perf_record['peak_memory_growth_bytes'] / 1024 / 1024:,.1f} MB by this run)"
+                   if perf_record['peak_memory_growth_bytes'] else "")
             )
-else:
-    st.warning("No data loaded. Please upload a CSV file or ensure Output-Files directory contains person_master CSV files.")
\ No newline at end of file
+        fragment_record = st.session_state.get('fragment_perf_record')
+        if fragment_record:
+            # Sorting, paging and breakdowns rerun only their fragment, logged separately
+            st.caption(
+                f"Last {fragment_record['fragment']} rerun: {fragment_record['total_ms']:,.0f} ms ("
+                + ", ".join(f"{stage['stage']} {stage['ms']:,.0f} ms" for stage in fragment_record['stages'])
+                + ")"
+            )
+        recent_exports = list(get_perf_events())
+        if recent_exports:
+            last_export = recent_exports[-1]
+            st.caption(
+                f"Last export: {last_export['format']}, {last_export['rows']:,} rows, "
+                f"{last_export['bytes'] / 1024 / 1024:,.1f} MB in {last_export['ms']:,.0f} ms"
+            )
+        if PERF_LOG_PATH:
+            st.caption(f"Logging to {PERF_LOG_PATH}")